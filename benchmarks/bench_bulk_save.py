@@ -0,0 +1,73 @@
+"""Benchmark of saving the repository objects of a harvest, `save_all`
+    (ORM unit of work flush) compared with `bulk_save_all` (batched
+    `executemany` inserts). Each variant saves an database with one schema,
+    the tables and their columns into an empty repository.
+
+    Usage: python benchmarks/bench_bulk_save.py [columns] [columns per table]
+
+    Author: Ajeet Singh
+    Date: 07/14/2019
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from bipy.services.db.repository.meta_objects import WarehouseDatabase, WarehouseSchema
+from bipy.services.db.repository.meta_objects import WarehouseTable, WarehouseColumn
+from bipy.services.utils import Utility
+
+
+def build_database(columns, columns_per_table):
+    """Returns an database object with the tables holding columns"""
+    db_obj = WarehouseDatabase(name="BENCH", db_type="SQLITE")
+    schema = WarehouseSchema(name="main")
+    db_obj.schemas.append(schema)
+    for i in range(0, columns, columns_per_table):
+        table = WarehouseTable(name="T%d" % (i // columns_per_table))
+        for c in range(min(columns_per_table, columns - i)):
+            table.columns.append(WarehouseColumn(name="C%d" % c, column_type=1))
+        table.number_of_columns = len(table.columns)
+        schema.tables.append(table)
+    return db_obj
+
+
+def run(work_dir, name, columns, columns_per_table, bulk):
+    """Saves the objects into a new repository, returns the seconds taken"""
+    util = Utility()
+    conn = util.get_plugin(util.CONFIG.PATH_CONNECTION_MANAGERS, new_instance=True)
+    conn.connect("sqlite:///" + os.path.join(work_dir, name))
+    repo_mgr = util.get_plugin(util.CONFIG.PATH_REPO_MGR)
+    repo_mgr.connect(conn)
+    db_obj = build_database(columns, columns_per_table)
+    start = time.perf_counter()
+    if bulk:
+        repo_mgr.bulk_save_all([db_obj])
+    else:
+        repo_mgr.save_all([db_obj])
+    elapsed = time.perf_counter() - start
+    saved = conn.get_engine().execute("SELECT COUNT(*) FROM repository_warehouse_columns")\
+        .scalar()
+    assert saved == columns
+    conn.disconnect()
+    return elapsed
+
+
+def main(columns, columns_per_table):
+    """Prints the timings and rows per second of both variants"""
+    work_dir = tempfile.mkdtemp(prefix="bipy_bench_")
+    try:
+        rows = columns + (columns + columns_per_table - 1) // columns_per_table + 2
+        before = run(work_dir, "orm.db", columns, columns_per_table, False)
+        after = run(work_dir, "bulk.db", columns, columns_per_table, True)
+        print("Save of %d columns (%d rows)" % (columns, rows))
+        print("  save_all      : %8.3f s %10d rows/s" % (before, rows / before))
+        print("  bulk_save_all : %8.3f s %10d rows/s" % (after, rows / after))
+        print("  speed up      : %8.1fx" % (before / after))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,66 @@
+"""Benchmark of harvesting the catalog of a wide warehouse, per table
+    inspector calls (columns, PK and FKs of each table) compared with
+    `Browser.snapshot()`.
+
+    Usage: python benchmarks/bench_catalog_snapshot.py [tables]
+
+    Author: Ajeet Singh
+    Date: 07/08/2019
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from bipy.services.utils import Utility
+
+
+def create_warehouse(conn, tables):
+    """Creates tables with 20 columns each, every table referring the
+        previous one
+    """
+    engine = conn.get_engine()
+    for i in range(tables):
+        columns = ", ".join("C%d VARCHAR(20)" % c for c in range(18))
+        fk = "PARENT_ID INTEGER REFERENCES T%d (ID)" % (i - 1) if i else "PARENT_ID INTEGER"
+        engine.execute("CREATE TABLE T%d (ID INTEGER PRIMARY KEY, %s, %s)" % (i, fk, columns))
+
+
+def per_table(browser, conn):
+    """Harvests the catalog with inspector calls per table"""
+    inspector = conn.get_inspector()
+    inspector.info_cache.clear()
+    for table in inspector.get_table_names():
+        inspector.get_columns(table)
+        inspector.get_pk_constraint(table)
+        inspector.get_foreign_keys(table)
+
+
+def main(tables):
+    """Creates an warehouse and prints the timings of both variants"""
+    util = Utility()
+    config = util.CONFIG
+    work_dir = tempfile.mkdtemp(prefix="bipy_bench_")
+    try:
+        conn = util.get_plugin(config.PATH_CONNECTION_MANAGERS, new_instance=True)
+        conn.connect("sqlite:///" + os.path.join(work_dir, "warehouse.db"))
+        create_warehouse(conn, tables)
+        browser = util.get_plugin(config.PATH_BROWSER)
+        browser.connect(conn)
+        start = time.perf_counter()
+        per_table(browser, conn)
+        before = time.perf_counter() - start
+        start = time.perf_counter()
+        browser.snapshot()
+        after = time.perf_counter() - start
+        print("Catalog harvest of %d tables" % tables)
+        print("  inspector per table : %8.3f s" % before)
+        print("  snapshot            : %8.3f s" % after)
+        print("  speed up            : %8.1fx" % (before / after))
+        conn.get_engine().dispose()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
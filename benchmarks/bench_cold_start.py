@@ -0,0 +1,72 @@
+"""Cold start benchmark for plugin discovery. Measures, in fresh
+    interpreters, the time to construct `BipyCli` and to serve a single
+    `schemas()` call, with a live yapsy scan and with the plugin manifest
+    generated by `bipy.setup.installer`.
+
+    Usage: python benchmarks/bench_cold_start.py [runs]
+
+    Author: Ajeet Singh
+    Date: 07/03/2019
+"""
+import os
+import sys
+import shutil
+import statistics
+import subprocess
+from bipy.services.constants import PATHS
+from bipy.setup import installer
+
+
+SCENARIOS = {
+    "BipyCli()": "\n".join([
+        "from bipy.services.ui.cli import main",
+        "main.BipyCli.run = lambda self: None",
+        "main.BipyCli()"]),
+    "schemas()": "\n".join([
+        "from bipy.services.integration import browser",
+        "browser.schemas()"])
+}
+
+TIMER = "\n".join([
+    "import time",
+    "_start = time.perf_counter()",
+    "%s",
+    "print(time.perf_counter() - _start)"])
+
+
+def run_scenario(code, runs):
+    """Runs the code in fresh interpreters and returns the median time"""
+    env = dict(os.environ, PYTHONPATH=PATHS.ROOT_PARENT)
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", TIMER % code], env=env,
+                             stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, check=True)
+        timings.append(float(out.stdout.decode().strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def main(runs):
+    """Measures every scenario with and without the manifest"""
+    backup = PATHS.PLUGIN_MANIFEST + ".bak"
+    if os.path.exists(PATHS.PLUGIN_MANIFEST):
+        shutil.move(PATHS.PLUGIN_MANIFEST, backup)
+    try:
+        results = {}
+        for name, code in SCENARIOS.items():
+            results[name] = [run_scenario(code, runs)]
+        installer.generate_plugin_manifest()
+        for name, code in SCENARIOS.items():
+            results[name].append(run_scenario(code, runs))
+        os.remove(PATHS.PLUGIN_MANIFEST)
+    finally:
+        if os.path.exists(backup):
+            shutil.move(backup, PATHS.PLUGIN_MANIFEST)
+    print("Cold start (median of %d runs)" % runs)
+    print("  %-12s %12s %12s" % ("", "live scan", "manifest"))
+    for name, (scan, manifest) in results.items():
+        print("  %-12s %10.1fms %10.1fms" % (name, scan * 1e3, manifest * 1e3))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
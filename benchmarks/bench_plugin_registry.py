@@ -0,0 +1,43 @@
+"""Micro-benchmark of the per request overhead of plugin lookups. Every
+    hug endpoint in the integration layer looks up the connection manager
+    and the browser plugins, which used to re-scan the plugin directories
+    on each call.
+
+    Usage: python benchmarks/bench_plugin_registry.py [iterations]
+
+    Author: Ajeet Singh
+    Date: 07/02/2019
+"""
+import sys
+import timeit
+from bipy.services.utils import Utility, PluginRegistry
+
+
+def lookup_with_scan(config):
+    """Per request lookups as done before the registry (fresh scans)"""
+    registry = PluginRegistry()
+    registry.scan(config.PATH_CONNECTION_MANAGERS)[0].plugin_object
+    registry.scan(config.PATH_BROWSER)[0].plugin_object
+
+
+def lookup_with_registry(util, config):
+    """Per request lookups served by the process wide registry"""
+    util.get_plugin(config.PATH_CONNECTION_MANAGERS, new_instance=True)
+    util.get_plugin(config.PATH_BROWSER)
+
+
+def main(iterations):
+    """Runs both variants and prints the per request overhead"""
+    util = Utility()
+    config = util.CONFIG
+    lookup_with_registry(util, config)  # warm up the registry
+    before = timeit.timeit(lambda: lookup_with_scan(config), number=iterations)
+    after = timeit.timeit(lambda: lookup_with_registry(util, config), number=iterations)
+    print("Plugin lookups per request (%d requests)" % iterations)
+    print("  re-scan on every call : %10.1f us/request" % (before / iterations * 1e6))
+    print("  process wide registry : %10.1f us/request" % (after / iterations * 1e6))
+    print("  speed up              : %10.1fx" % (before / after))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,89 @@
+"""Benchmark of the SQLite performance profiles. Runs a repository like
+    write workload (many small transactions) and a warehouse like read
+    workload (repeated scans of a large table) against copies of the
+    bundled databases, once without a profile and once per configured
+    profile.
+
+    Usage: python benchmarks/bench_sqlite_profiles.py [rows]
+
+    Author: Ajeet Singh
+    Date: 07/04/2019
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from bipy.services.constants import PATHS
+from bipy.services.db.connection_managers.sqlite.manager import ConnectionManager, \
+    dispose_engines
+
+
+def harvest(conn_string, profile, rows):
+    """Saves rows one by one committing after every 10 rows, same as the
+        repository managers do while harvesting metadata
+    """
+    cmgr = ConnectionManager()
+    cmgr.connect(conn_string, profile=profile)
+    session = cmgr.get_session()
+    session.execute("CREATE TABLE bench_harvest (id INTEGER PRIMARY KEY, name TEXT, "
+                    "description TEXT)")
+    session.commit()
+    start = time.perf_counter()
+    for i in range(rows):
+        session.execute("INSERT INTO bench_harvest (name, description) VALUES (:n, :d)",
+                        {"n": "COLUMN_%d" % i, "d": "Column number %d" % i})
+        if i % 10 == 9:
+            session.commit()
+    session.commit()
+    elapsed = time.perf_counter() - start
+    cmgr.disconnect()
+    return elapsed
+
+
+def scan(conn_string, profile, rows, passes=5):
+    """Scans and aggregates an synthetic fact table multiple times, same as
+        the warehouse browser and queries read the target database
+    """
+    cmgr = ConnectionManager()
+    cmgr.connect(conn_string, profile=profile)
+    session = cmgr.get_session()
+    session.execute("CREATE TABLE bench_fact (id INTEGER PRIMARY KEY, category TEXT, "
+                    "amount REAL, note TEXT)")
+    session.execute("WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq "
+                    "WHERE n < :rows) INSERT INTO bench_fact (category, amount, note) "
+                    "SELECT 'CAT_' || (n % 50), n * 0.5, hex(randomblob(32)) FROM seq",
+                    {"rows": rows})
+    session.commit()
+    # move the loaded pages out of the WAL so that only the scan is measured
+    session.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    start = time.perf_counter()
+    for _ in range(passes):
+        session.execute("SELECT category, COUNT(*), SUM(amount), MAX(note) FROM bench_fact "
+                        "GROUP BY category ORDER BY 3 DESC").fetchall()
+    elapsed = time.perf_counter() - start
+    cmgr.disconnect()
+    return elapsed
+
+
+def main(rows):
+    """Runs both workloads for each profile and prints the timings"""
+    profiles = ["none", "read_heavy_warehouse", "write_heavy_repository"]
+    print("%-24s %18s %18s" % ("profile", "harvest (s)", "scan (s)"))
+    for profile in profiles:
+        work_dir = tempfile.mkdtemp(prefix="bipy_bench_")
+        try:
+            meta_db = shutil.copy(os.path.join(PATHS.DATA_FILES, "meta.db"), work_dir)
+            test_db = shutil.copy(os.path.join(PATHS.DATA_FILES, "test.db"), work_dir)
+            name = None if profile == "none" else profile
+            # an explicit empty profile name disables the profile bound to the URL
+            harvest_time = harvest("sqlite:///" + meta_db, name or "", rows // 10)
+            scan_time = scan("sqlite:///" + test_db, name or "", rows)
+            print("%-24s %18.3f %18.3f" % (profile, harvest_time, scan_time))
+        finally:
+            dispose_engines()
+            shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
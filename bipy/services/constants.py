@@ -16,6 +16,7 @@ class PATHS:
     DATA_FILES = os.path.abspath(os.path.join(ROOT, "data"))
     CONFIG_FILE = os.path.abspath(os.path.join(ROOT, "config/default.cfg"))
     CONFIG_MGR = os.path.abspath(os.path.join(SERVICES, "config"))
+    PLUGIN_MANIFEST = os.path.abspath(os.path.join(ROOT, "config/plugin_manifest.json"))
 
 
 class URLS:
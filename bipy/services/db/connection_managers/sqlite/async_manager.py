@@ -0,0 +1,205 @@
+"""
+ Asyncio front end of the SQLite connection manager. SQLite and the
+ SQLAlchemy version used by BIPY have no native asyncio driver, so the
+ blocking calls are bridged to an bounded thread pool shared by all async
+ connection managers
+ Author: Ajeet Singh
+ Date: 07/06/2019
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from bipy.services.db.connection_managers.sqlite.manager import ConnectionManager
+from bipy.services.utils import Utility
+from bipy.logging import logger
+
+# ----------init logs---------------------------------
+LOGGER = logger.get_logger(__name__)
+
+# ----------thread pool shared by async managers------
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor():
+    """ Returns the thread pool used to run blocking database calls. The
+        pool is created on first use with `ASYNC_POOL_WORKERS` threads
+    """
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                workers = Utility().CONFIG.get("ASYNC_POOL_WORKERS", 4)
+                LOGGER.debug("Creating thread pool with %s workers for async calls"
+                             % workers)
+                _EXECUTOR = ThreadPoolExecutor(max_workers=workers,
+                                               thread_name_prefix="bipy-async")
+    return _EXECUTOR
+
+
+def shutdown_executor(wait=True):
+    """ Shuts down the thread pool used by async managers. A new pool is
+        created on the next async call
+
+        Args:
+            wait (bool): Waits for the running calls to complete
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown(wait=wait)
+            _EXECUTOR = None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """ Runs the blocking function passed as param in the shared thread pool
+        and returns its result without blocking the event loop
+
+        Args:
+            func (callable): The blocking function
+            args: Positional args of the function
+            kwargs: Keyword args of the function
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(),
+                                      functools.partial(func, *args, **kwargs))
+
+
+class AsyncConnectionManager:
+    """ Async variant of the SQLite `ConnectionManager`. It wraps an
+        connection manager and runs each blocking call in the shared thread
+        pool. The pooled engine and the thread local sessions of the wrapped
+        manager make the calls from different threads independent. The
+        session of a worker thread lives only as long as the call run in it,
+        so no session is left behind in an arbitrary thread of the pool
+
+        >>> import asyncio
+
+        >>> from bipy.services.utils import Utility
+
+        >>> conf = Utility().CONFIG
+
+        >>> conn = AsyncConnectionManager()
+
+        >>> asyncio.get_event_loop().run_until_complete(conn.connect(conf.URL_TEST_DB))
+
+        >>> asyncio.get_event_loop().run_until_complete(\
+                conn.execute("SELECT COUNT(*) FROM CUSTOMER_MASTER")).scalar() > 0
+        True
+    """
+
+    def __init__(self, connection=None):
+        """Default constructor
+
+            Args:
+                connection (ConnectionManager): An connection manager to
+                                                wrap, a new one is created
+                                                if not passed
+        """
+        self.connection = connection if connection is not None else ConnectionManager()
+        LOGGER.debug("Init Async Connection Manager")
+
+    async def connect(self, conn_string, **kwargs):
+        """Setups the connection using the connection string passed as param
+
+            Args:
+                conn_string (string): The connection string to connect with the
+                                        database
+                kwargs: Keyword args of `ConnectionManager.connect`
+        """
+        await self.run(self.connection.connect, conn_string, **kwargs)
+
+    def get_connection(self):
+        """Returns the wrapped blocking connection manager
+        """
+        return self.connection
+
+    def get_connection_string(self):
+        """Returns the connection string used in this for making
+            connections to the database
+        """
+        return self.connection.get_connection_string()
+
+    def get_engine(self):
+        """Returns the database engine for SQLite database
+        """
+        return self.connection.get_engine()
+
+    async def run(self, func, *args, **kwargs):
+        """ Runs an blocking function in the shared thread pool. The session
+            of the worker thread is removed once the function returns
+
+            Args:
+                func (callable): The blocking function
+                args: Positional args of the function
+                kwargs: Keyword args of the function
+        """
+        return await run_blocking(self._run_in_session, func, *args, **kwargs)
+
+    def _run_in_session(self, func, *args, **kwargs):
+        """Calls the function and releases the session of current thread
+        """
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if self.connection.Session is not None:
+                self.connection.Session.remove()
+
+    async def execute(self, statement, params=None):
+        """ Executes the statement on the engine and returns the fully
+            buffered result
+
+            Args:
+                statement (String): SQL statement or SQLAlchemy construct
+                params (Dict): Bind parameters of the statement
+        """
+        def _execute():
+            result = self.connection.get_engine().execute(statement, params or {})
+            return result.fetchall() if result.returns_rows else result.rowcount
+        return _BufferedResult(await run_blocking(_execute))
+
+    async def disconnect(self):
+        """Closes the session opened by `connect`. As every call releases
+            the session of its worker thread, the worker this runs in
+            doesn't matter
+        """
+        await self.run(self.connection.disconnect)
+
+    def __repr__(self):
+        """Returns string representation
+        """
+        return "Async SQLite connection manager (%s)" % self.get_connection_string()
+
+
+class _BufferedResult:
+    """ Result of `AsyncConnectionManager.execute`, rows are fetched in the
+        worker thread so that no cursor crosses thread boundaries
+    """
+
+    def __init__(self, rows):
+        """Default constructor
+
+            Args:
+                rows (list|int): Fetched rows or number of affected rows
+        """
+        self.rows = rows if isinstance(rows, list) else []
+        self.rowcount = rows if isinstance(rows, int) else len(rows)
+
+    def fetchall(self):
+        """Returns all rows"""
+        return self.rows
+
+    def first(self):
+        """Returns the first row or None"""
+        return self.rows[0] if self.rows else None
+
+    def scalar(self):
+        """Returns first column of the first row or None"""
+        row = self.first()
+        return row[0] if row is not None else None
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
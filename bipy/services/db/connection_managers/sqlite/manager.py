@@ -3,14 +3,205 @@
  Author: Ajeet Singh
  Date: 5/12/2019
 """
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.orm import sessionmaker
+import os
+import sqlite3
+import threading
+from urllib.request import pathname2url
+from sqlalchemy import create_engine, inspect, event
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 import bipy.services.db.categories as categories
+from bipy.services.utils import Utility
 from bipy.logging import logger
 
 # ----------init logs---------------------------------
 LOGGER = logger.get_logger(__name__)
 
+# ----------engines shared by all connection managers--
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+# resolving references of the config isn't thread safe, it is read under
+# lock as connection managers are connected from worker threads as well
+_CONFIG_LOCK = threading.Lock()
+
+# ----------pragmas a performance profile can set------
+PROFILE_PRAGMAS = ("journal_mode", "synchronous", "cache_size", "mmap_size",
+                   "temp_store", "busy_timeout")
+
+# ----------access modes of an read only connection----
+READ_ONLY = "ro"
+IMMUTABLE = "immutable"
+
+
+def get_url_binding(conn_string):
+    """ Returns the entry configured for the connection string under
+        `SQLITE_URL_PROFILES` as dict or None if the URL is not configured
+
+        Args:
+            conn_string (string): The connection string of the database
+    """
+    with _CONFIG_LOCK:
+        for binding in Utility().CONFIG.get("SQLITE_URL_PROFILES", []):
+            if binding.url == conn_string:
+                return dict((key, binding.get(key)) for key in binding.keys())
+    return None
+
+
+def get_profile_name(conn_string):
+    """ Returns name of the performance profile configured for the connection
+        string under `SQLITE_URL_PROFILES` or None if there is no profile
+
+        Args:
+            conn_string (string): The connection string of the database
+    """
+    binding = get_url_binding(conn_string)
+    return binding.get("profile") if binding is not None else None
+
+
+def get_access_mode(conn_string):
+    """ Returns the access mode configured for the connection string under
+        `SQLITE_URL_PROFILES`, i.e., `READ_ONLY` if `read_only` is set,
+        `IMMUTABLE` if `immutable` is set as well or None for read-write
+
+        Args:
+            conn_string (string): The connection string of the database
+    """
+    binding = get_url_binding(conn_string)
+    if binding is None or not binding.get("read_only", False):
+        return None
+    return IMMUTABLE if binding.get("immutable", False) else READ_ONLY
+
+
+def get_profile(profile_name):
+    """ Returns the settings of the performance profile available under
+        `SQLITE_PROFILES` in the configuration file as dict
+
+        Args:
+            profile_name (string): Name of the profile
+    """
+    if not profile_name:
+        return {}
+    with _CONFIG_LOCK:
+        profiles = Utility().CONFIG.get("SQLITE_PROFILES")
+        profile = profiles.get(profile_name) if profiles is not None else None
+        if profile is not None:
+            return dict((key, profile.get(key)) for key in profile.keys())
+    LOGGER.error("No SQLite performance profile found with name '%s'" % profile_name)
+    raise ValueError("No SQLite performance profile found with name '%s'"
+                     % profile_name)
+
+
+def get_engine_entry(conn_string, profile_name=None, access_mode=None):
+    """ Returns an tuple of engine and session factory cached for the
+        connection string, profile and access mode passed as param. Both are
+        created on the first request for an URL and shared by all connection
+        managers connected to that URL afterwards, each connection manager
+        keeps its own thread local sessions on top of the factory
+
+        Args:
+            conn_string (string): The connection string of the database
+            profile_name (string): Name of the performance profile
+            access_mode (string): `READ_ONLY`, `IMMUTABLE` or None
+    """
+    key = (conn_string, profile_name, access_mode)
+    entry = _ENGINES.get(key)
+    if entry is None:
+        with _ENGINES_LOCK:
+            entry = _ENGINES.get(key)
+            if entry is None:
+                engine = _create_engine(conn_string, profile_name, access_mode)
+                entry = (engine, sessionmaker(bind=engine))
+                _ENGINES[key] = entry
+    return entry
+
+
+def dispose_engines(conn_string=None):
+    """ Closes the pooled connections of the engine cached for the
+        connection string passed as param or of all cached engines
+
+        Args:
+            conn_string (string): The connection string of the database
+    """
+    with _ENGINES_LOCK:
+        keys = [key for key in _ENGINES if conn_string is None or key[0] == conn_string]
+        for key in keys:
+            entry = _ENGINES.pop(key)
+            entry[0].dispose()
+            LOGGER.debug("Engine for URL '%s' has been disposed" % key[0])
+
+
+def _create_engine(conn_string, profile_name=None, access_mode=None):
+    """ Creates an engine for the connection string using the pool settings
+        available under `SQLITE_POOL` in the configuration file and applies
+        the pragmas of the performance profile on each new DBAPI connection.
+        Read only engines open the database file through an SQLite URI with
+        `mode=ro` (and `immutable=1` for `IMMUTABLE`)
+    """
+    pool_conf = Utility().CONFIG.get("SQLITE_POOL")
+    profile = get_profile(profile_name)
+    connect_args = {}
+    if profile.get("statement_cache_size") is not None:
+        connect_args["cached_statements"] = profile["statement_cache_size"]
+    engine_args = {}
+    database = make_url(conn_string).database
+    if pool_conf is None or database in (None, "", ":memory:"):
+        # in memory databases live inside a single connection
+        LOGGER.debug("Creating engine with default pool for URL: %s" % conn_string)
+        if access_mode is not None:
+            LOGGER.warning("Read only mode is ignored for in memory database")
+            access_mode = None
+    else:
+        LOGGER.debug("Creating engine with pool settings '%s' for URL: %s"
+                     % (pool_conf, conn_string))
+        connect_args["check_same_thread"] = False
+        engine_args = {
+            "poolclass": QueuePool,
+            "pool_size": pool_conf.get("size", 5),
+            "max_overflow": pool_conf.get("overflow", 10),
+            "pool_recycle": pool_conf.get("recycle", -1),
+            "pool_pre_ping": pool_conf.get("pre_ping", False)
+        }
+    if access_mode is None:
+        engine = create_engine(conn_string, connect_args=connect_args, **engine_args)
+    else:
+        uri = _read_only_uri(database, access_mode)
+        LOGGER.debug("Opening database read only using URI: %s" % uri)
+        engine = create_engine(conn_string,
+                               creator=lambda: sqlite3.connect(uri, uri=True,
+                                                               **connect_args),
+                               **engine_args)
+    # journal mode can't be changed through an read only connection
+    pragmas = [(name, profile[name]) for name in PROFILE_PRAGMAS
+               if profile.get(name) is not None and
+               (access_mode is None or name != "journal_mode")]
+    if pragmas:
+        LOGGER.debug("Performance profile '%s' will be applied on connect for URL: %s"
+                     % (profile_name, conn_string))
+        event.listen(engine, "connect",
+                     lambda dbapi_conn, conn_record: _apply_pragmas(dbapi_conn, pragmas))
+    return engine
+
+
+def _read_only_uri(database, access_mode):
+    """ Returns the SQLite URI to open the database file in the access mode
+        passed as param
+    """
+    uri = "file:%s?mode=ro" % pathname2url(os.path.abspath(database))
+    if access_mode == IMMUTABLE:
+        uri += "&immutable=1"
+    return uri
+
+
+def _apply_pragmas(dbapi_conn, pragmas):
+    """ Executes the pragmas passed as list of (name, value) on an new DBAPI
+        connection
+    """
+    cursor = dbapi_conn.cursor()
+    for name, value in pragmas:
+        cursor.execute("PRAGMA %s = %s" % (name, value))
+    cursor.close()
+
 
 class ConnectionManager(categories.SQLite):
     """ A SQLite connection manager which is a singleton and should return same
@@ -39,6 +230,8 @@ class ConnectionManager(categories.SQLite):
     """
 
     connection_string = ""
+    profile_name = None
+    access_mode = None
     ConnectedSession = None
     engine = None
     inspector = None
@@ -67,21 +260,42 @@ class ConnectionManager(categories.SQLite):
         categories.SQLite.__init__(self)
         LOGGER.debug("Init Connection Manager")
 
-    def connect(self, conn_string):
+    def connect(self, conn_string, profile=None, read_only=None, immutable=False):
         """Setups the connection using the connection string passed as param
 
             Args:
                 conn_string (string): The connection string to connect with the
                                         database
+                profile (string): Name of the performance profile to apply,
+                                    by default the profile configured for the
+                                    URL under `SQLITE_URL_PROFILES` is used
+                                    and an empty name disables the profile
+                read_only (bool): Opens the database file read only, by
+                                    default the `read_only` flag configured
+                                    for the URL is used
+                immutable (bool): Opens the read only database as immutable,
+                                    i.e., without any locking. Use it only if
+                                    the file is not changed by anyone else
         """
         LOGGER.debug("Connecting to target database server using URL: {0}"
                      .format(conn_string))
         self.connection_string = conn_string
-        self.engine = create_engine(conn_string)
-        self.Session = sessionmaker()
-        self.Session.configure(bind=self.engine)
+        if profile is None:
+            profile = get_profile_name(conn_string)
+        self.profile_name = profile or None
+        if read_only is None:
+            self.access_mode = get_access_mode(conn_string)
+        elif read_only:
+            self.access_mode = IMMUTABLE if immutable else READ_ONLY
+        else:
+            self.access_mode = None
+        if self.Session is not None:
+            self.Session.remove()
+        self.engine, session_factory = get_engine_entry(conn_string, self.profile_name,
+                                                        self.access_mode)
+        self.Session = scoped_session(session_factory)
         self.ConnectedSession = self.Session()
-        self.inspector = inspect(self.engine)
+        self.inspector = None
         LOGGER.debug("Connected to database successfully")
 
     def get_connection_string(self):
@@ -97,11 +311,36 @@ class ConnectionManager(categories.SQLite):
         LOGGER.debug("Returning the connection engine")
         return self.engine
 
+    def get_engine_info(self):
+        """Returns diagnostics of the engine returned by `get_engine` as dict,
+            i.e., URL, pool status, access mode, the performance profile in
+            effect and the values of the profile pragmas as reported by SQLite
+        """
+        LOGGER.debug("Returning the diagnostics of connection engine")
+        if self.engine is None:
+            return None
+        profile = get_profile(self.profile_name)
+        pragmas = {}
+        with self.engine.connect() as conn:
+            for name in PROFILE_PRAGMAS:
+                pragmas[name] = conn.execute("PRAGMA %s" % name).scalar()
+        return {
+            "url": self.connection_string,
+            "pool": self.engine.pool.status(),
+            "profile": self.profile_name,
+            "access_mode": self.access_mode,
+            "profile_settings": profile,
+            "pragmas": pragmas
+        }
+
     def get_session(self):
-        """Returns an connected session to the database
+        """Returns an connected session to the database. Each thread gets
+            its own session of this connection manager from the cached engine
         """
         LOGGER.debug("Returning the connected session to database")
-        return self.ConnectedSession
+        if self.Session is None:
+            return self.ConnectedSession
+        return self.Session()
 
     def get_inspector(self):
         """Returns an instance of inspector that can be utilized to
@@ -109,14 +348,20 @@ class ConnectionManager(categories.SQLite):
         """
         LOGGER.debug("Returning an instance of 'Inspector'\
                     to browse metadata of DB")
+        if self.inspector is None and self.engine is not None:
+            self.inspector = inspect(self.engine)
         return self.inspector
 
     def disconnect(self):
-        """Closes the connection made with the SQLite database
+        """Closes the session of current thread with the SQLite database,
+            the sessions of other connection managers connected to the same
+            URL are not affected. The engine and its pool stay cached for the
+            next connection
         """
         LOGGER.debug("Closing the open connection to database")
+        if self.Session is not None:
+            self.Session.remove()
         if self.ConnectedSession is not None:
-            self.ConnectedSession.close_all()
             del self.ConnectedSession
 
     def __del__(self):
@@ -4,6 +4,8 @@
     Date: 05/27/2019
 """
 import unittest
+import threading
+from sqlalchemy.exc import OperationalError
 from yapsy.PluginManager import PluginManager
 from bipy.services.db.categories import SQLite
 from bipy.services.utils import Utility
@@ -31,11 +33,77 @@ class ConnectionManagerTestCase(unittest.TestCase):
         except Exception:
             self.fail("Exception thrown while connecting to DB")
 
+    def testPluginRegistry(self):
+        util = Utility()
+        plugins = util.get_all_plugins(self.conf.PATH_CONNECTION_MANAGERS, {'SQLITE': SQLite})
+        assert plugins[0].plugin_object is self.connections[0].plugin_object
+        conn = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, {'SQLITE': SQLite},
+                               new_instance=True)
+        assert conn is not self.connections[0].plugin_object
+        assert conn.__class__ is self.connections[0].plugin_object.__class__
+
+    def testEngineCache(self):
+        util = Utility()
+        conn_1 = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        conn_2 = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        conn_1.connect(self.conf.URL_TEST_DB)
+        conn_2.connect(self.conf.URL_TEST_DB)
+        assert conn_1.get_engine() is conn_2.get_engine()
+        assert conn_1.get_engine().pool.size() == self.conf.SQLITE_POOL.size
+        sessions = []
+        worker = threading.Thread(target=lambda: sessions.append(conn_1.get_session()))
+        worker.start()
+        worker.join()
+        assert conn_1.get_session() is conn_1.get_session()
+        assert conn_1.get_session() is not conn_2.get_session()
+        assert sessions[0] is not conn_1.get_session()
+        session_2 = conn_2.get_session()
+        conn_1.disconnect()
+        assert conn_2.get_session() is session_2
+
+    def testPerformanceProfile(self):
+        util = Utility()
+        conn_1 = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        conn_2 = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        conn_1.connect(self.conf.URL_TEST_DB)
+        conn_2.connect(self.conf.URL_TEST_DB, profile="")
+        info = conn_1.get_engine_info()
+        profile = self.conf.SQLITE_PROFILES.read_heavy_warehouse
+        assert info["profile"] == "read_heavy_warehouse"
+        assert info["pragmas"]["cache_size"] == profile.cache_size
+        assert info["pragmas"]["busy_timeout"] == profile.busy_timeout
+        assert conn_2.get_engine_info()["profile"] is None
+        assert conn_1.get_engine() is not conn_2.get_engine()
+
+    def testReadOnly(self):
+        util = Utility()
+        conn_1 = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        conn_2 = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        conn_1.connect(self.conf.URL_TEST_DB)
+        conn_2.connect(self.conf.URL_TEST_DB, read_only=True, immutable=True)
+        assert conn_1.get_engine_info()["access_mode"] == "ro"
+        assert conn_2.get_engine_info()["access_mode"] == "immutable"
+        with self.assertRaises(OperationalError):
+            conn_1.get_engine().execute("CREATE TABLE READ_ONLY_TEST (ID INTEGER)")
+        counts = []
+        workers = [threading.Thread(target=lambda: counts.append(
+            conn_2.get_engine().execute("SELECT COUNT(*) FROM sqlite_master").scalar()))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert len(set(counts)) == 1 and counts[0] > 0
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(ConnectionManagerTestCase("testPluginCount"))
     suite.addTest(ConnectionManagerTestCase("testPluginName"))
     suite.addTest(ConnectionManagerTestCase("testConnect"))
+    suite.addTest(ConnectionManagerTestCase("testPluginRegistry"))
+    suite.addTest(ConnectionManagerTestCase("testEngineCache"))
+    suite.addTest(ConnectionManagerTestCase("testPerformanceProfile"))
+    suite.addTest(ConnectionManagerTestCase("testReadOnly"))
     return suite
 
 
@@ -0,0 +1,65 @@
+"""
+    Instrumentation of the statements an engine sends to the database, used
+    to assert the number of round trips of repository operations
+    Author: Ajeet Singh
+    Date: 07/18/2019
+"""
+from sqlalchemy import event
+
+
+class StatementCounter:
+    """ Context manager counting the statements executed through an engine
+        while it is open. An `executemany` counts as one statement
+
+    >>> from sqlalchemy import create_engine
+
+    >>> engine = create_engine("sqlite://")
+
+    >>> with StatementCounter(engine) as counter:
+    ...     _ = engine.execute("SELECT 1")
+
+    >>> counter.count
+    1
+    """
+
+    def __init__(self, engine):
+        """Default constructor
+
+            Args:
+                engine (Engine): The engine to instrument
+        """
+        self.engine = engine
+        self.statements = []
+        self.executemany = 0
+
+    def __repr__(self):
+        """Returns string representation
+        """
+        return "Statement Counter [Statements=%d, ExecuteMany=%d]" % (self.count,
+                                                                       self.executemany)
+
+    @property
+    def count(self):
+        """Number of statements executed"""
+        return len(self.statements)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        """Records an statement about to be executed"""
+        self.statements.append(statement)
+        if executemany:
+            self.executemany += 1
+
+    def __enter__(self):
+        """Starts counting"""
+        event.listen(self.engine, "before_cursor_execute", self._before_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stops counting"""
+        event.remove(self.engine, "before_cursor_execute", self._before_execute)
+        return False
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
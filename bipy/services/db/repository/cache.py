@@ -0,0 +1,179 @@
+"""
+    Bounded LRU cache of the repository objects looked up by name or id. One
+    cache is kept per repository engine and shared by the repository managers
+    connected to it, in front of their `get_*` lookups. Only the ids of the
+    objects found are cached, the objects are loaded in the session of the
+    caller. The cache is cleared whenever repository objects are saved,
+    deleted or moved by any session of the engine
+    Author: Ajeet Singh
+    Date: 07/15/2019
+"""
+import threading
+import weakref
+from collections import OrderedDict
+from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from bipy.services.db.repository.meta_objects import AbstractWarehouseObject
+
+
+class LookupCache:
+    """ Least recently used cache of lookups keyed by (type, scope, name or
+        id), where scope is the id of the parent object or None
+
+    >>> cache = LookupCache(2)
+
+    >>> cache.put(("table", 1, "SALES"), "sales")
+
+    >>> cache.get(("table", 1, "SALES"))
+    (True, 'sales')
+
+    >>> cache.get(("table", None, "SALES"))
+    (False, None)
+
+    >>> cache.stats()["hits"], cache.stats()["misses"]
+    (1, 1)
+    """
+
+    def __init__(self, max_size=1024):
+        """Default constructor
+
+            Args:
+                max_size (int): Max number of entries, 0 disables the cache
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        """Returns string representation
+        """
+        return "Lookup Cache [Size=%d, MaxSize=%d, Hits=%d, Misses=%d]" % (
+            len(self.__entries), self.max_size, self.hits, self.misses)
+
+    def __len__(self):
+        """Returns number of cached entries"""
+        return len(self.__entries)
+
+    def get(self, key):
+        """ Returns tuple (found, value) of the key, the entry becomes the
+            most recently used
+
+            Args:
+                key (Tuple): (type, scope, name or id)
+        """
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return True, self.__entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        """ Caches the value, the least recently used entry is evicted if the
+            cache is full
+
+            Args:
+                key (Tuple): (type, scope, name or id)
+                value (object): The object found by the lookup
+        """
+        if self.max_size <= 0:
+            return
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self):
+        """Removes all entries, the counters are kept"""
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self):
+        """Returns dict with the `hits`, `misses`, `size` and `max_size`"""
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self.__entries), "max_size": self.max_size}
+
+
+# lookup caches by repository engine
+_CACHES = weakref.WeakKeyDictionary()
+_LOCK = threading.Lock()
+
+
+def get_cache(engine, max_size=1024):
+    """ Returns the lookup cache of a repository engine, it is created on
+        first use
+
+        Args:
+            engine (Engine): The engine of the repository
+            max_size (int): Max number of entries of a new cache
+    """
+    cache = _CACHES.get(engine)
+    if cache is None:
+        with _LOCK:
+            cache = _CACHES.get(engine)
+            if cache is None:
+                cache = _CACHES[engine] = LookupCache(max_size)
+    return cache
+
+
+def invalidate(engine):
+    """ Clears the lookup cache of a repository engine, if any
+
+        Args:
+            engine (Engine): The engine of the repository
+    """
+    cache = _CACHES.get(engine)
+    if cache is not None:
+        cache.invalidate()
+
+
+def cached_lookup(object_type):
+    """ Decorator of the lookup methods `method(self, param[, parent])` of
+        the repository manager, the ids of the objects found are cached in
+        `self.lookup_cache` by (object_type, parent id, param) and the cached
+        objects are loaded with `self.load_object(cls, id)`. Lookups which
+        find nothing or are scoped by a parent not saved yet are not cached
+
+        Args:
+            object_type (String): Type of the looked up object (e.g., table)
+    """
+    def decorator(method):
+        @wraps(method)
+        def lookup(self, param, *args, **kwargs):
+            parent = args[0] if args else next(iter(kwargs.values()), None)
+            if parent is not None and parent.id is None:
+                return method(self, param, *args, **kwargs)
+            key = (object_type, parent.id if parent is not None else None, param)
+            found, identity = self.lookup_cache.get(key)
+            if found:
+                obj = self.load_object(*identity)
+                if obj is not None:
+                    return obj
+            obj = method(self, param, *args, **kwargs)
+            if obj is not None and obj.id is not None:
+                self.lookup_cache.put(key, (type(obj), obj.id))
+            return obj
+        return lookup
+    return decorator
+
+
+def _after_flush(session, flush_context):
+    """Clears the lookup cache of the engine of an session which has saved,
+        deleted or moved repository objects
+    """
+    if any(isinstance(obj, AbstractWarehouseObject)
+           for objs in (session.new, session.dirty, session.deleted) for obj in objs):
+        invalidate(session.get_bind())
+
+
+event.listen(Session, "after_flush", _after_flush)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
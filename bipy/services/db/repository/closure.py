@@ -0,0 +1,181 @@
+"""
+    Closure table of the warehouse hierarchy stored in repository. Every
+    object (database, schema, table, view, materialized view or column) has
+    one row per ancestor, so subtree and ancestor queries are one indexed
+    lookup whatever the depth. The rows are maintained incrementally on
+    every flush of the objects inserted, moved (attached to or detached from
+    a parent) and deleted, and by `link_all` for the rows inserted in bulk
+    with Core statements
+    Author: Ajeet Singh
+    Date: 07/19/2019
+"""
+from collections import OrderedDict
+from sqlalchemy import event, inspect, select, and_, or_, bindparam
+from sqlalchemy.orm import Session
+from bipy.services.db.repository.meta_objects import WarehouseDatabase, WarehouseSchema
+from bipy.services.db.repository.meta_objects import WarehouseTable, WarehouseView
+from bipy.services.db.repository.meta_objects import WarehouseMaterializedView, WarehouseColumn
+from bipy.services.db.repository.meta_objects import WarehouseObjectClosure
+from bipy.logging import logger
+
+
+LOGGER = logger.get_logger(__name__)
+# node type of the classes in the hierarchy, parents first
+NODE_TYPES = OrderedDict([
+    (WarehouseDatabase, "database"),
+    (WarehouseSchema, "schema"),
+    (WarehouseTable, "table"),
+    (WarehouseView, "view"),
+    (WarehouseMaterializedView, "mview"),
+    (WarehouseColumn, "column")
+])
+# FKs referring the parent of each class along with the class of the parent,
+# the first FK set is the parent
+PARENTS = {
+    WarehouseSchema: [("database_id", WarehouseDatabase)],
+    WarehouseTable: [("schema_id", WarehouseSchema)],
+    WarehouseView: [("schema_id", WarehouseSchema)],
+    WarehouseMaterializedView: [("schema_id", WarehouseSchema)],
+    WarehouseColumn: [("table_id", WarehouseTable), ("view_id", WarehouseView),
+                      ("mview_id", WarehouseMaterializedView)]
+}
+
+_CLOSURE = WarehouseObjectClosure.__table__
+_PARENT = _CLOSURE.alias("p")
+_SUBTREE = _CLOSURE.alias("d")
+_ANCESTOR = _CLOSURE.alias("a")
+_COLUMNS = ["ancestor_type", "ancestor_id", "descendant_type", "descendant_id", "depth"]
+# self row of an object
+_INSERT_SELF = _CLOSURE.insert().values(
+    ancestor_type=bindparam("node_type"), ancestor_id=bindparam("node_id"),
+    descendant_type=bindparam("node_type"), descendant_id=bindparam("node_id"), depth=0)
+# links the subtree of an object to the ancestors of its parent
+_ATTACH = _CLOSURE.insert().from_select(_COLUMNS, select([
+    _PARENT.c.ancestor_type, _PARENT.c.ancestor_id, _SUBTREE.c.descendant_type,
+    _SUBTREE.c.descendant_id, _PARENT.c.depth + _SUBTREE.c.depth + 1
+]).where(and_(_PARENT.c.descendant_type == bindparam("parent_type"),
+              _PARENT.c.descendant_id == bindparam("parent_id"),
+              _SUBTREE.c.ancestor_type == bindparam("node_type"),
+              _SUBTREE.c.ancestor_id == bindparam("node_id"))))
+# unlinks the subtree of an object from the ancestors above the object
+_DETACH = _CLOSURE.delete().where(_CLOSURE.c.id.in_(select([_ANCESTOR.c.id]).select_from(
+    _SUBTREE.join(_ANCESTOR, and_(_ANCESTOR.c.descendant_type == _SUBTREE.c.descendant_type,
+                                  _ANCESTOR.c.descendant_id == _SUBTREE.c.descendant_id,
+                                  _ANCESTOR.c.depth > _SUBTREE.c.depth)))
+    .where(and_(_SUBTREE.c.ancestor_type == bindparam("node_type"),
+                _SUBTREE.c.ancestor_id == bindparam("node_id")))))
+# rows of an (already detached) object
+_DELETE = _CLOSURE.delete().where(or_(
+    and_(_CLOSURE.c.ancestor_type == bindparam("node_type"),
+         _CLOSURE.c.ancestor_id == bindparam("node_id")),
+    and_(_CLOSURE.c.descendant_type == bindparam("node_type"),
+         _CLOSURE.c.descendant_id == bindparam("node_id"))))
+
+
+def node_type(cls):
+    """Returns the node type of a class of the hierarchy or None"""
+    return NODE_TYPES.get(cls)
+
+
+def get_parent(obj):
+    """ Returns tuple (parent type, parent id) of an object as per its FKs or
+        (None, None) if no parent is set
+
+        Args:
+            obj (AbstractWarehouseObject): An object of the hierarchy
+    """
+    values = obj.__dict__
+    for fk_attr, parent_cls in PARENTS.get(type(obj), []):
+        if values.get(fk_attr) is not None:
+            return NODE_TYPES[parent_cls], values[fk_attr]
+    return None, None
+
+
+def _params(obj):
+    """Returns the bind params of the statements for an object"""
+    parent_type, parent_id = get_parent(obj)
+    return {"node_type": NODE_TYPES[type(obj)], "node_id": obj.id,
+            "parent_type": parent_type, "parent_id": parent_id}
+
+
+def link_all(conn, objs):
+    """ Adds the rows of new objects, e.g., the objects inserted by
+        `RepositoryManager.bulk_save_all`. Parents must precede their
+        children in the list. Runs two `executemany` statements whatever the
+        number of objects
+
+        Args:
+            conn (Connection): The connection of the transaction inserting the objects
+            objs (List): New objects of the hierarchy with their ids set
+    """
+    params = [_params(obj) for obj in objs if type(obj) in NODE_TYPES]
+    if not params:
+        return
+    conn.execute(_INSERT_SELF, params)
+    linked = [param for param in params if param["parent_id"] is not None]
+    if linked:
+        conn.execute(_ATTACH, linked)
+    LOGGER.debug("Closure rows of %d objects added" % len(params))
+
+
+def rebuild(conn):
+    """ Rebuilds the closure table from the FKs of all objects stored in
+        repository, with one `INSERT ... SELECT` per level
+
+        Args:
+            conn (Connection): An SQLAlchemy connection to repository
+    """
+    conn.execute(_CLOSURE.delete())
+    for cls, cls_type in NODE_TYPES.items():
+        table = cls.__table__
+        conn.execute(_CLOSURE.insert().from_select(_COLUMNS, select([
+            bindparam("t1", cls_type), table.c.id, bindparam("t2", cls_type),
+            table.c.id.label("descendant_id"), bindparam("d", 0)])))
+        for fk_attr, parent_cls in PARENTS.get(cls, []):
+            conn.execute(_CLOSURE.insert().from_select(_COLUMNS, select([
+                _PARENT.c.ancestor_type, _PARENT.c.ancestor_id, bindparam("t", cls_type),
+                table.c.id, _PARENT.c.depth + 1
+            ]).select_from(table.join(_PARENT, and_(
+                _PARENT.c.descendant_type == NODE_TYPES[parent_cls],
+                _PARENT.c.descendant_id == table.c[fk_attr])))))
+    LOGGER.debug("Closure table of repository rebuilt")
+
+
+def is_empty(conn):
+    """Returns True if the closure table has no rows"""
+    return conn.execute(select([_CLOSURE.c.id]).limit(1)).first() is None
+
+
+def _level(obj):
+    """Returns the position of the class of an object in the hierarchy"""
+    return _LEVELS[type(obj)]
+
+
+def _after_flush(session, flush_context):
+    """ Updates the closure for the objects of the hierarchy flushed by the
+        unit of work. Deleted objects are removed first, then new objects are
+        linked (parents first, with two `executemany` statements) and finally
+        the subtrees of objects whose parent FK has changed are moved
+    """
+    deleted = [obj for obj in session.deleted if type(obj) in NODE_TYPES]
+    new = sorted((obj for obj in session.new if type(obj) in NODE_TYPES), key=_level)
+    moved = sorted((obj for obj in session.dirty if type(obj) in PARENTS
+                    and any(inspect(obj).attrs[fk_attr].history.has_changes()
+                            for fk_attr, _ in PARENTS[type(obj)])), key=_level)
+    if not (deleted or new or moved):
+        return
+    conn = session.connection()
+    for obj in deleted:
+        params = _params(obj)
+        conn.execute(_DETACH, params)
+        conn.execute(_DELETE, params)
+    link_all(conn, new)
+    for obj in moved:
+        params = _params(obj)
+        conn.execute(_DETACH, params)
+        if params["parent_id"] is not None:
+            conn.execute(_ATTACH, params)
+
+
+_LEVELS = dict((cls, level) for level, cls in enumerate(NODE_TYPES))
+event.listen(Session, "after_flush", _after_flush)
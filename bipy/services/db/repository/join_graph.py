@@ -0,0 +1,340 @@
+"""
+    Join graph of the tables of an schema built from the FKs stored in
+    repository. The graph is kept in memory as adjacency lists, so join paths
+    between any two tables (e.g., from a fact to its dimensions) are found
+    without reading the repository. Graphs are cached per schema, per
+    repository engine, until a flush or bulk save touches the schema, its
+    tables (e.g., their number of rows) or FKs
+    Author: Ajeet Singh
+    Date: 07/20/2019
+"""
+import heapq
+import threading
+import weakref
+from collections import deque, namedtuple
+from itertools import chain
+from sqlalchemy import and_, event, inspect
+from sqlalchemy.orm import Session
+from bipy.services.db.repository.meta_objects import WarehouseSchema, WarehouseTable
+from bipy.services.db.repository.meta_objects import WarehouseForeignKey
+from bipy.services.utils import Utility
+from bipy.logging import logger
+
+
+LOGGER = logger.get_logger(__name__)
+# an FK traversed in either direction, the columns of `from_table` are
+# joined with the columns of `to_table` in order
+JoinEdge = namedtuple("JoinEdge", ["from_table", "to_table", "from_columns", "to_columns",
+                                   "foreign_key_id"])
+# join graphs by schema id by repository engine
+_GRAPHS = weakref.WeakKeyDictionary()
+_LOCK = threading.Lock()
+
+
+class JoinGraph:
+    """ Undirected graph of tables joined by their FKs. Paths are lists of
+        `JoinEdge` from the source table to the target table. The shortest
+        path has the fewest joins, the cheapest path joins the fewest rows,
+        i.e., the cost of an edge is the number of rows of the table it joins.
+        The paths found from a source are cached for all targets
+
+    >>> graph = JoinGraph({1: ("SALES", 1000), 2: ("CUSTOMER", 10), 3: ("PRODUCT", 50)},
+    ...                   [(1, 1, ["customer_id"], 2, ["id"]),
+    ...                    (2, 1, ["product_id"], 3, ["id"])])
+
+    >>> [(edge.from_table, edge.to_table) for edge in graph.shortest_path("CUSTOMER", "PRODUCT")]
+    [(2, 1), (1, 3)]
+    >>> graph.shortest_path(2, 1)[0].from_columns
+    ('id',)
+    >>> graph.path_cost(graph.cheapest_path("SALES", "PRODUCT"))
+    50
+    """
+
+    def __init__(self, tables, foreign_keys):
+        """Default constructor
+
+            Args:
+                tables (Dict): Table id to tuple of (name, number of rows)
+                foreign_keys (List): Tuples of (FK id, table id, constrained
+                                     columns, referred table id, referred columns)
+        """
+        self.tables = tables
+        self.adjacency = dict((table_id, []) for table_id in tables)
+        self.__names = dict((str(name).upper(), table_id)
+                            for table_id, (name, _) in tables.items())
+        self.__trees = {}
+        self.__lock = threading.Lock()
+        for fk_id, table_id, columns, referred_id, referred_columns in foreign_keys:
+            if table_id == referred_id or table_id not in tables or referred_id not in tables:
+                continue
+            columns, referred_columns = tuple(columns), tuple(referred_columns)
+            self.adjacency[table_id].append(
+                JoinEdge(table_id, referred_id, columns, referred_columns, fk_id))
+            self.adjacency[referred_id].append(
+                JoinEdge(referred_id, table_id, referred_columns, columns, fk_id))
+
+    def __repr__(self):
+        """Returns string representation
+        """
+        return "Join Graph [Tables=%d, ForeignKeys=%d, CachedSources=%d]" % (
+            len(self.tables), sum(len(edges) for edges in self.adjacency.values()) // 2,
+            len(self.__trees))
+
+    def __len__(self):
+        """Returns number of tables in the graph"""
+        return len(self.tables)
+
+    def table_id(self, table):
+        """ Returns the id of a table in the graph
+
+            Args:
+                table (WarehouseTable/int/str): The table or its id or name
+        """
+        if isinstance(table, WarehouseTable):
+            table = table.id
+        if isinstance(table, str):
+            table = self.__names.get(table.upper())
+        if table not in self.tables:
+            raise KeyError("Table '%s' not found in join graph" % table)
+        return table
+
+    def cost(self, table_id):
+        """Returns the cost of joining an table, i.e., its number of rows"""
+        return max(1, self.tables[table_id][1] or 0)
+
+    def path_cost(self, path):
+        """Returns the cost of the joins of an path"""
+        return sum(self.cost(edge.to_table) for edge in path)
+
+    def shortest_path(self, source, target):
+        """ Returns the path with the fewest joins from source to target table,
+            an empty list for the same table or None if they are not joined
+
+            Args:
+                source (WarehouseTable/int/str): The table to join from
+                target (WarehouseTable/int/str): The table to join to
+        """
+        return self._path("shortest", source, target)
+
+    def cheapest_path(self, source, target):
+        """ Returns the path joining the fewest rows from source to target
+            table, an empty list for the same table or None if they are not
+            joined
+
+            Args:
+                source (WarehouseTable/int/str): The table to join from
+                target (WarehouseTable/int/str): The table to join to
+        """
+        return self._path("cheapest", source, target)
+
+    def join_path(self, tables, cheapest=False):
+        """ Returns the edges joining all tables to the first one, e.g., an
+            fact with its dimensions. Edges shared by the paths are returned
+            once, in the order of the joins. Returns None if an table is not
+            joined with the first one
+
+            Args:
+                tables (List): The tables (objects, ids or names), first one
+                               being the table to join from
+                cheapest (bool): Joins by the cheapest paths instead of the
+                                 shortest ones
+        """
+        source = tables[0]
+        edges = []
+        joined = set([self.table_id(source)])
+        for table in tables[1:]:
+            path = self.cheapest_path(source, table) if cheapest \
+                else self.shortest_path(source, table)
+            if path is None:
+                return None
+            for edge in path:
+                if edge.to_table not in joined:
+                    joined.add(edge.to_table)
+                    edges.append(edge)
+        return edges
+
+    def precompute(self):
+        """ Finds the shortest and cheapest paths between all pairs of tables,
+            after which every path lookup is served from the cache
+        """
+        for table_id in self.tables:
+            self._tree("shortest", table_id)
+            self._tree("cheapest", table_id)
+        LOGGER.debug("Paths between all pairs of %d tables found" % len(self.tables))
+
+    def _path(self, kind, source, target):
+        """Returns the path from source to target as per the paths cached
+            for the source
+        """
+        source, target = self.table_id(source), self.table_id(target)
+        tree = self._tree(kind, source)
+        if target not in tree:
+            return None
+        path = []
+        while target != source:
+            edge = tree[target]
+            path.append(edge)
+            target = edge.from_table
+        path.reverse()
+        return path
+
+    def _tree(self, kind, source):
+        """ Returns dict of each table reachable from the source to the last
+            edge of its path from the source, cached per (kind, source)
+        """
+        key = (kind, source)
+        tree = self.__trees.get(key)
+        if tree is not None:
+            return tree
+        if kind == "shortest":
+            tree = self._breadth_first(source)
+        else:
+            tree = self._dijkstra(source)
+        with self.__lock:
+            self.__trees[key] = tree
+        return tree
+
+    def _breadth_first(self, source):
+        """Returns the tree of the paths with fewest joins from the source"""
+        tree = {source: None}
+        queue = deque([source])
+        while queue:
+            table_id = queue.popleft()
+            for edge in self.adjacency[table_id]:
+                if edge.to_table not in tree:
+                    tree[edge.to_table] = edge
+                    queue.append(edge.to_table)
+        return tree
+
+    def _dijkstra(self, source):
+        """Returns the tree of the paths joining fewest rows from the source"""
+        tree = {source: None}
+        costs = {source: 0}
+        done = set()
+        heap = [(0, source)]
+        while heap:
+            cost, table_id = heapq.heappop(heap)
+            if table_id in done:
+                continue
+            done.add(table_id)
+            for edge in self.adjacency[table_id]:
+                new_cost = cost + self.cost(edge.to_table)
+                if edge.to_table not in costs or new_cost < costs[edge.to_table]:
+                    costs[edge.to_table] = new_cost
+                    tree[edge.to_table] = edge
+                    heapq.heappush(heap, (new_cost, edge.to_table))
+        return tree
+
+
+def load_join_graph(session, schema):
+    """ Builds the join graph of an schema from the tables and FKs stored in
+        repository with two queries
+
+        Args:
+            session (Session): An session of the repository
+            schema (WarehouseSchema): An schema stored in repository
+    """
+    tables = dict((table_id, (name, rows)) for table_id, name, rows in
+                  session.query(WarehouseTable.id, WarehouseTable.name,
+                                WarehouseTable.number_of_rows)
+                  .filter(WarehouseTable.schema_id == schema.id))
+    foreign_keys = [(fk_id, table_id, columns.split(","), referred_id, referred.split(","))
+                    for fk_id, table_id, columns, referred_id, referred in
+                    session.query(WarehouseForeignKey.id, WarehouseForeignKey.table_id,
+                                  WarehouseForeignKey.constrained_columns,
+                                  WarehouseForeignKey.referred_table_id,
+                                  WarehouseForeignKey.referred_columns)
+                    .join(WarehouseTable, WarehouseForeignKey.table_id == WarehouseTable.id)
+                    .filter(and_(WarehouseTable.schema_id == schema.id,
+                                 WarehouseForeignKey.referred_table_id.isnot(None)))]
+    return JoinGraph(tables, foreign_keys)
+
+
+def get_join_graph(session, schema):
+    """ Returns the cached join graph of an schema, it is built on first use.
+        Paths between all pairs of tables are found up front for schemas with
+        up to `JOIN_GRAPH.precompute_max_tables` tables
+
+        Args:
+            session (Session): An session of the repository
+            schema (WarehouseSchema): An schema stored in repository
+    """
+    engine = session.get_bind()
+    graph = _GRAPHS.get(engine, {}).get(schema.id)
+    if graph is not None:
+        return graph
+    graph = load_join_graph(session, schema)
+    conf = Utility().CONFIG.get("JOIN_GRAPH")
+    max_tables = conf.get("precompute_max_tables", 200) if conf is not None else 200
+    if len(graph) <= max_tables:
+        graph.precompute()
+    with _LOCK:
+        _GRAPHS.setdefault(engine, {})[schema.id] = graph
+    LOGGER.debug("Join graph of schema '%s' built: %s" % (schema.name, graph))
+    return graph
+
+
+def invalidate(schema_id=None, engine=None):
+    """ Drops the cached join graph of an schema, e.g., once the schema is
+        re-synced, or of all schemas
+
+        Args:
+            schema_id (int): Id of the schema, None drops all graphs
+            engine (Engine): Engine of the repository, None drops the graphs
+                             of all repositories
+    """
+    with _LOCK:
+        if engine is None:
+            all_graphs = list(_GRAPHS.values())
+        else:
+            all_graphs = [_GRAPHS.get(engine, {})]
+        for graphs in all_graphs:
+            if schema_id is None:
+                graphs.clear()
+            else:
+                graphs.pop(schema_id, None)
+
+
+def invalidate_objects(engine, objs):
+    """ Drops the cached join graphs of the schemas of the schemas, tables
+        and FKs passed as param. The row counts of the tables are the costs
+        of the cheapest paths and SQLite reuses the ids of deleted schemas,
+        so any change to them makes the graph stale. All graphs of the
+        repository are dropped if the schema of an object is not known
+
+        Args:
+            engine (Engine): Engine of the repository
+            objs (List): Saved, deleted or moved repository objects
+    """
+    schema_ids = set()
+    for obj in objs:
+        if isinstance(obj, WarehouseSchema):
+            schema_ids.add(obj.__dict__.get("id"))
+        elif isinstance(obj, WarehouseTable):
+            schema_ids.add(obj.__dict__.get("schema_id"))
+            # the schema a table is moved from
+            schema_ids.update(inspect(obj).attrs.schema_id.history.deleted or ())
+        elif isinstance(obj, WarehouseForeignKey):
+            table = obj.__dict__.get("table")
+            schema_ids.add(table.__dict__.get("schema_id") if table is not None else None)
+    if None in schema_ids:
+        invalidate(engine=engine)
+        return
+    for schema_id in schema_ids:
+        invalidate(schema_id, engine)
+
+
+def _after_flush(session, flush_context):
+    """Drops the join graphs of the schemas flushed by the unit of work"""
+    objs = [obj for obj in chain(session.new, session.dirty, session.deleted)
+            if isinstance(obj, (WarehouseSchema, WarehouseTable, WarehouseForeignKey))]
+    if objs:
+        invalidate_objects(session.get_bind(), objs)
+
+
+event.listen(Session, "after_flush", _after_flush)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -5,7 +5,8 @@
  Date: 5/13/2019
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Sequence, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Sequence, Boolean, ForeignKey, DateTime, Float
+from sqlalchemy import LargeBinary, Index
 from sqlalchemy.ext.declarative import declarative_base, AbstractConcreteBase
 from sqlalchemy.orm import relationship
 from bipy.services.db.repository.types import DataTypes, ViewTypes
@@ -54,6 +55,9 @@ class WarehouseSchema(AbstractWarehouseObject):
     """ Represents an warehouse schema available in target database"
     """
     __tablename__ = 'repository_warehouse_schemas'
+    # names are unique within the parent, lookups by name seek these indexes
+    __table_args__ = (Index('ux_repository_warehouse_schemas_name', 'database_id', 'name',
+                            unique=True),)
 
     can_use_as_prefix = Column(Boolean, default=True)
     is_temp_schema = Column(Boolean, default=False)
@@ -74,11 +78,18 @@ class WarehouseTable(AbstractWarehouseObject):
     """Represents an table in the target warehouse database
     """
     __tablename__ = 'repository_warehouse_tables'
+    __table_args__ = (Index('ux_repository_warehouse_tables_name', 'schema_id', 'name',
+                            unique=True),)
 
     number_of_columns = Column(Integer, default=0)
     number_of_rows = Column(Integer, default=0)
     contains_numeric_column = Column(Boolean, default=True)
-    columns = relationship("WarehouseColumn", backref="repository_warehouse_tables")
+    columns = relationship("WarehouseColumn", backref="repository_warehouse_tables",
+                           order_by="WarehouseColumn.id")
+    foreign_keys = relationship("WarehouseForeignKey", backref="table",
+                                foreign_keys="WarehouseForeignKey.table_id",
+                                order_by="WarehouseForeignKey.id",
+                                cascade="all, delete-orphan")
     schema_id = Column(Integer, ForeignKey("repository_warehouse_schemas.id"))
 
     def __repr__(self):
@@ -93,11 +104,16 @@ class WarehouseView(AbstractWarehouseObject):
     """Represents an view in the target warehouse database
     """
     __tablename__ = 'repository_warehouse_views'
+    __table_args__ = (Index('ux_repository_warehouse_views_name', 'schema_id', 'name',
+                            unique=True),)
 
     number_of_columns = Column(Integer, default=0)
     number_of_rows = Column(Integer, default=0)
     contains_numeric_column = Column(Boolean, default=True)
-    columns = relationship("WarehouseColumn", backref="repository_warehouse_views")
+    columns = relationship("WarehouseColumn", backref="repository_warehouse_views",
+                           order_by="WarehouseColumn.id")
+    dependencies = relationship("WarehouseViewDependency", backref="view",
+                                cascade="all, delete-orphan")
     sql = Column(String(4000))
     schema_id = Column(Integer, ForeignKey("repository_warehouse_schemas.id"))
 
@@ -113,11 +129,14 @@ class WarehouseMaterializedView(AbstractWarehouseObject):
     """Represents an materialized view in the target database
     """
     __tablename__ = 'repository_warehouse_mviews'
+    __table_args__ = (Index('ux_repository_warehouse_mviews_name', 'schema_id', 'name',
+                            unique=True),)
 
     number_of_columns = Column(Integer, default=0)
     number_of_rows = Column(Integer, default=0)
     contains_numeric_column = Column(Boolean, default=True)
-    columns = relationship("WarehouseColumn", backref="repository_warehouse_mviews")
+    columns = relationship("WarehouseColumn", backref="repository_warehouse_mviews",
+                           order_by="WarehouseColumn.id")
     sql = Column(String(4000))
     is_stale = Column(Boolean, default=False)
     last_refreshed_at = Column(DateTime)
@@ -136,6 +155,12 @@ class WarehouseColumn(AbstractWarehouseObject):
     """Represents an column of a table in the target warehouse database
     """
     __tablename__ = 'repository_warehouse_columns'
+    __table_args__ = (Index('ux_repository_warehouse_columns_table_name', 'table_id', 'name',
+                            unique=True),
+                      Index('ux_repository_warehouse_columns_view_name', 'view_id', 'name',
+                            unique=True),
+                      Index('ux_repository_warehouse_columns_mview_name', 'mview_id', 'name',
+                            unique=True))
 
     column_type = Column(Integer, default=DataTypes.STRING.value)
     scale = Column(String(255))
@@ -215,3 +240,172 @@ class WarehouseFunction(AbstractWarehouseObject):
         return ("Warehouse Function [Name=%s, SchemaId=%d, PackageId=%d]") % (
             self.name, self.schema_id if self.schema_id != None else -1,
             self.package_id if self.package_id != None else -1)
+
+
+class WarehouseTableStatistics(Base):
+    """Statistics of an warehouse table as collected by the statistics
+        collector at `collected_on`
+    """
+    __tablename__ = 'repository_warehouse_table_stats'
+
+    id = Column(Integer, Sequence('repo_warehouse_table_stats_id_seq'), primary_key=True)
+    table_id = Column(Integer, ForeignKey("repository_warehouse_tables.id"), index=True)
+    row_count = Column(Integer, default=0)
+    is_sampled = Column(Boolean, default=False)
+    sample_size = Column(Integer, default=0)
+    collected_on = Column(DateTime, default=datetime.utcnow)
+    table = relationship("WarehouseTable")
+    columns = relationship("WarehouseColumnStatistics", backref="table_statistics",
+                           cascade="all, delete-orphan")
+
+    def __repr__(self):
+        """String representation
+        """
+        return "Warehouse Table Statistics [TableId=%d, Rows=%d, Sampled=%s]" % (
+            self.table_id if self.table_id is not None else -1,
+            self.row_count if self.row_count is not None else 0, self.is_sampled)
+
+
+class WarehouseColumnStatistics(Base):
+    """Statistics of an warehouse column, the distinct count is an estimate
+        if the table statistics were collected from a sample
+    """
+    __tablename__ = 'repository_warehouse_column_stats'
+
+    id = Column(Integer, Sequence('repo_warehouse_column_stats_id_seq'), primary_key=True)
+    table_stats_id = Column(Integer, ForeignKey("repository_warehouse_table_stats.id"),
+                            index=True)
+    column_id = Column(Integer, ForeignKey("repository_warehouse_columns.id"), index=True)
+    null_fraction = Column(Float, default=0.0)
+    min_value = Column(String(255))
+    max_value = Column(String(255))
+    distinct_count = Column(Integer, default=0)
+    collected_on = Column(DateTime, default=datetime.utcnow)
+    column = relationship("WarehouseColumn")
+
+    def __repr__(self):
+        """String representation
+        """
+        return "Warehouse Column Statistics [ColumnId=%d, Distinct=%d, NullFraction=%.2f]" % (
+            self.column_id if self.column_id is not None else -1,
+            self.distinct_count if self.distinct_count is not None else 0,
+            self.null_fraction if self.null_fraction is not None else 0.0)
+
+
+class WarehouseColumnSketch(Base):
+    """Distinct count sketch (HyperLogLog registers) of an warehouse column
+        along with the number of rows it has seen. Sketches of the rows
+        loaded later are merged into it
+    """
+    __tablename__ = 'repository_warehouse_column_sketches'
+
+    id = Column(Integer, Sequence('repo_warehouse_column_sketch_id_seq'), primary_key=True)
+    column_id = Column(Integer, ForeignKey("repository_warehouse_columns.id"),
+                       index=True, unique=True)
+    precision = Column(Integer, default=12)
+    registers = Column(LargeBinary)
+    row_count = Column(Integer, default=0)
+    distinct_count = Column(Integer, default=0)
+    updated_on = Column(DateTime, default=datetime.utcnow)
+    column = relationship("WarehouseColumn")
+
+    def __repr__(self):
+        """String representation
+        """
+        return "Warehouse Column Sketch [ColumnId=%d, Rows=%d, Distinct=%d]" % (
+            self.column_id if self.column_id is not None else -1,
+            self.row_count if self.row_count is not None else 0,
+            self.distinct_count if self.distinct_count is not None else 0)
+
+
+class WarehouseObjectFingerprint(Base):
+    """Fingerprint (hash of the DDL) of an warehouse table or view as of the
+        last sync, used to skip unchanged objects on re-sync
+    """
+    __tablename__ = 'repository_warehouse_fingerprints'
+
+    id = Column(Integer, Sequence('repo_warehouse_fingerprint_id_seq'), primary_key=True)
+    schema_id = Column(Integer, ForeignKey("repository_warehouse_schemas.id"), index=True)
+    object_type = Column(String(32))
+    object_name = Column(String(255))
+    fingerprint = Column(String(64))
+    synced_on = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        """String representation
+        """
+        return "Warehouse Object Fingerprint [Name=%s, Type=%s, SchemaId=%d]" % (
+            self.object_name, self.object_type,
+            self.schema_id if self.schema_id is not None else -1)
+
+
+class WarehouseViewDependency(Base):
+    """Base table read by an warehouse view, the table id is not set if the
+        table is not stored in repository
+    """
+    __tablename__ = 'repository_warehouse_view_dependencies'
+
+    id = Column(Integer, Sequence('repo_warehouse_view_dependency_id_seq'), primary_key=True)
+    view_id = Column(Integer, ForeignKey("repository_warehouse_views.id"), index=True)
+    table_id = Column(Integer, ForeignKey("repository_warehouse_tables.id"), index=True)
+    table_name = Column(String(255))
+    table = relationship("WarehouseTable")
+
+    def __repr__(self):
+        """String representation
+        """
+        return "Warehouse View Dependency [ViewId=%d, Table=%s, TableId=%d]" % (
+            self.view_id if self.view_id is not None else -1, self.table_name,
+            self.table_id if self.table_id is not None else -1)
+
+
+class WarehouseForeignKey(Base):
+    """FK of an warehouse table, the columns are stored comma separated in
+        the order of declaration. The referred table id is not set if the
+        table is not stored in repository
+    """
+    __tablename__ = 'repository_warehouse_foreign_keys'
+
+    id = Column(Integer, Sequence('repo_warehouse_foreign_key_id_seq'), primary_key=True)
+    name = Column(String(255))
+    table_id = Column(Integer, ForeignKey("repository_warehouse_tables.id"), index=True)
+    constrained_columns = Column(String(1000))
+    referred_table_id = Column(Integer, ForeignKey("repository_warehouse_tables.id"),
+                               index=True)
+    referred_table_name = Column(String(255))
+    referred_columns = Column(String(1000))
+    referred_table = relationship("WarehouseTable", foreign_keys=[referred_table_id])
+
+    def __repr__(self):
+        """String representation
+        """
+        return "Warehouse Foreign Key [TableId=%d, Columns=%s, Referred=%s(%s)]" % (
+            self.table_id if self.table_id is not None else -1, self.constrained_columns,
+            self.referred_table_name, self.referred_columns)
+
+
+class WarehouseObjectClosure(Base):
+    """ Closure of the warehouse hierarchy (database, schemas, tables, views
+        and columns), one row per pair of an object and each of its
+        ancestors, including the object itself at depth 0. Objects are
+        referred by type and id as the ids are unique per type only
+    """
+    __tablename__ = 'repository_warehouse_closure'
+    __table_args__ = (Index('ix_repository_warehouse_closure_ancestor', 'ancestor_type',
+                            'ancestor_id', 'descendant_type', 'descendant_id'),
+                      Index('ix_repository_warehouse_closure_descendant', 'descendant_type',
+                            'descendant_id', 'ancestor_type'))
+
+    id = Column(Integer, Sequence('repo_warehouse_closure_id_seq'), primary_key=True)
+    ancestor_type = Column(String(32))
+    ancestor_id = Column(Integer)
+    descendant_type = Column(String(32))
+    descendant_id = Column(Integer)
+    depth = Column(Integer, default=0)
+
+    def __repr__(self):
+        """String representation
+        """
+        return "Warehouse Object Closure [Ancestor=%s:%d, Descendant=%s:%d, Depth=%d]" % (
+            self.ancestor_type, self.ancestor_id, self.descendant_type,
+            self.descendant_id, self.depth)
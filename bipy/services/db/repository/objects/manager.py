@@ -3,14 +3,45 @@
     Author: Ajeet Singh
     Date: 05/31/2019
 """
-from bipy.services.db import categories
+from collections import deque
+from contextlib import contextmanager
+from sqlalchemy import inspect, select, func, and_
+from sqlalchemy.orm import make_transient_to_detached, selectinload
+from bipy.services.db import categories, unit_of_work
 from bipy.services.db.repository.meta_objects import WarehouseDatabase, WarehouseSchema
 from bipy.services.db.repository.meta_objects import WarehouseTable, WarehouseColumn
-from bipy.services.db.repository.meta_objects import WarehouseView
+from bipy.services.db.repository.meta_objects import WarehouseView, WarehouseViewDependency
+from bipy.services.db.repository.meta_objects import WarehouseObjectClosure, WarehouseForeignKey
+from bipy.services.db.repository import closure, join_graph
+from bipy.services.db.repository import cache
+from bipy.services.db.repository.cache import cached_lookup
+from bipy.services.db.repository.tree import database_node
+from bipy.services.db.repository.setup import setup_repository
+from bipy.services.utils import Utility
 from bipy.logging import logger
 
 
 LOGGER = logger.get_logger(__name__)
+# classes saved by `bulk_save_all` in the order of insert (parents first)
+# along with their child collections and the FK set on the children
+_BULK_ORDER = [WarehouseDatabase, WarehouseSchema, WarehouseTable, WarehouseView,
+               WarehouseColumn, WarehouseViewDependency, WarehouseForeignKey]
+_BULK_CHILDREN = {
+    WarehouseDatabase: [("schemas", "database_id")],
+    WarehouseSchema: [("tables", "schema_id"), ("views", "schema_id")],
+    WarehouseTable: [("columns", "table_id"), ("foreign_keys", "table_id")],
+    WarehouseView: [("columns", "view_id"), ("dependencies", "view_id")]
+}
+
+
+def _column_default(column):
+    """Returns the value of the python side default of a column or None"""
+    default = column.default
+    if default is None or default.is_sequence:
+        return None
+    if default.is_callable:
+        return default.arg(None)
+    return default.arg
 
 
 class RepositoryManager(categories.SQLite):
@@ -21,6 +52,7 @@ class RepositoryManager(categories.SQLite):
     __instance = None
     __connection = None
     __session = None
+    lookup_cache = None
 
     def __new__(cls):
         """ Method to create singleton instance
@@ -36,7 +68,10 @@ class RepositoryManager(categories.SQLite):
         categories.SQLite.__init__(self)
 
     def connect(self, conn):
-        """ Init connection with meta repo db
+        """ Init connection with meta repo db, the repository tables and
+            indexes missing in it (e.g., view dependencies) are created on
+            the first connection through an engine. The lookup cache and
+            join graphs of the repository are kept across connections
 
             Args:
                 conn(ConnectionManager): An connection instance to DB
@@ -45,8 +80,51 @@ class RepositoryManager(categories.SQLite):
         LOGGER.debug("Connecting to database...")
         self.__connection = conn
         self.__session = self.__connection.get_session()
+        engine = conn.get_engine()
+        self.lookup_cache = cache.get_cache(engine,
+                                            Utility().CONFIG.get("REPO_LOOKUP_CACHE_SIZE", 1024))
+        setup_repository(conn)
         LOGGER.debug("Connected to database successfully")
 
+    @contextmanager
+    def batch(self, commit_every=None):
+        """ Transaction scope (context manager) in which the saves and deletes
+            are committed once at the end, see `unit_of_work.batch`. The
+            lookup cache is cleared on leaving the scope as objects may have
+            been rolled back
+
+            Args:
+                commit_every (int): Commits after every N operations
+        """
+        try:
+            with unit_of_work.batch(self.__session, commit_every) as scope:
+                yield scope
+        finally:
+            self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """ Clears the cache of the objects looked up by name or id, it is
+            called whenever repository objects are saved, deleted or moved
+        """
+        if self.lookup_cache is not None:
+            self.lookup_cache.invalidate()
+
+    def get_cache_stats(self):
+        """Returns dict with the `hits`, `misses`, `size` and `max_size` of
+            the lookup cache shared by the managers of the repository
+        """
+        return self.lookup_cache.stats()
+
+    def load_object(self, cls, obj_id):
+        """ Returns the object of a class by id from the session of this
+            manager (without query if already loaded in it) or None
+
+            Args:
+                cls (DeclarativeMeta): Class of the object
+                obj_id (int): Id of the object
+        """
+        return self.__session.query(cls).get(obj_id)
+
     def save(self, repo_obj):
         """ Saves the repo object to database
 
@@ -57,7 +135,8 @@ class RepositoryManager(categories.SQLite):
         LOGGER.debug("Saving repository object '%s' to repository database" % \
                      (repo_obj.name if repo_obj.name is not None else "Unknown"))
         self.__session.add(repo_obj)
-        self.__session.commit()
+        unit_of_work.commit(self.__session)
+        self.invalidate_cache()
         LOGGER.debug("Repository object saved successfully")
 
     def save_all(self, repo_objs):
@@ -70,13 +149,167 @@ class RepositoryManager(categories.SQLite):
             LOGGER.debug("Saving repository object instance '%s' from list to repository\
                           database" % (obj.name if obj.name is not None else "Unknown"))
         self.__session.add_all(repo_objs)
-        self.__session.commit()
+        unit_of_work.commit(self.__session)
+        self.invalidate_cache()
         LOGGER.debug("All repository object instances have bee saved successfully")
 
+    def bulk_save_all(self, repo_objs, batch_size=None):
+        """ Saves new repo objects along with all their new children (schemas,
+            tables, views, columns and view dependencies) with batches of
+            `executemany` inserts instead of the unit of work flush. Parents
+            are inserted before their children, the ids of each batch are
+            read back with one query as SQLite assigns consecutive ids to the
+            rows inserted while the transaction holds the write lock. Objects
+            already stored are skipped but their new children are saved. All
+            rows are saved with one commit, the new objects are not attached
+            to the session but are detached objects with their ids set. On
+            failure the objects are restored as they were before the call
+
+            Args:
+                repo_objs(List): An list of `AbstractWarehouseObject` objects
+                batch_size(int): Rows per insert, configured under `BULK_SAVE`
+                                 if not passed
+        """
+        if batch_size is None:
+            conf = Utility().CONFIG.get("BULK_SAVE")
+            batch_size = conf.get("batch_size", 5000) if conf is not None else 5000
+        levels = dict((cls, []) for cls in _BULK_ORDER)
+        seen = set()
+        # breadth first, so the ids follow the order of the collections
+        queue = deque((obj, None, None) for obj in repo_objs)
+        while queue:
+            obj, fk_attr, parent = queue.popleft()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            levels[type(obj)].append((obj, fk_attr, parent))
+            for attr, child_fk in _BULK_CHILDREN.get(type(obj), []):
+                queue.extend((child, child_fk, obj) for child in getattr(obj, attr))
+        new_objs = []
+        # column values of the objects before the batch, restored on failure
+        # so a retry does not write the FKs to the rolled back ids
+        previous = []
+        try:
+            conn = self.__session.connection()
+            for cls in _BULK_ORDER:
+                table = cls.__table__
+                columns = [col for col in table.columns if not col.primary_key]
+                defaults = dict((col.key, _column_default(col)) for col in columns)
+                pending = []
+                for obj, fk_attr, parent in levels[cls]:
+                    state = inspect(obj)
+                    if state.has_identity:
+                        continue
+                    if state.pending:
+                        # added through a backref of an stored parent
+                        self.__session.expunge(obj)
+                    previous.append((obj, dict((col.key, obj.__dict__[col.key])
+                                               for col in table.columns
+                                               if col.key in obj.__dict__)))
+                    if fk_attr is not None:
+                        setattr(obj, fk_attr, parent.id)
+                    if cls is WarehouseViewDependency and obj.table is not None:
+                        obj.table_id = obj.table.id
+                    if cls is WarehouseForeignKey and obj.referred_table is not None:
+                        obj.referred_table_id = obj.referred_table.id
+                    pending.append(obj)
+                for start in range(0, len(pending), batch_size):
+                    batch = pending[start:start + batch_size]
+                    rows = []
+                    for obj in batch:
+                        # read from the instance dict, the attribute access
+                        # would initialize the unset attributes
+                        values = obj.__dict__
+                        row = {}
+                        for col in columns:
+                            value = values.get(col.key)
+                            row[col.key] = value if value is not None else defaults[col.key]
+                        rows.append(row)
+                    conn.execute(table.insert(), rows)
+                    last_id = conn.execute(select([func.max(table.c.id)])).scalar()
+                    for obj_id, obj, row in zip(range(last_id - len(batch) + 1, last_id + 1),
+                                                batch, rows):
+                        obj.__dict__.update(row)
+                        obj.id = obj_id
+                    new_objs.extend(batch)
+                LOGGER.debug("%d objects of '%s' inserted" % (len(pending), table.name))
+            closure.link_all(conn, new_objs)
+            unit_of_work.commit(self.__session)
+            self.invalidate_cache()
+            join_graph.invalidate_objects(self.__session.get_bind(), new_objs)
+            for obj in new_objs:
+                make_transient_to_detached(obj)
+        except Exception:
+            LOGGER.error("Unable to save repository objects in bulk")
+            self.__session.rollback()
+            self.invalidate_cache()
+            for obj, values in previous:
+                for col in obj.__table__.columns:
+                    obj.__dict__.pop(col.key, None)
+                obj.__dict__.update(values)
+            raise
+        LOGGER.debug("%d repository objects have been saved in bulk" % len(new_objs))
+        return new_objs
+
+    def rebuild_closure(self):
+        """ Rebuilds the closure table of the hierarchy from the FKs of all
+            objects stored in repository, see `closure.rebuild`
+        """
+        closure.rebuild(self.__session.connection())
+        unit_of_work.commit(self.__session)
+
+    def get_descendants(self, repo_obj, descendant_cls):
+        """ Returns all objects of a class under an object at any depth, e.g.,
+            all columns of an database, ordered by id. It is one indexed
+            lookup of the closure table whatever the depth
+
+            Args:
+                repo_obj(AbstractWarehouseObject): The ancestor object
+                descendant_cls(DeclarativeMeta): Class of the descendants
+        """
+        LOGGER.debug("Request to get all '%s' objects under '%s'"
+                     % (descendant_cls.__name__, repo_obj))
+        node = WarehouseObjectClosure
+        return self.__session.query(descendant_cls)\
+                .join(node, and_(node.descendant_type == closure.node_type(descendant_cls),
+                                 node.descendant_id == descendant_cls.id))\
+                .filter(and_(node.ancestor_type == closure.node_type(type(repo_obj)),
+                             node.ancestor_id == repo_obj.id, node.depth > 0))\
+                .order_by(descendant_cls.id).all()
+
+    def get_ancestor(self, repo_obj, ancestor_cls):
+        """ Returns the object of a class the object passed belongs to at any
+            depth, e.g., the database of an column, or None
+
+            Args:
+                repo_obj(AbstractWarehouseObject): The descendant object
+                ancestor_cls(DeclarativeMeta): Class of the ancestor
+        """
+        LOGGER.debug("Request to get '%s' object of '%s'" % (ancestor_cls.__name__, repo_obj))
+        node = WarehouseObjectClosure
+        return self.__session.query(ancestor_cls)\
+                .join(node, and_(node.ancestor_type == closure.node_type(ancestor_cls),
+                                 node.ancestor_id == ancestor_cls.id))\
+                .filter(and_(node.descendant_type == closure.node_type(type(repo_obj)),
+                             node.descendant_id == repo_obj.id, node.depth > 0))\
+                .first()
+
+    def get_join_graph(self, schema):
+        """ Returns the `JoinGraph` of the tables of an schema joined by their
+            FKs, it is cached until the schema is re-synced (see
+            `join_graph.get_join_graph`)
+
+            Args:
+                schema(WarehouseSchema): An instance of WarehouseSchema class
+        """
+        LOGGER.debug("Request to get join graph of schema '%s'" % schema.name)
+        return join_graph.get_join_graph(self.__session, schema)
+
     def update(self):
         """ Updates all objects associated with current session
         """
-        self.__session.commit()
+        unit_of_work.commit(self.__session)
+        self.invalidate_cache()
         LOGGER.debug("All changes pending under current session have been updated")
 
     def delete(self, repo_obj):
@@ -88,7 +321,8 @@ class RepositoryManager(categories.SQLite):
         """
         try:
             repo_obj.delete()
-            self.__session.commit()
+            unit_of_work.commit(self.__session)
+            self.invalidate_cache()
             LOGGER.debug("Repository object '%s' have been deleted from repository" \
                          % (repo_obj.name if repo_obj.name is not None else "Unknown"))
         except Exception:
@@ -96,6 +330,7 @@ class RepositoryManager(categories.SQLite):
                          (repo_obj.name if repo_obj.name is not None else "Unknown"))
             raise
 
+    @cached_lookup("database")
     def get_database(self, param):
         """ Returns an instance of `WarehouseDatabase` class
 
@@ -121,19 +356,50 @@ class RepositoryManager(categories.SQLite):
         LOGGER.debug("Request to get all instances of WarehouseDatabase")
         return self.__session.query(WarehouseDatabase).all()
 
+    def get_database_tree(self, database):
+        """ Returns the tree of an database with its schemas, tables, views
+            and columns as immutable nodes (see `tree.DatabaseNode`). The
+            whole hierarchy is loaded with `selectinload`, i.e., one query
+            per level whatever the number of schemas and tables. Returns None
+            if database is not found
+
+            Args:
+                database (WarehouseDatabase/int/str): The database or its id or name
+        """
+        query = self.__session.query(WarehouseDatabase).options(
+            selectinload(WarehouseDatabase.schemas)
+            .selectinload(WarehouseSchema.tables)
+            .selectinload(WarehouseTable.columns),
+            selectinload(WarehouseDatabase.schemas)
+            .selectinload(WarehouseSchema.views)
+            .selectinload(WarehouseView.columns))
+        if isinstance(database, WarehouseDatabase):
+            database = database.id
+        if isinstance(database, int):
+            db_obj = query.filter(WarehouseDatabase.id == database).first()
+        elif isinstance(database, str):
+            db_obj = query.filter(WarehouseDatabase.name == database).first()
+        else:
+            LOGGER.warn("Incorrect datatype of parameter provided. Only 'int' and 'str' are accepted")
+            return None
+        if db_obj is None:
+            return None
+        LOGGER.debug("Tree of database '%s' loaded" % db_obj.name)
+        return database_node(db_obj)
+
     def get_database_names(self):
         """ Returns an list of names of all databases
         """
-        _names = []
         LOGGER.debug("Request to get names of all WarehouseDatabase objects")
-        dbs = self.__session.query(WarehouseDatabase).all()
-        for _db in dbs:
-            LOGGER.debug("Adding '%s' database name to the list" \
-                         % (_db.name if _db.name is not None else "Unknown"))
-            _names.append(_db.name)
-        LOGGER.debug("Returning the WarehouseDatabase names list")
-        return _names
+        return [name for _, name in self.iter_database_names()]
 
+    def iter_database_names(self, after_id=None, limit=None):
+        """ Yields tuples (id, name) of databases ordered by id, see
+            `_iter_names` for the args
+        """
+        return self._iter_names(WarehouseDatabase, None, None, after_id, limit)
+
+    @cached_lookup("schema")
     def get_schema(self, param, database=None):
         """ Returns an instance of `WarehouseSchema` class stored in database based on
             id or name. If database parameter is passed, it will return schemas
@@ -158,15 +424,15 @@ class RepositoryManager(categories.SQLite):
                               % (param, \
                                  database.id if database.id is not None else -1))
                 return self.__session.query(WarehouseSchema)\
-                        .filter(WarehouseSchema.id == param \
-                                and WarehouseSchema.database_id == database.id).first()
+                        .filter(and_(WarehouseSchema.id == param,
+                                     WarehouseSchema.database_id == database.id)).first()
             elif isinstance(param, str):
                 LOGGER.debug("Request to get WarehouseSchema object with name: '%s' and database id: '%d'"\
                               % (param, \
                                  database.id if database.id is not None else -1))
                 return self.__session.query(WarehouseSchema)\
-                        .filter(WarehouseSchema.name == param \
-                               and WarehouseSchema.database_id == database.id).first()
+                        .filter(and_(WarehouseSchema.database_id == database.id,
+                                     WarehouseSchema.name == param)).first()
         LOGGER.warn("Incorrect datatype of parameter provided. Only 'int' and 'str' are allowed")
         return None
 
@@ -193,23 +459,19 @@ class RepositoryManager(categories.SQLite):
             Args:
                 database(WarehouseDatabase): An instance of WarehouseDatabase class
         """
-        _names = []
-        _schemas = None
-        if database is None:
-            LOGGER.debug("Request to get all schema names available")
-            _schemas = self.__session.query(WarehouseSchema).all()
-        else:
-            LOGGER.debug("Request to get all schema names available under database id: '%d'"\
-                          % database.id if database.id is not None else -1)
-            _schemas = self.__session.query(WarehouseSchema)\
-                    .filter(WarehouseSchema.database_id == database.id).all()
-        for sch in _schemas:
-            LOGGER.debug("Schema name '%s' added to the list" % (sch.name \
-                         if sch.name is not None else "Unknown"))
-            _names.append(sch.name)
-        LOGGER.debug("Returning back list of schema names")
-        return _names
+        LOGGER.debug("Request to get all schema names available under database id: '%d'"
+                     % (database.id if database is not None and database.id is not None
+                        else -1))
+        return [name for _, name in self.iter_schema_names(database)]
 
+    def iter_schema_names(self, database=None, after_id=None, limit=None):
+        """ Yields tuples (id, name) of schemas under an passed database or
+            all schemas ordered by id, see `_iter_names` for the args
+        """
+        return self._iter_names(WarehouseSchema, WarehouseSchema.database_id, database,
+                                after_id, limit)
+
+    @cached_lookup("table")
     def get_table(self, param, schema=None):
         """ Returns an instance of `WarehouseTable` available under an schema passed
             as parameter else returns instances of all tables matching the table name or
@@ -233,15 +495,15 @@ class RepositoryManager(categories.SQLite):
                 LOGGER.debug("Request to get table with name: '%s' under schema id: '%d'"\
                               % (param, schema.id if schema.id is not None else -1))
                 return self.__session.query(WarehouseTable)\
-                        .filter(WarehouseTable.name == param and\
-                                WarehouseTable.schema_id == schema.id)\
+                        .filter(and_(WarehouseTable.schema_id == schema.id,
+                                     WarehouseTable.name == param))\
                         .first()
             elif isinstance(param, int):
                 LOGGER.debug("Request to get table with id: '%d' under schema id: '%d'"\
                               % (param, schema.id if schema.id is not None else -1))
                 return self.__session.query(WarehouseTable)\
-                        .filter(WarehouseTable.id == param\
-                                and WarehouseTable.schema_id == schema.id)\
+                        .filter(and_(WarehouseTable.id == param,
+                                     WarehouseTable.schema_id == schema.id))\
                         .first()
         LOGGER.debug("Incorrect datatype passed for parameter. Only 'int' and 'str' are accepted")
         return None
@@ -271,23 +533,18 @@ class RepositoryManager(categories.SQLite):
             Args:
                 schema(WarehouseSchema): An instance of schema class
         """
-        _tables = None
-        _names = []
-        if schema is None:
-            LOGGER.debug("Request to get all table names available")
-            _tables = self.__session.query(WarehouseTable).all()
-        else:
-            LOGGER.debug("Request to get all table names available under schema id: '%d'"\
-                          % schema.id if schema.id is not None else -1)
-            _tables = self.__session.query(WarehouseTable)\
-                    .filter(WarehouseTable.schema_id == schema.id).all()
-        for tab in _tables:
-            LOGGER.debug("Adding table name '%s' to the list" % tab.name)
-            _names.append(tab.name)
+        LOGGER.debug("Request to get all table names available under schema id: '%d'"
+                     % (schema.id if schema is not None and schema.id is not None else -1))
+        return [name for _, name in self.iter_table_names(schema)]
 
-        LOGGER.debug("Returning the list of table names available")
-        return _names
+    def iter_table_names(self, schema=None, after_id=None, limit=None):
+        """ Yields tuples (id, name) of tables under an passed schema or all
+            tables ordered by id, see `_iter_names` for the args
+        """
+        return self._iter_names(WarehouseTable, WarehouseTable.schema_id, schema,
+                                after_id, limit)
 
+    @cached_lookup("column")
     def get_column(self, column, table):
         """ Returns an instance of `WarehouseColumn` under an table
             passed as argument to this method
@@ -300,15 +557,15 @@ class RepositoryManager(categories.SQLite):
             LOGGER.debug("Request to get column with name: '%s' under table with id: '%d'"\
                           % (column, table.id if table.id is not None else -1))
             return self.__session.query(WarehouseColumn)\
-                .filter(WarehouseColumn.table_id == table.id\
-                        and WarehouseColumn.name == column)\
+                .filter(and_(WarehouseColumn.table_id == table.id,
+                             WarehouseColumn.name == column))\
                 .first()
         elif isinstance(column, int):
             LOGGER.debug("Request to get column with id: '%d' under table with id: '%id'"\
                           % (column, table.id if table.id is not None else -1))
             return self.__session.query(WarehouseColumn)\
-                .filter(WarehouseColumn.id == column and\
-                        WarehouseColumn.table_id == table.id)\
+                .filter(and_(WarehouseColumn.id == column,
+                             WarehouseColumn.table_id == table.id))\
                 .first()
         LOGGER.warn("Incorrect datatype provided as parameter. Only 'int' and 'str' are accepted")
         return None
@@ -333,20 +590,18 @@ class RepositoryManager(categories.SQLite):
             Args:
                 table(WarehouseTable): An instance of table
         """
-        _names = []
         LOGGER.debug("Request to get all column names available under table with id: '%d'"\
                       % (table.id if table.id is not None else -1))
-        _columns = self.__session.query(WarehouseColumn)\
-            .filter(WarehouseColumn.table_id == table.id)\
-            .all()
-        for col in _columns:
-            LOGGER.debug("Adding column name '%s' to the list" % \
-                         (col.name if col.name is not None else "Unknown"))
-            _names.append(col.name)
-        LOGGER.debug("Returning all column names available under table with id: '%d'"\
-                      % table.id if table.id is not None else -1)
-        return _names
+        return [name for _, name in self.iter_column_names(table)]
+
+    def iter_column_names(self, table, after_id=None, limit=None):
+        """ Yields tuples (id, name) of columns under an table ordered by
+            id, see `_iter_names` for the args
+        """
+        return self._iter_names(WarehouseColumn, WarehouseColumn.table_id, table,
+                                after_id, limit)
 
+    @cached_lookup("view")
     def get_view(self, param, schema=None):
         """ Returns an instance of WarehoueView available
             under an schema passed as parameter
@@ -369,15 +624,15 @@ class RepositoryManager(categories.SQLite):
                 LOGGER.debug("Request to get view with name: '%s' under schema id: '%d'"\
                               % (param, schema.id if schema.id is not None else -1))
                 return self.__session.query(WarehouseView)\
-                        .filter(WarehouseView.name == param\
-                                and WarehouseView.schema_id == schema.id)\
+                        .filter(and_(WarehouseView.schema_id == schema.id,
+                                     WarehouseView.name == param))\
                         .first()
             elif isinstance(param, int):
                 LOGGER.debug("Request to get view with id: '%d' under schema id: '%d'"\
                               % (param, schema.id if schema.id is not None else -1))
                 return self.__session.query(WarehouseView)\
-                        .filter(WarehouseView.id == param and\
-                                WarehouseView.schema_id == schema.id).first()
+                        .filter(and_(WarehouseView.id == param,
+                                     WarehouseView.schema_id == schema.id)).first()
         LOGGER.debug("Incorrect datatype passed for parameter. \
                      Only 'int' and 'str' datatypes are allowed for parameter")
         return None
@@ -405,22 +660,42 @@ class RepositoryManager(categories.SQLite):
             Args:
                 schema(WarehouseSchema): An instance of warehouse schema
         """
-        _views = None
-        _names = []
-        if schema is None:
-            LOGGER.debug("Request to get all view names available")
-            _views = self.__session.query(WarehouseView).all()
-        else:
-            LOGGER.debug("Request to get all view names available under schema id: '%d'"\
-                          % schema.id if schema.id is not None else -1)
-            _views = self.__session.query(WarehouseView)\
-                    .filter(WarehouseView.schema_id == schema.id).all()
-        for vw in _views:
-            LOGGER.debug("Adding view name '%s' to the list" % vw.name)
-            _names.append(vw.name)
-
-        LOGGER.debug("Returning the list of view names available")
-        return _names
+        LOGGER.debug("Request to get all view names available under schema id: '%d'"
+                     % (schema.id if schema is not None and schema.id is not None else -1))
+        return [name for _, name in self.iter_view_names(schema)]
+
+    def iter_view_names(self, schema=None, after_id=None, limit=None):
+        """ Yields tuples (id, name) of views under an passed schema or all
+            views ordered by id, see `_iter_names` for the args
+        """
+        return self._iter_names(WarehouseView, WarehouseView.schema_id, schema,
+                                after_id, limit)
+
+    def _iter_names(self, cls, parent_column, parent, after_id=None, limit=None):
+        """ Yields tuples (id, name) of the objects ordered by id, only these
+            two columns are selected and the rows are streamed in batches
+            (`REPO_YIELD_PER`), so the memory used does not grow with the
+            number of objects. Pages are read by passing the last id of the
+            previous page as `after_id`
+
+            Args:
+                cls (DeclarativeMeta): Class of the objects
+                parent_column (Column): FK column referring the parent
+                parent (AbstractWarehouseObject): Parent of the objects or None
+                                                  for all objects
+                after_id (int): Only objects with greater id are read
+                limit (int): Max number of objects read
+        """
+        query = self.__session.query(cls.id, cls.name)
+        if parent is not None:
+            query = query.filter(parent_column == parent.id)
+        if after_id is not None:
+            query = query.filter(cls.id > after_id)
+        query = query.order_by(cls.id)
+        if limit is not None:
+            query = query.limit(limit)
+        for row in query.yield_per(Utility().CONFIG.get("REPO_YIELD_PER", 1000)):
+            yield row.id, row.name
 
     def get_materialized_view(self, param, schema=None):
         """ Returns the MV instance matching the name or id passed as parameter.
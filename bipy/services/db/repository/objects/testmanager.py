@@ -2,8 +2,16 @@
     Author: Ajeet Singh
     Date: 06/03/2019
 """
+import os
+import shutil
+import tempfile
 import unittest
+from sqlalchemy import event
 from bipy.services.db.categories import SQLite
+from bipy.services.db.repository.meta_objects import WarehouseDatabase, WarehouseSchema
+from bipy.services.db.repository.meta_objects import WarehouseTable, WarehouseColumn
+from bipy.services.db.repository.meta_objects import WarehouseView, WarehouseObjectClosure
+from bipy.services.db.repository.tree import to_dict
 from bipy.services.utils import Utility
 
 class RepositoryManagerTestCase(unittest.TestCase):
@@ -144,6 +152,298 @@ class RepositoryManagerTestCase(unittest.TestCase):
             else:
                 assert column_names.__len__() == 3
 
+    def test_bulk_save_all(self):
+        """ Test the bulk save of an database along with its schemas, tables,
+        views and columns
+        """
+        temp_dir = tempfile.mkdtemp()
+        utils = Utility()
+        repo_conn = utils.get_plugin(self.__conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        try:
+            repo_conn.connect("sqlite:///" + os.path.join(temp_dir, "meta.db"))
+            self.__repo_mgr.connect(repo_conn)
+            db_meta = self.__meta_gen.generate_database_meta("Warehouse 1", "SQLITE",
+                                                             self.__conf.URL_TEST_DB,
+                                                             "User", "Pass")
+            schema = self.__meta_gen.generate_schemas_meta(self.__browser.get_schemas(),
+                                                           db_meta)[0]
+            table_list = [table for table in self.__browser.get_tables()
+                          if not table.startswith("sqlite_")]
+            for table in self.__meta_gen.generate_tables_meta(table_list, schema,
+                                                              self.__browser):
+                self.__meta_gen.generate_columns_meta(self.__browser.get_columns(table.name),
+                                                      table, self.__browser)
+            self.__meta_gen.generate_views_meta(self.__browser.get_views(), schema,
+                                                self.__browser)
+            saved = self.__repo_mgr.bulk_save_all([db_meta], batch_size=2)
+            assert saved.__len__() == 1 + 1 + 4 + 1 + 11 + 6 + 3
+            assert self.__repo_mgr.get_schema("main").database_id == db_meta.id
+            table = self.__repo_mgr.get_table("SALES_DETAILS")
+            assert table.created_on is not None
+            assert self.__repo_mgr.get_all_column_names(table).__len__() == 4
+            view = self.__repo_mgr.get_view("revenue_details")
+            assert [dep.table.name for dep in view.dependencies] == \
+                ['CUSTOMER_MASTER', 'PRODUCT_MASTER', 'SALES_DETAILS']
+            assert view.columns.__len__() == 6
+            statements = []
+            event.listen(repo_conn.get_engine(), "before_cursor_execute",
+                         lambda *args: statements.append(args[2]))
+            repo_conn.get_session().expire_all()
+            tree = self.__repo_mgr.get_database_tree("Warehouse 1")
+            assert statements.__len__() == 6
+            assert [tbl.name for tbl in tree.schemas[0].tables] == \
+                ['CUSTOMER_MASTER', 'PRODUCT_MASTER', 'SALES_DETAILS', 'android_metadata']
+            assert [col.name for col in tree.schemas[0].tables[2].columns] == \
+                ['id', 'customer_id', 'product_id', 'product_qty']
+            assert tree.schemas[0].views[0].columns.__len__() == 6
+            assert to_dict(tree)["schemas"][0]["views"][0]["name"] == "revenue_details"
+        finally:
+            repo_conn.disconnect()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def test_bulk_save_retry(self):
+        """ Test an failed bulk save restores the ids and FKs set during the
+        batch, so saving the same objects again links them to the new ids
+        """
+        temp_dir = tempfile.mkdtemp()
+        utils = Utility()
+        repo_conn = utils.get_plugin(self.__conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        try:
+            repo_conn.connect("sqlite:///" + os.path.join(temp_dir, "meta.db"))
+            self.__repo_mgr.connect(repo_conn)
+            db_meta = self.__meta_gen.generate_database_meta("Warehouse 1", "SQLITE",
+                                                             self.__conf.URL_TEST_DB,
+                                                             "User", "Pass")
+            schema = self.__meta_gen.generate_schemas_meta(self.__browser.get_schemas(),
+                                                           db_meta)[0]
+            table = self.__meta_gen.generate_tables_meta(["SALES_DETAILS"], schema,
+                                                         self.__browser)[0]
+            self.__meta_gen.generate_columns_meta(self.__browser.get_columns(table.name),
+                                                  table, self.__browser)
+
+            def fail_columns(conn, cursor, statement, *args):
+                if statement.startswith("INSERT INTO " + WarehouseColumn.__tablename__):
+                    raise ValueError("Column insert failed")
+            event.listen(repo_conn.get_engine(), "before_cursor_execute", fail_columns)
+            with self.assertRaises(ValueError):
+                self.__repo_mgr.bulk_save_all([db_meta])
+            event.remove(repo_conn.get_engine(), "before_cursor_execute", fail_columns)
+            assert db_meta.id is None and schema.id is None and table.id is None
+            assert schema.database_id is None and table.schema_id is None
+            assert table.created_on is None
+            # rows inserted by an other session take the rolled back ids
+            repo_conn.get_engine().execute(WarehouseDatabase.__table__.insert(),
+                                           name="Warehouse 0", db_type="SQLITE")
+            saved = self.__repo_mgr.bulk_save_all([db_meta])
+            assert saved.__len__() == 1 + 1 + 1 + 4
+            assert db_meta.id == 2
+            assert schema.database_id == db_meta.id and table.schema_id == schema.id
+            assert [col.table_id for col in table.columns] == [table.id] * 4
+            assert self.__repo_mgr.get_schema("main").database_id == db_meta.id
+        finally:
+            repo_conn.disconnect()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def test_lookup_cache(self):
+        """ Test the lookups by name are served from cache until an object
+        is saved
+        """
+        if self.__repo_table_meta is None:
+            self.test_save_and_get_table()
+        stats = self.__repo_mgr.get_cache_stats()
+        table = self.__repo_mgr.get_table("SALES_DETAILS")
+        assert self.__repo_mgr.get_table("SALES_DETAILS") is table
+        assert self.__repo_mgr.get_cache_stats()["hits"] == stats["hits"] + 1
+        assert self.__repo_mgr.get_cache_stats()["misses"] == stats["misses"] + 1
+        assert self.__repo_mgr.get_table("SALES_DETAILS", table.repository_warehouse_schemas)\
+            is table
+        assert self.__repo_mgr.get_cache_stats()["size"] == 2
+        self.__repo_mgr.save(table)
+        assert self.__repo_mgr.get_cache_stats()["size"] == 0
+
+    def test_connect_setup_once(self):
+        """ Test the repository is set up on the first connection only and
+        the lookup cache and join graphs survive reconnecting
+        """
+        schema = self.__repo_mgr.get_schema("main")
+        graph = self.__repo_mgr.get_join_graph(schema) if schema is not None else None
+        table = self.__repo_mgr.get_table("SALES_DETAILS")
+        size = self.__repo_mgr.get_cache_stats()["size"]
+        statements = []
+        engine = self.__conn_repo.get_engine()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            self.__repo_mgr.connect(self.__conn_repo)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert statements == []
+        assert self.__repo_mgr.get_cache_stats()["size"] == size
+        if table is not None:
+            assert size > 0
+        if graph is not None:
+            assert self.__repo_mgr.get_join_graph(schema) is graph
+
+    def test_lookup_cache_sessions(self):
+        """ Test the lookup cache is shared by the managers of a repository
+        while each gets the objects of its own session, and lookups under an
+        unsaved parent are not cached
+        """
+        if self.__repo_table_meta is None:
+            self.test_save_and_get_table()
+        utils = Utility()
+        repo_conn = utils.get_plugin(self.__conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        repo_conn.connect(self.__conf.URL_META_DB)
+        try:
+            repo_mgr = utils.get_plugin(self.__conf.PATH_REPO_MGR, new_instance=True)
+            repo_mgr.connect(repo_conn)
+            assert repo_mgr.lookup_cache is self.__repo_mgr.lookup_cache
+            table = self.__repo_mgr.get_table("SALES_DETAILS")
+            hits = repo_mgr.get_cache_stats()["hits"]
+            other = repo_mgr.get_table("SALES_DETAILS")
+            assert repo_mgr.get_cache_stats()["hits"] == hits + 1
+            assert other is not table and other.id == table.id
+            assert other in repo_conn.get_session()
+            size = repo_mgr.get_cache_stats()["size"]
+            assert repo_mgr.get_table("SALES_DETAILS", WarehouseSchema(name="main")) is None
+            assert repo_mgr.get_cache_stats()["size"] == size
+            assert repo_mgr.get_table("SALES_DETAILS") is other
+        finally:
+            repo_conn.disconnect()
+
+    def test_scoped_lookup(self):
+        """ Test the lookups under an parent object match on both the parent
+        and the name using the composite index
+        """
+        temp_dir = tempfile.mkdtemp()
+        utils = Utility()
+        repo_conn = utils.get_plugin(self.__conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        try:
+            repo_conn.connect("sqlite:///" + os.path.join(temp_dir, "meta.db"))
+            self.__repo_mgr.connect(repo_conn)
+            db_meta = WarehouseDatabase(name="Warehouse 1")
+            for schema_name in ["S1", "S2"]:
+                schema = WarehouseSchema(name=schema_name)
+                table = WarehouseTable(name="T")
+                table.columns.append(WarehouseColumn(name="C"))
+                schema.tables.append(table)
+                db_meta.schemas.append(schema)
+            self.__repo_mgr.save(db_meta)
+            schema = self.__repo_mgr.get_schema("S2", db_meta)
+            table = self.__repo_mgr.get_table("T", schema)
+            assert table.schema_id == schema.id
+            assert self.__repo_mgr.get_column("C", table).table_id == table.id
+            assert self.__repo_mgr.get_table(table.id, db_meta.schemas[0]) is None
+            plan = repo_conn.get_engine().execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM repository_warehouse_tables "
+                "WHERE schema_id = 1 AND name = 'T'").fetchall()
+            assert "ux_repository_warehouse_tables_name" in plan[0][-1]
+        finally:
+            repo_conn.disconnect()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def test_iter_names(self):
+        """ Test the listing of names page by page
+        """
+        if self.__repo_table_meta is None:
+            self.test_save_and_get_table()
+        schema = self.__repo_schema_meta[0]
+        page = list(self.__repo_mgr.iter_table_names(schema, limit=2))
+        assert [name for _, name in page] == ['CUSTOMER_MASTER', 'PRODUCT_MASTER']
+        page = list(self.__repo_mgr.iter_table_names(schema, after_id=page[-1][0], limit=2))
+        assert [name for _, name in page] == ['SALES_DETAILS']
+        assert self.__repo_mgr.get_all_table_names(schema) == \
+            ['CUSTOMER_MASTER', 'PRODUCT_MASTER', 'SALES_DETAILS']
+        assert self.__repo_mgr.get_database_names() == \
+            [name for _, name in self.__repo_mgr.iter_database_names()]
+
+    def test_batch(self):
+        """ Test the saves within an batch are committed once and rolled back
+        together on error
+        """
+        temp_dir = tempfile.mkdtemp()
+        utils = Utility()
+        repo_conn = utils.get_plugin(self.__conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        try:
+            repo_conn.connect("sqlite:///" + os.path.join(temp_dir, "meta.db"))
+            self.__repo_mgr.connect(repo_conn)
+            commits = []
+            event.listen(repo_conn.get_session(), "after_commit", commits.append)
+            with self.__repo_mgr.batch() as scope:
+                for i in range(5):
+                    self.__repo_mgr.save(WarehouseDatabase(name="DB%d" % i))
+                assert self.__repo_mgr.get_database("DB4").id is not None
+            assert scope.operations == 5 and commits.__len__() == 1
+            try:
+                with self.__repo_mgr.batch():
+                    self.__repo_mgr.save(WarehouseDatabase(name="DB5"))
+                    raise ValueError("Failed")
+            except ValueError:
+                pass
+            assert self.__repo_mgr.get_database_names() == ["DB%d" % i for i in range(5)]
+            with self.__repo_mgr.batch(commit_every=2) as scope:
+                for i in range(5, 10):
+                    self.__repo_mgr.save(WarehouseDatabase(name="DB%d" % i))
+            assert scope.commits == 3 and commits.__len__() == 4
+        finally:
+            repo_conn.disconnect()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def test_closure(self):
+        """ Test the closure table is maintained on save, bulk save, move and
+        delete, and answers the subtree and ancestor lookups
+        """
+        temp_dir = tempfile.mkdtemp()
+        utils = Utility()
+        repo_conn = utils.get_plugin(self.__conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        try:
+            repo_conn.connect("sqlite:///" + os.path.join(temp_dir, "meta.db"))
+            self.__repo_mgr.connect(repo_conn)
+            dbs = []
+            for db_name in ["DB1", "DB2"]:
+                db_meta = WarehouseDatabase(name=db_name)
+                schema = WarehouseSchema(name="main")
+                table = WarehouseTable(name="T")
+                table.columns.extend([WarehouseColumn(name="C1"), WarehouseColumn(name="C2")])
+                view = WarehouseView(name="V")
+                view.columns.append(WarehouseColumn(name="C1"))
+                schema.tables.append(table)
+                schema.views.append(view)
+                db_meta.schemas.append(schema)
+                dbs.append(db_meta)
+            self.__repo_mgr.save(dbs[0])
+            self.__repo_mgr.bulk_save_all([dbs[1]])
+            for db_meta in dbs:
+                db_meta = self.__repo_mgr.get_database(db_meta.name)
+                columns = self.__repo_mgr.get_descendants(db_meta, WarehouseColumn)
+                assert [col.name for col in columns] == ["C1", "C2", "C1"]
+                assert self.__repo_mgr.get_ancestor(columns[2], WarehouseDatabase) is db_meta
+                assert self.__repo_mgr.get_ancestor(db_meta, WarehouseDatabase) is None
+            db1, db2 = self.__repo_mgr.get_database("DB1"), self.__repo_mgr.get_database("DB2")
+            table = db2.schemas[0].tables[0]
+            table.name = "T2"
+            table.schema_id = db1.schemas[0].id
+            self.__repo_mgr.update()
+            assert self.__repo_mgr.get_descendants(db1, WarehouseTable).__len__() == 2
+            assert self.__repo_mgr.get_descendants(db2, WarehouseColumn).__len__() == 1
+            assert self.__repo_mgr.get_ancestor(table.columns[0], WarehouseDatabase) is db1
+            rows = repo_conn.get_session().query(WarehouseObjectClosure).count()
+            self.__repo_mgr.rebuild_closure()
+            assert repo_conn.get_session().query(WarehouseObjectClosure).count() == rows
+            column = table.columns[1]
+            repo_conn.get_session().delete(column)
+            self.__repo_mgr.update()
+            assert self.__repo_mgr.get_descendants(db1, WarehouseColumn).__len__() == 4
+            assert repo_conn.get_session().query(WarehouseObjectClosure).count() == rows - 4
+            plan = repo_conn.get_engine().execute(
+                "EXPLAIN QUERY PLAN SELECT descendant_id FROM repository_warehouse_closure "
+                "WHERE ancestor_type = 'database' AND ancestor_id = 1 "
+                "AND descendant_type = 'column'").fetchall()
+            assert "ix_repository_warehouse_closure_ancestor" in plan[0][-1]
+        finally:
+            repo_conn.disconnect()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
 
 def load_tests(loader, tests, pattern):
     """Function to create test suite for execution of test methods
@@ -154,6 +454,15 @@ def load_tests(loader, tests, pattern):
     suite.addTest(RepositoryManagerTestCase("test_save_and_get_table"))
     suite.addTest(RepositoryManagerTestCase("test_save_and_get_column"))
     suite.addTest(RepositoryManagerTestCase("test_save_and_get_view"))
+    suite.addTest(RepositoryManagerTestCase("test_bulk_save_all"))
+    suite.addTest(RepositoryManagerTestCase("test_bulk_save_retry"))
+    suite.addTest(RepositoryManagerTestCase("test_lookup_cache"))
+    suite.addTest(RepositoryManagerTestCase("test_lookup_cache_sessions"))
+    suite.addTest(RepositoryManagerTestCase("test_connect_setup_once"))
+    suite.addTest(RepositoryManagerTestCase("test_scoped_lookup"))
+    suite.addTest(RepositoryManagerTestCase("test_iter_names"))
+    suite.addTest(RepositoryManagerTestCase("test_batch"))
+    suite.addTest(RepositoryManagerTestCase("test_closure"))
     return suite
 
 if __name__ == "__main__":
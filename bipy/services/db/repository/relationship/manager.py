@@ -3,11 +3,16 @@
     Author: Ajeet Singh
     Date: 05/31/2019
 """
-from bipy.services.db import categories
+from sqlalchemy import inspect, and_
+from bipy.services.db import categories, unit_of_work
+from bipy.services.db.repository.meta_objects import WarehouseSchema, WarehouseTable
+from bipy.services.db.repository.meta_objects import WarehouseView, WarehouseColumn
 from bipy.logging import logger
 
 
 LOGGER = logger.get_logger(__name__)
+# max names bound to one `IN` query, below the SQLite limit of variables
+_IN_CHUNK = 500
 
 
 class RepositoryRelationshipManager(categories.SQLite):
@@ -48,6 +53,15 @@ class RepositoryRelationshipManager(categories.SQLite):
         self.__repo_manager = repo_mgr
         LOGGER.debug("Connected to database successfully")
 
+    def batch(self, commit_every=None):
+        """ Returns an transaction scope (context manager) in which the adds
+            and removes are committed once at the end, see `unit_of_work.batch`
+
+            Args:
+                commit_every (int): Commits after every N operations
+        """
+        return unit_of_work.batch(self.__session, commit_every)
+
     def add_schema_to_db(self, schema, db):
         """ Add an schema passed as argument to the db passed
             as well
@@ -81,7 +95,8 @@ class RepositoryRelationshipManager(categories.SQLite):
                             else "Unknown"))
             self.__repo_manager.save(schema)
         db.schemas.append(schema)
-        self.__session.commit()
+        unit_of_work.commit(self.__session)
+        self.__repo_manager.invalidate_cache()
         LOGGER.debug("Schema added to database successfully!")
 
     def add_schemas_to_db(self, schemas, db):
@@ -95,6 +110,17 @@ class RepositoryRelationshipManager(categories.SQLite):
         for schema in schemas:
             self.add_schema_to_db(schema, db)
 
+    def bulk_add_schemas_to_db(self, schemas, db):
+        """ Set based variant of add_schemas_to_db, the schemas are added in
+            one transaction and the names already stored under the db are
+            skipped, see `_attach_all`
+
+            Args:
+                schemas(List): An list of schema objects
+                db(WarehouseDatabase): An db object
+        """
+        return self._attach_all(schemas, db, WarehouseSchema, "database_id", "schemas")
+
     def add_table_to_schema(self, table, schema):
         """ Add's an table to provided schema. It also saves the
             table and schema objects if not already saved
@@ -126,7 +152,8 @@ class RepositoryRelationshipManager(categories.SQLite):
                              else "Unknown"))
             self.__repo_manager.save(table)
         schema.tables.append(table)
-        self.__session.commit()
+        unit_of_work.commit(self.__session)
+        self.__repo_manager.invalidate_cache()
         LOGGER.debug("Table has been added to schema successfully!")
 
     def add_tables_to_schema(self, tables, schema):
@@ -140,6 +167,17 @@ class RepositoryRelationshipManager(categories.SQLite):
         for tab in tables:
             self.add_table_to_schema(tab, schema)
 
+    def bulk_add_tables_to_schema(self, tables, schema):
+        """ Set based variant of add_tables_to_schema, the tables are added
+            in one transaction and the names already stored under the schema
+            are skipped, see `_attach_all`
+
+            Args:
+                tables(List): A list of table instances
+                schema(WarehouseSchema): An instance of schema objects
+        """
+        return self._attach_all(tables, schema, WarehouseTable, "schema_id", "tables")
+
     def add_view_to_schema(self, view, schema):
         """ Add's an view to provided schema. It also saves the
             view and schema objects if not already saved
@@ -171,7 +209,8 @@ class RepositoryRelationshipManager(categories.SQLite):
                              else "Unknown"))
             self.__repo_manager.save(view)
         schema.views.append(view)
-        self.__session.commit()
+        unit_of_work.commit(self.__session)
+        self.__repo_manager.invalidate_cache()
         LOGGER.debug("View has been added to schema successfully!")
 
     def add_views_to_schema(self, views, schema):
@@ -185,6 +224,17 @@ class RepositoryRelationshipManager(categories.SQLite):
         for vw in views:
             self.add_view_to_schema(vw, schema)
 
+    def bulk_add_views_to_schema(self, views, schema):
+        """ Set based variant of add_views_to_schema, the views are added in
+            one transaction and the names already stored under the schema are
+            skipped, see `_attach_all`
+
+            Args:
+                views(List): A list of view instances
+                schema(WarehouseSchema): An instance of schema objects
+        """
+        return self._attach_all(views, schema, WarehouseView, "schema_id", "views")
+
     def add_column_to_table(self, column, table):
         """ Add's an column instance to the table provided as
             parameter
@@ -215,7 +265,8 @@ class RepositoryRelationshipManager(categories.SQLite):
                             else "Unknown"))
             self.__repo_manager.save(column)
         table.columns.append(column)
-        self.__session.commit()
+        unit_of_work.commit(self.__session)
+        self.__repo_manager.invalidate_cache()
 
     def add_columns_to_table(self, columns, table):
         """ Add columns from provided list to table ppassed as
@@ -228,6 +279,72 @@ class RepositoryRelationshipManager(categories.SQLite):
         for col in columns:
             self.add_column_to_table(col, table)
 
+    def bulk_add_columns_to_table(self, columns, table):
+        """ Set based variant of add_columns_to_table, the columns are added
+            in one transaction and the names already stored under the table
+            are skipped, see `_attach_all`
+
+            Args:
+                columns(List): A list of columns to be added to DB
+                table(WarehouseTable): An instance of table class
+        """
+        return self._attach_all(columns, table, WarehouseColumn, "table_id", "columns")
+
+    def _attach_all(self, children, parent, child_cls, fk_attr, collection):
+        """ Attaches the children to the parent with a fixed number of
+            statements whatever the number of children. The parent is saved
+            if not stored yet, the names already stored under the parent are
+            read with one `IN` query (per 500 names) and skipped, the new
+            children (along with their own new children) are inserted with
+            `RepositoryManager.bulk_save_all` and stored children are moved
+            to the parent. All changes are saved with one commit
+
+            Args:
+                children(List): The schemas, tables, views or columns
+                parent(AbstractWarehouseObject): The parent to attach to
+                child_cls(DeclarativeMeta): Class of the children
+                fk_attr(String): FK of the children referring the parent
+                collection(String): Relationship of the parent to children
+
+            Returns:
+                attached(List): The children attached, i.e., not skipped
+        """
+        LOGGER.debug("Attaching %d objects to '%s'"
+                     % (len(children), parent.name if parent.name is not None else "Unknown"))
+        with unit_of_work.batch(self.__session):
+            if not inspect(parent).has_identity:
+                self.__repo_manager.bulk_save_all([parent])
+            parent_id = parent.id
+            names = list(set(child.name for child in children))
+            stored = set()
+            for start in range(0, len(names), _IN_CHUNK):
+                stored.update(name for name, in self.__session.query(child_cls.name)
+                              .filter(and_(getattr(child_cls, fk_attr) == parent_id,
+                                           child_cls.name.in_(names[start:start + _IN_CHUNK]))))
+            new_children = []
+            attached = []
+            for child in children:
+                if child.name in stored:
+                    continue
+                stored.add(child.name)
+                setattr(child, fk_attr, parent_id)
+                state = inspect(child)
+                if not state.has_identity:
+                    new_children.append(child)
+                elif state.detached:
+                    self.__session.add(child)
+                attached.append(child)
+            if new_children:
+                self.__repo_manager.bulk_save_all(new_children)
+            if inspect(parent).detached:
+                self.__session.add(parent)
+            self.__session.expire(parent, [collection])
+            unit_of_work.commit(self.__session)
+        self.__repo_manager.invalidate_cache()
+        LOGGER.debug("%d objects attached, %d of them inserted"
+                     % (len(attached), len(new_children)))
+        return attached
+
     def remove_schema_from_db(self, schema, db):
         """ Removes provided schema from list of schemas available
             under db passed as argument
@@ -242,7 +359,8 @@ class RepositoryRelationshipManager(categories.SQLite):
         for sch in db.schemas:
             if sch.id == schema.id:
                 db.schemas.remove(sch)
-                self.__session.commit()
+                unit_of_work.commit(self.__session)
+                self.__repo_manager.invalidate_cache()
                 LOGGER.debug("Schema removed successfully from DB")
         return schema
 
@@ -262,7 +380,8 @@ class RepositoryRelationshipManager(categories.SQLite):
         for tb in schema.tables:
             if tb.id == table.id:
                 schema.tables.remove(tb)
-                self.__session.commit()
+                unit_of_work.commit(self.__session)
+                self.__repo_manager.invalidate_cache()
                 LOGGER.debug("Table removed from schema successfully!")
         return table
 
@@ -281,7 +400,8 @@ class RepositoryRelationshipManager(categories.SQLite):
         for col in table.columns:
             if col.id == column.id:
                 table.columns.remove(col)
-                self.__session.commit()
+                unit_of_work.commit(self.__session)
+                self.__repo_manager.invalidate_cache()
                 LOGGER.debug("Column removed successfully from table!")
 
     def remove_schemas_from_db(self, schemas, db):
@@ -2,10 +2,16 @@
     Author: Ajeet Singh
     Date: 06/03/2019
 """
+import os
+import shutil
+import tempfile
 import unittest
 from yapsy.PluginManager import PluginManager
 from bipy.services.constants import URLS, PATHS
 from bipy.services.db.categories import SQLite
+from bipy.services.db.instrumentation import StatementCounter
+from bipy.services.db.repository.meta_objects import WarehouseDatabase, WarehouseSchema
+from bipy.services.db.repository.meta_objects import WarehouseTable, WarehouseColumn
 from bipy.services.utils import Utility
 
 
@@ -50,11 +56,80 @@ class RepositoryRelationshipManagerTestCase(unittest.TestCase):
         self.__repo_mgr.connect(self.__conn_repo)
 
 
+class BulkAttachTestCase(unittest.TestCase):
+    """Testcase for the set based attach of RepositoryRelationshipManager
+    """
+    temp_dir = None
+    repo_conn = None
+    repo_mgr = None
+    rel_mgr = None
+
+    def setUp(self):
+        util = Utility()
+        conf = util.CONFIG
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_conn = util.get_plugin(conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        self.repo_conn.connect("sqlite:///" + os.path.join(self.temp_dir, "meta.db"))
+        self.repo_mgr = util.get_plugin(conf.PATH_REPO_MGR)
+        self.repo_mgr.connect(self.repo_conn)
+        self.rel_mgr = util.get_plugin(conf.PATH_REPO_REL_MGR)
+        self.rel_mgr.connect(self.repo_conn, self.repo_mgr)
+
+    def tearDown(self):
+        self.repo_conn.disconnect()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_bulk_add_columns_to_table(self):
+        db_obj = WarehouseDatabase(name="Warehouse 1")
+        schema = WarehouseSchema(name="main")
+        db_obj.schemas.append(schema)
+        table = WarehouseTable(name="WIDE")
+        table.columns.append(WarehouseColumn(name="C0"))
+        schema.tables.append(table)
+        self.repo_mgr.save(db_obj)
+        columns = [WarehouseColumn(name="C%d" % i) for i in range(500)]
+        with StatementCounter(self.repo_conn.get_engine()) as counter:
+            attached = self.rel_mgr.bulk_add_columns_to_table(columns, table)
+        # IN query, executemany insert, max(id) of the batch and the two
+        # executemany of the closure rows
+        assert counter.count <= 6 and counter.executemany == 3
+        assert attached.__len__() == 499
+        assert self.repo_mgr.get_all_column_names(table) == ["C%d" % i for i in range(500)]
+        assert [col.name for col in table.columns][-1] == "C499"
+
+    def test_bulk_add_tables_to_schema(self):
+        schema = WarehouseSchema(name="main")
+        tables = []
+        for i in range(50):
+            table = WarehouseTable(name="T%d" % i)
+            table.columns.extend(WarehouseColumn(name="C%d" % c) for c in range(10))
+            tables.append(table)
+        with StatementCounter(self.repo_conn.get_engine()) as counter:
+            self.rel_mgr.bulk_add_tables_to_schema(tables, schema)
+        assert counter.count <= 10
+        assert self.repo_mgr.get_schema("main").tables.__len__() == 50
+        assert self.repo_mgr.get_all_column_names(self.repo_mgr.get_table("T49")).__len__() == 10
+
+    def test_batch_rollback(self):
+        schema = WarehouseSchema(name="main")
+        self.repo_mgr.save(schema)
+        with self.assertRaises(ValueError):
+            with self.rel_mgr.batch():
+                self.rel_mgr.bulk_add_tables_to_schema([WarehouseTable(name="T1")], schema)
+                assert self.repo_mgr.get_table("T1", schema) is not None
+                raise ValueError("abort")
+        assert self.repo_mgr.get_cache_stats()["size"] == 0
+        assert self.repo_mgr.get_table("T1", schema) is None
+
+
 def load_tests(loader, tests, pattern):
     """Function to create test suite for execution of test methods
     """
     suite = unittest.TestSuite()
     #suite.addTest(RepositoryRelationshipManagerTestCase("test_save_and_get_view"))
+    suite.addTest(BulkAttachTestCase("test_bulk_add_columns_to_table"))
+    suite.addTest(BulkAttachTestCase("test_bulk_add_tables_to_schema"))
+    suite.addTest(BulkAttachTestCase("test_batch_rollback"))
     return suite
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+"""
+    Set up of the repository database shared by the repository plugins. The
+    missing tables and indexes are created and the closure table filled once
+    per repository engine, the plugins connecting to it afterwards don't
+    repeat the DDL round-trips
+    Author: Ajeet Singh
+    Date: 07/20/2019
+"""
+import threading
+import weakref
+from bipy.services.db.repository.meta_objects import Base
+from bipy.services.db.repository import closure
+from bipy.setup.installer import create_missing_indexes
+from bipy.logging import logger
+
+
+LOGGER = logger.get_logger(__name__)
+# engines whose repository tables, indexes and closure have been set up
+_SETUP_ENGINES = weakref.WeakSet()
+_SETUP_LOCK = threading.Lock()
+
+
+def setup_repository(conn):
+    """ Creates the repository tables and indexes missing in the database
+        (e.g., view dependencies) and fills the closure table of an
+        repository stored before it was added. It runs on the first
+        connection to each repository engine only
+
+        Args:
+            conn (ConnectionManager): An connection to the repository
+    """
+    engine = conn.get_engine()
+    if engine in _SETUP_ENGINES:
+        return
+    with _SETUP_LOCK:
+        if engine in _SETUP_ENGINES:
+            return
+        Base.metadata.create_all(bind=engine)
+        create_missing_indexes(conn, Base)
+        with engine.begin() as connection:
+            if closure.is_empty(connection):
+                closure.rebuild(connection)
+        _SETUP_ENGINES.add(engine)
+    LOGGER.debug("Repository at '%s' set up" % conn.get_connection_string())
@@ -0,0 +1,339 @@
+"""
+    Re-syncs the warehouse objects stored in repository with the current
+    catalog of the warehouse. Only the delta (added, removed and altered
+    tables, views and columns) is applied, tables and views whose DDL has
+    not changed since the last sync are skipped by their fingerprint
+    Author: Ajeet Singh
+    Date: 07/13/2019
+"""
+import hashlib
+from datetime import datetime
+from sqlalchemy import and_
+from bipy.services.db import categories
+from bipy.services.db.repository.meta_objects import WarehouseTable, WarehouseColumn
+from bipy.services.db.repository.meta_objects import WarehouseObjectFingerprint
+from bipy.services.db.repository.meta_objects import WarehouseTableStatistics
+from bipy.services.db.repository.meta_objects import WarehouseColumnStatistics
+from bipy.services.db.repository.meta_objects import WarehouseColumnSketch
+from bipy.services.db.repository.meta_objects import WarehouseViewDependency
+from bipy.services.db.repository.meta_objects import WarehouseForeignKey
+from bipy.services.db.repository import join_graph
+from bipy.services.db.repository.setup import setup_repository
+from bipy.services.db.repository.types import DataTypes
+from bipy.services.utils import Utility
+from bipy.logging import logger
+
+
+LOGGER = logger.get_logger(__name__)
+
+
+def fingerprint(sql):
+    """Returns the fingerprint of the DDL of an table or view"""
+    return hashlib.sha1((sql or "").encode("utf-8")).hexdigest()
+
+
+class SyncDelta:
+    """ Changes found between the warehouse and the repository by a sync.
+        Altered tables map the table name to dict with the lists `added`,
+        `removed` and `altered` of column names
+    """
+
+    def __init__(self):
+        """Default constructor
+        """
+        self.added_tables = []
+        self.removed_tables = []
+        self.altered_tables = {}
+        self.added_views = []
+        self.removed_views = []
+        self.altered_views = []
+        self.unchanged = 0
+
+    def is_empty(self):
+        """Returns True if there is nothing to sync"""
+        return not (self.added_tables or self.removed_tables or self.altered_tables or
+                    self.added_views or self.removed_views or self.altered_views)
+
+    def __repr__(self):
+        """Returns string representation
+        """
+        return ("Sync Delta [Tables: +%d -%d ~%d, Views: +%d -%d ~%d, Unchanged=%d]" %
+                (len(self.added_tables), len(self.removed_tables), len(self.altered_tables),
+                 len(self.added_views), len(self.removed_views), len(self.altered_views),
+                 self.unchanged))
+
+
+class RepositorySyncManager(categories.SQLite):
+    """
+        Compares a schema stored in repository with the current catalog of
+        the warehouse and applies the delta in a single transaction
+
+    >>> from bipy.services.utils import Utility
+
+    >>> util = Utility()
+
+    >>> conf = util.CONFIG
+
+    >>> repo_conn = util.get_plugin(conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+
+    >>> repo_conn.connect(conf.URL_META_DB)
+
+    >>> sync_mgr = util.get_plugin(conf.PATH_REPO_SYNC_MGR)
+
+    >>> sync_mgr.connect(repo_conn)
+    """
+
+    __instance = None
+    __connection = None
+    __session = None
+
+    def __new__(cls):
+        """ Method to create singleton instance
+        """
+        if RepositorySyncManager.__instance is None:
+            RepositorySyncManager.__instance = object.__new__(cls)
+        return RepositorySyncManager.__instance
+
+    def __init__(self):
+        """ Default constructor
+        """
+        LOGGER.debug("RepositorySyncManager instance created")
+        categories.SQLite.__init__(self)
+
+    def connect(self, conn):
+        """ Init connection with meta repo db, the repository tables missing
+            in it (e.g., fingerprints) are created on the first connection
+            to the repository, see `setup_repository`
+
+            Args:
+                conn(ConnectionManager): An connection instance to DB
+        """
+        LOGGER.debug("Connecting to database...")
+        self.__connection = conn
+        self.__session = self.__connection.get_session()
+        setup_repository(conn)
+        LOGGER.debug("Connected to database successfully")
+
+    def diff(self, schema, browser):
+        """ Returns the `SyncDelta` between the schema stored in repository
+            and the warehouse without changing anything
+
+            Args:
+                schema(WarehouseSchema): An schema stored in repository
+                browser(Browser): An browser connected to the warehouse or the
+                                  `Catalog` returned by `browser.snapshot()`
+        """
+        return self.sync(schema, browser, dry_run=True)
+
+    def sync(self, schema, browser, meta_gen=None, dry_run=False):
+        """ Syncs the tables, views and columns of the schema stored in
+            repository with the warehouse. Tables and views with the same
+            fingerprint as on the last sync are skipped without reading their
+            columns, the rest are compared and only the differences applied.
+            All changes are saved with one commit
+
+            Args:
+                schema(WarehouseSchema): An schema stored in repository
+                browser(Browser): An browser connected to the warehouse or the
+                                  `Catalog` returned by `browser.snapshot()`
+                meta_gen(MetaGenerator): Generator of the new repository objects
+                dry_run(bool): Only computes the delta
+
+            Returns:
+                delta(SyncDelta): The changes found
+        """
+        if meta_gen is None:
+            util = Utility()
+            meta_gen = util.get_plugin(util.CONFIG.PATH_BASE_META_GEN)
+        delta = SyncDelta()
+        fingerprints = dict(((fp.object_type, str(fp.object_name).upper()), fp)
+                            for fp in self.__session.query(WarehouseObjectFingerprint)
+                            .filter(WarehouseObjectFingerprint.schema_id == schema.id))
+        repo_objects = {
+            "table": dict((str(tbl.name).upper(), tbl) for tbl in schema.tables),
+            "view": dict((str(view.name).upper(), view) for view in schema.views)
+        }
+        stored_columns = None
+        seen = set()
+        changed = []
+        for object_type, name, sql in browser.get_object_definitions():
+            if str(name).startswith("sqlite_"):
+                continue
+            key = (object_type, str(name).upper())
+            seen.add(key)
+            digest = fingerprint(sql)
+            stored = fingerprints.get(key)
+            repo_obj = repo_objects[object_type].get(key[1])
+            if repo_obj is not None and stored is not None and stored.fingerprint == digest:
+                delta.unchanged += 1
+                continue
+            if repo_obj is None:
+                if object_type == "table":
+                    delta.added_tables.append(name)
+                else:
+                    delta.added_views.append(name)
+            elif object_type == "table":
+                if stored_columns is None:
+                    stored_columns = self._get_stored_columns(schema)
+                columns = self._diff_columns(stored_columns.get(repo_obj.id, []),
+                                             browser.get_table_catalog(name))
+                if columns["added"] or columns["removed"] or columns["altered"]:
+                    delta.altered_tables[name] = columns
+                else:
+                    delta.unchanged += 1
+            elif repo_obj.sql != sql:
+                delta.altered_views.append(name)
+            else:
+                delta.unchanged += 1
+            changed.append((key, name, sql, digest))
+        for object_type, objects in repo_objects.items():
+            for key, repo_obj in objects.items():
+                if (object_type, key) not in seen:
+                    if object_type == "table":
+                        delta.removed_tables.append(repo_obj.name)
+                    else:
+                        delta.removed_views.append(repo_obj.name)
+        LOGGER.debug("Delta of schema '%s': %s" % (schema.name, delta))
+        if dry_run:
+            return delta
+        self._apply(schema, browser, meta_gen, delta, repo_objects,
+                    [name for key, name, _, _ in changed if key[0] == "table"])
+        synced_on = datetime.utcnow()
+        for key, name, sql, digest in changed:
+            stored = fingerprints.get(key)
+            if stored is None:
+                stored = WarehouseObjectFingerprint(schema_id=schema.id, object_type=key[0])
+                self.__session.add(stored)
+            stored.object_name = name
+            stored.fingerprint = digest
+            stored.synced_on = synced_on
+        for key, stored in fingerprints.items():
+            if key not in seen:
+                self.__session.delete(stored)
+        self.__session.commit()
+        join_graph.invalidate(schema.id)
+        LOGGER.debug("Schema '%s' synced with warehouse" % (schema.name))
+        return delta
+
+    def _get_stored_columns(self, schema):
+        """Returns the columns of all tables of the schema by table id, read
+            in one query instead of loading the columns table by table
+        """
+        columns = {}
+        for col in self.__session.query(WarehouseColumn)\
+                .join(WarehouseTable, WarehouseColumn.table_id == WarehouseTable.id)\
+                .filter(WarehouseTable.schema_id == schema.id):
+            columns.setdefault(col.table_id, []).append(col)
+        return columns
+
+    @staticmethod
+    def _diff_columns(columns, catalog):
+        """Returns the added, removed and altered columns of an table"""
+        stored = dict((str(col.name).upper(), col) for col in columns)
+        current = dict((str(column['name']).upper(), column) for column in catalog["columns"])
+        altered = []
+        for key, column in current.items():
+            col = stored.get(key)
+            if col is not None and \
+                    (col.column_type != DataTypes.from_type_name(catalog["types"][key]).value or
+                     bool(col.is_primary_key) != (column['primary_key'] == 1)):
+                altered.append(column['name'])
+        return {
+            "added": [column['name'] for key, column in current.items() if key not in stored],
+            "removed": [col.name for key, col in stored.items() if key not in current],
+            "altered": altered
+        }
+
+    def _apply(self, schema, browser, meta_gen, delta, repo_objects, changed_tables):
+        """Applies the delta to the repository objects of the schema, the FKs
+            of the tables whose DDL has changed are generated again
+        """
+        tables = repo_objects["table"]
+        views = repo_objects["view"]
+        for tbl in meta_gen.generate_tables_meta(delta.added_tables, schema, browser):
+            catalog = browser.get_table_catalog(tbl.name)
+            meta_gen.generate_columns_meta(catalog["columns"], tbl, browser)
+            self.__session.add(tbl)
+        for name, columns in delta.altered_tables.items():
+            tbl = tables[str(name).upper()]
+            catalog = browser.get_table_catalog(name)
+            stored = dict((str(col.name).upper(), col) for col in tbl.columns)
+            removed = [stored[str(col_name).upper()] for col_name in columns["removed"]]
+            self._delete_columns(removed)
+            for col in removed:
+                tbl.columns.remove(col)
+            meta_gen.generate_columns_meta(columns["added"], tbl, browser)
+            for col_name in columns["altered"]:
+                col_key = str(col_name).upper()
+                stored[col_key].column_type = \
+                    DataTypes.from_type_name(catalog["types"][col_key]).value
+                stored[col_key].is_primary_key = \
+                    catalog["column_map"][col_key]['primary_key'] == 1
+                stored[col_key].modified_on = datetime.utcnow()
+            tbl.number_of_columns = len(catalog["columns"])
+            tbl.modified_on = datetime.utcnow()
+        for name in delta.removed_tables:
+            tbl = tables[str(name).upper()]
+            self._delete_columns(tbl.columns)
+            self.__session.query(WarehouseTableStatistics)\
+                .filter(WarehouseTableStatistics.table_id == tbl.id)\
+                .delete(synchronize_session=False)
+            # views still reading the table keep the name of the dependency
+            self.__session.query(WarehouseViewDependency)\
+                .filter(WarehouseViewDependency.table_id == tbl.id)\
+                .update({WarehouseViewDependency.table_id: None}, synchronize_session=False)
+            self.__session.query(WarehouseForeignKey)\
+                .filter(WarehouseForeignKey.referred_table_id == tbl.id)\
+                .update({WarehouseForeignKey.referred_table_id: None},
+                        synchronize_session=False)
+            self.__session.delete(tbl)
+        removed = set(str(name).upper() for name in delta.removed_tables)
+        tables = dict((str(tbl.name).upper(), tbl) for tbl in schema.tables)
+        for name in changed_tables:
+            tbl = tables.get(str(name).upper())
+            if tbl is None or str(name).upper() in removed:
+                continue
+            del tbl.foreign_keys[:]
+            for col in tbl.columns:
+                col.is_foreign_key = False
+            meta_gen.generate_foreign_keys_meta(tbl, schema, browser)
+        added = set(str(name).upper() for name in delta.added_tables)
+        if added:
+            # FKs stored before the tables they refer were added
+            for fk in self.__session.query(WarehouseForeignKey)\
+                    .join(WarehouseTable, WarehouseForeignKey.table_id == WarehouseTable.id)\
+                    .filter(and_(WarehouseTable.schema_id == schema.id,
+                                 WarehouseForeignKey.referred_table_id.is_(None))):
+                if str(fk.referred_table_name).upper() in added:
+                    fk.referred_table = tables[str(fk.referred_table_name).upper()]
+        for view in meta_gen.generate_views_meta(delta.added_views, schema, browser):
+            self.__session.add(view)
+        for name in delta.altered_views:
+            view = views[str(name).upper()]
+            self._delete_columns(view.columns)
+            del view.columns[:]
+            del view.dependencies[:]
+            meta_gen.generate_view_details_meta(view, schema, browser)
+            view.modified_on = datetime.utcnow()
+        for name in delta.removed_views:
+            view = views[str(name).upper()]
+            self._delete_columns(view.columns)
+            self.__session.delete(view)
+
+    def _delete_columns(self, columns):
+        """Deletes the columns along with their statistics and sketches"""
+        column_ids = [col.id for col in columns]
+        if column_ids:
+            self.__session.query(WarehouseColumnStatistics)\
+                .filter(WarehouseColumnStatistics.column_id.in_(column_ids))\
+                .delete(synchronize_session=False)
+            self.__session.query(WarehouseColumnSketch)\
+                .filter(WarehouseColumnSketch.column_id.in_(column_ids))\
+                .delete(synchronize_session=False)
+        for col in list(columns):
+            self.__session.delete(col)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,195 @@
+"""
+    Test cases for ``RepositorySyncManager``
+    Author: Ajeet Singh
+    Date: 07/13/2019
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from sqlalchemy import event
+from bipy.services.db.repository.meta_objects import Base, WarehouseSchema
+from bipy.services.integration import selection
+from bipy.services.utils import Utility
+
+
+class RepositorySyncManagerTestCase(unittest.TestCase):
+    """Test case for RepositorySyncManager
+    """
+    conf = None
+    temp_dir = None
+    db_file = None
+    wh_conn = None
+    repo_conn = None
+    repo_mgr = None
+    sync_mgr = None
+    browser = None
+
+    def setUp(self):
+        util = Utility()
+        self.conf = util.CONFIG
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.temp_dir, "warehouse.db")
+        self._execute("CREATE TABLE ITEMS (ID INTEGER PRIMARY KEY, CODE TEXT)",
+                      "CREATE TABLE ORDERS (ID INTEGER PRIMARY KEY, ITEM_ID INTEGER, QTY INTEGER)",
+                      "CREATE TABLE OBSOLETE (ID INTEGER)",
+                      "CREATE VIEW ITEM_CODES AS SELECT CODE FROM ITEMS")
+        url = "sqlite:///" + self.db_file
+        self.wh_conn = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        self.wh_conn.connect(url)
+        self.repo_conn = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        self.repo_conn.connect("sqlite:///" + os.path.join(self.temp_dir, "meta.db"))
+        Base.metadata.create_all(bind=self.repo_conn.get_engine())
+        selection.harvest_database("WH", "SQLITE", url, "user", "pass",
+                                   self.repo_conn, self.wh_conn)
+        self.repo_mgr = util.get_plugin(self.conf.PATH_REPO_MGR)
+        self.repo_mgr.connect(self.repo_conn)
+        self.sync_mgr = util.get_plugin(self.conf.PATH_REPO_SYNC_MGR)
+        self.sync_mgr.connect(self.repo_conn)
+        self.browser = util.get_plugin(self.conf.PATH_BROWSER)
+        self.browser.connect(self.wh_conn)
+
+    def tearDown(self):
+        self.wh_conn.disconnect()
+        self.repo_conn.disconnect()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _execute(self, *statements):
+        conn = sqlite3.connect(self.db_file)
+        for statement in statements:
+            conn.execute(statement)
+        conn.commit()
+        conn.close()
+
+    def testPluginName(self):
+        plugins = Utility().get_all_plugins(self.conf.PATH_REPO_SYNC_MGR)
+        assert plugins[0].name == 'SQLite Repository Sync Manager'
+
+    def testConnectSetupOnce(self):
+        statements = []
+        engine = self.repo_conn.get_engine()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            self.sync_mgr.connect(self.repo_conn)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert statements == []
+
+    def testSync(self):
+        schema = self.repo_mgr.get_schema("main")
+        delta = self.sync_mgr.sync(schema, self.browser)
+        assert delta.is_empty() and delta.unchanged == 4
+        self._execute("ALTER TABLE ORDERS ADD COLUMN PRICE REAL",
+                      "DROP TABLE OBSOLETE",
+                      "CREATE TABLE CUSTOMERS (ID INTEGER PRIMARY KEY, NAME TEXT)",
+                      "DROP VIEW ITEM_CODES",
+                      "CREATE VIEW ITEM_CODES AS SELECT ID, CODE FROM ITEMS")
+        self.browser.connect(self.wh_conn)
+        delta = self.sync_mgr.diff(schema, self.browser)
+        assert delta.added_tables == ['CUSTOMERS']
+        assert delta.removed_tables == ['OBSOLETE']
+        assert delta.altered_tables == {'ORDERS': {'added': ['PRICE'], 'removed': [],
+                                                   'altered': []}}
+        assert delta.altered_views == ['ITEM_CODES']
+        assert delta.unchanged == 1
+        assert self.repo_mgr.get_table("OBSOLETE") is not None
+        commits = []
+        event.listen(self.repo_conn.get_session(), "after_commit", commits.append)
+        self.sync_mgr.sync(schema, self.browser)
+        assert len(commits) == 1
+        assert self.repo_mgr.get_table("OBSOLETE") is None
+        assert sorted(self.repo_mgr.get_all_table_names(schema)) == \
+            ['CUSTOMERS', 'ITEMS', 'ORDERS']
+        orders = self.repo_mgr.get_table("ORDERS")
+        assert [col.name for col in orders.columns] == ['ID', 'ITEM_ID', 'QTY', 'PRICE']
+        assert orders.number_of_columns == 4
+        view = self.repo_mgr.get_view("ITEM_CODES")
+        assert "ID, CODE" in view.sql
+        assert [col.name for col in view.columns] == ['ID', 'CODE']
+        assert [dep.table.name for dep in view.dependencies] == ['ITEMS']
+        delta = self.sync_mgr.sync(schema, self.browser)
+        assert delta.is_empty() and delta.unchanged == 4
+
+    def testSyncJoinGraph(self):
+        schema = self.repo_mgr.get_schema("main")
+        graph = self.repo_mgr.get_join_graph(schema)
+        assert graph.shortest_path("ORDERS", "ITEMS") is None
+        assert self.repo_mgr.get_join_graph(schema) is graph
+        self._execute("DROP TABLE ORDERS",
+                      "CREATE TABLE ORDERS (ID INTEGER PRIMARY KEY, "
+                      "ITEM_ID INTEGER REFERENCES ITEMS(ID), "
+                      "CUSTOMER_ID INTEGER REFERENCES CUSTOMERS(ID), QTY INTEGER)",
+                      "CREATE TABLE CUSTOMERS (ID INTEGER PRIMARY KEY, NAME TEXT)")
+        self.browser.connect(self.wh_conn)
+        self.sync_mgr.sync(schema, self.browser)
+        graph = self.repo_mgr.get_join_graph(schema)
+        orders = self.repo_mgr.get_table("ORDERS")
+        assert [(fk.constrained_columns, fk.referred_table.name)
+                for fk in orders.foreign_keys] == [('CUSTOMER_ID', 'CUSTOMERS'),
+                                                   ('ITEM_ID', 'ITEMS')]
+        assert [col.name for col in orders.columns if col.is_foreign_key] == \
+            ['ITEM_ID', 'CUSTOMER_ID']
+        path = graph.shortest_path("ITEMS", "CUSTOMERS")
+        assert [(edge.from_columns, edge.to_columns) for edge in path] == \
+            [(('ID',), ('ITEM_ID',)), (('CUSTOMER_ID',), ('ID',))]
+        assert graph.cheapest_path("ITEMS", "CUSTOMERS") == path
+        assert len(graph.join_path(["ORDERS", "ITEMS", "CUSTOMERS"])) == 2
+        assert graph.shortest_path("OBSOLETE", "ITEMS") is None
+
+    def testJoinGraphRowCounts(self):
+        schema = self.repo_mgr.get_schema("main")
+        self._execute("CREATE TABLE LEAF (ID INTEGER PRIMARY KEY)",
+                      "CREATE TABLE HUB1 (ID INTEGER PRIMARY KEY, "
+                      "LEAF_ID INTEGER REFERENCES LEAF(ID))",
+                      "CREATE TABLE HUB2 (ID INTEGER PRIMARY KEY, "
+                      "LEAF_ID INTEGER REFERENCES LEAF(ID))",
+                      "CREATE TABLE SRC (ID INTEGER PRIMARY KEY, "
+                      "HUB1_ID INTEGER REFERENCES HUB1(ID), HUB2_ID INTEGER REFERENCES HUB2(ID))",
+                      "INSERT INTO HUB1 (ID) VALUES (1), (2), (3), (4), (5)",
+                      "INSERT INTO HUB2 (ID) VALUES (1)")
+        self.browser.connect(self.wh_conn)
+        self.sync_mgr.sync(schema, self.browser)
+        util = Utility()
+        collector = util.get_plugin(self.conf.PATH_STATS_COLLECTOR)
+        collector.connect(self.wh_conn, self.repo_conn)
+        tables = [self.repo_mgr.get_table(name) for name in ("HUB1", "HUB2")]
+        collector.collect(tables)
+        graph = self.repo_mgr.get_join_graph(schema)
+        assert [edge.to_table for edge in graph.cheapest_path("SRC", "LEAF")][0] == tables[1].id
+        self._execute("INSERT INTO HUB2 (ID) VALUES (2), (3), (4), (5), (6), (7), (8)")
+        collector.collect(tables)
+        graph = self.repo_mgr.get_join_graph(schema)
+        assert [edge.to_table for edge in graph.cheapest_path("SRC", "LEAF")][0] == tables[0].id
+
+    def testJoinGraphSchemaReused(self):
+        schema = self.repo_mgr.get_schema("main")
+        graph = self.repo_mgr.get_join_graph(schema)
+        assert len(graph) == 3
+        schema_id, database = schema.id, schema.repository_warehouse_databases
+        session = self.repo_conn.get_session()
+        session.delete(schema)
+        session.commit()
+        other = WarehouseSchema(name="other")
+        database.schemas.append(other)
+        self.repo_mgr.save(other)
+        assert other.id == schema_id
+        assert len(self.repo_mgr.get_join_graph(other)) == 0
+
+
+def suite():
+    """Test suite for repository sync manager"""
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(RepositorySyncManagerTestCase('testPluginName'))
+    test_suite.addTest(RepositorySyncManagerTestCase('testConnectSetupOnce'))
+    test_suite.addTest(RepositorySyncManagerTestCase('testSync'))
+    test_suite.addTest(RepositorySyncManagerTestCase('testSyncJoinGraph'))
+    test_suite.addTest(RepositorySyncManagerTestCase('testJoinGraphRowCounts'))
+    test_suite.addTest(RepositorySyncManagerTestCase('testJoinGraphSchemaReused'))
+    return test_suite
+
+
+if __name__ == '__main__':
+    RUNNER = unittest.TextTestRunner()
+    RUNNER.run(suite())
@@ -0,0 +1,65 @@
+"""
+    Immutable nodes of the warehouse tree (database, schemas, tables, views
+    and columns) as read from repository for the GUI. Nodes are plain named
+    tuples detached from the session, children are tuples of nodes
+    Author: Ajeet Singh
+    Date: 07/16/2019
+"""
+from collections import namedtuple
+
+
+DatabaseNode = namedtuple("DatabaseNode", ["id", "name", "db_type", "schemas"])
+SchemaNode = namedtuple("SchemaNode", ["id", "name", "tables", "views"])
+TableNode = namedtuple("TableNode", ["id", "name", "number_of_rows", "contains_numeric_column",
+                                     "columns"])
+ViewNode = namedtuple("ViewNode", ["id", "name", "contains_numeric_column", "columns"])
+ColumnNode = namedtuple("ColumnNode", ["id", "name", "column_type", "is_primary_key",
+                                       "is_foreign_key", "is_fact_candidate",
+                                       "is_dim_candidate"])
+
+
+def column_node(col):
+    """Returns the node of an repository column"""
+    return ColumnNode(col.id, col.name, col.column_type, bool(col.is_primary_key),
+                      bool(col.is_foreign_key), bool(col.is_fact_candidate),
+                      bool(col.is_dim_candidate))
+
+
+def database_node(db_obj):
+    """ Returns the tree of an repository database, the schemas, tables,
+        views and columns are read from the loaded relationships
+
+        Args:
+            db_obj (WarehouseDatabase): The database
+    """
+    schemas = []
+    for schema in db_obj.schemas:
+        tables = tuple(TableNode(tbl.id, tbl.name, tbl.number_of_rows,
+                                 bool(tbl.contains_numeric_column),
+                                 tuple(column_node(col) for col in tbl.columns))
+                       for tbl in schema.tables)
+        views = tuple(ViewNode(view.id, view.name, bool(view.contains_numeric_column),
+                               tuple(column_node(col) for col in view.columns))
+                      for view in schema.views)
+        schemas.append(SchemaNode(schema.id, schema.name, tables, views))
+    return DatabaseNode(db_obj.id, db_obj.name, db_obj.db_type, tuple(schemas))
+
+
+def to_dict(node):
+    """ Returns the node and its children as dicts and lists, suitable to be
+        serialized as JSON
+
+    >>> to_dict(SchemaNode(1, "main", (), ()))
+    {'id': 1, 'name': 'main', 'tables': [], 'views': []}
+    """
+    node_dict = {}
+    for key, value in zip(node._fields, node):
+        if isinstance(value, tuple):
+            value = [to_dict(child) for child in value]
+        node_dict[key] = value
+    return node_dict
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -43,6 +43,25 @@ class DataTypes(AutoNumber):
     TIMEZONE = ()
     BOOLEAN = ()
 
+    @classmethod
+    def from_type_name(cls, type_name):
+        """
+            Returns the data type of an database type name (without length or
+            precision). Names missing in this enum are mapped to the nearest
+            type or STRING (e.g., TEXT, BLOB or no type at all)
+
+            Args:
+                type_name (String): Name of the database type
+        """
+        data_type = cls.__members__.get(type_name) if type_name is not None else None
+        if data_type is None:
+            data_type = cls[TYPE_ALIASES.get(type_name, 'STRING')]
+        return data_type
+
+# Database type names missing in `DataTypes` mapped to the nearest one
+TYPE_ALIASES = {'REAL': 'FLOAT', 'DOUBLE': 'FLOAT', 'BIGINT': 'LONG', 'SMALLINT': 'INTEGER',
+                'TIMESTAMP': 'DATETIME', 'NVARCHAR': 'VARCHAR', 'NCHAR': 'CHAR'}
+
 @unique
 class ViewTypes(AutoNumber):
     """Enum for different type of views
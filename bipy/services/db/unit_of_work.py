@@ -0,0 +1,104 @@
+"""
+    Transaction scope shared by the managers writing to repository. Managers
+    commit through `commit(session)`, which commits right away unless a
+    `batch` scope is open on the session. Within the scope the changes are
+    only flushed and committed once at the end of the scope (or every N
+    operations), so a scripted bulk change pays for one fsync instead of
+    one per operation
+    Author: Ajeet Singh
+    Date: 07/17/2019
+"""
+from contextlib import contextmanager
+from bipy.services.db.repository import cache
+from bipy.logging import logger
+
+
+LOGGER = logger.get_logger(__name__)
+# key of the open scope in `session.info`
+_SCOPE_KEY = "bipy.unit_of_work"
+
+
+class BatchScope:
+    """ An open batch of a session, it counts the operations committed
+        through `commit` and the actual commits done
+    """
+
+    def __init__(self, session, commit_every=None):
+        """Default constructor
+
+            Args:
+                session (Session): The session of the batch
+                commit_every (int): Commits after every N operations, None
+                                    commits only at the end of the scope
+        """
+        self.session = session
+        self.commit_every = commit_every
+        self.operations = 0
+        self.commits = 0
+
+    def __repr__(self):
+        """Returns string representation
+        """
+        return "Batch Scope [Operations=%d, Commits=%d, CommitEvery=%s]" % (
+            self.operations, self.commits, self.commit_every)
+
+
+def get_scope(session):
+    """Returns the `BatchScope` open on the session or None"""
+    return session.info.get(_SCOPE_KEY)
+
+
+def commit(session):
+    """ Commits the session unless a batch is open on it, in which case the
+        changes are flushed (so new objects get their ids) and committed by
+        the batch
+
+        Args:
+            session (Session): The session to commit
+    """
+    scope = session.info.get(_SCOPE_KEY)
+    if scope is None:
+        session.commit()
+        return
+    scope.operations += 1
+    if scope.commit_every and scope.operations % scope.commit_every == 0:
+        session.commit()
+        scope.commits += 1
+    else:
+        session.flush()
+
+
+@contextmanager
+def batch(session, commit_every=None):
+    """ Opens an transaction scope on the session, the commits done through
+        `commit` within the scope are deferred to the end of the scope. On
+        error everything not committed yet is rolled back, i.e., the whole
+        scope unless `commit_every` is set, and the lookup cache of the
+        repository is cleared as objects looked up within the scope may be
+        gone. A batch opened within an open batch joins the outer one
+
+        Args:
+            session (Session): The session shared by the managers
+            commit_every (int): Commits after every N operations
+
+        Yields:
+            scope (BatchScope): The open scope
+    """
+    scope = session.info.get(_SCOPE_KEY)
+    if scope is not None:
+        yield scope
+        return
+    scope = session.info[_SCOPE_KEY] = BatchScope(session, commit_every)
+    try:
+        yield scope
+        session.commit()
+        scope.commits += 1
+    except Exception:
+        LOGGER.error("Batch failed after %d operations, rolling back" % scope.operations)
+        session.rollback()
+        cache.invalidate(session.get_bind())
+        raise
+    finally:
+        del session.info[_SCOPE_KEY]
+    LOGGER.debug("Batch of %d operations saved with %d commits"
+                 % (scope.operations, scope.commits))
@@ -8,17 +8,52 @@
     Author: Ajeet Singh
     Date: 05/21/2019
 """
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from sqlalchemy import inspect
 from bipy.services.db.repository.meta_objects import WarehouseDatabase, WarehouseSchema
 from bipy.services.db.repository.meta_objects import WarehouseTable, WarehouseColumn
-from bipy.services.db.repository.meta_objects import WarehouseView
+from bipy.services.db.repository.meta_objects import WarehouseView, WarehouseViewDependency
+from bipy.services.db.repository.meta_objects import WarehouseForeignKey
 from bipy.services.db import categories
-from bipy.services.db.repository.types import DataTypes
+# the module is imported instead of the class, else yapsy would load the
+# connection manager as plugin of this module
+from bipy.services.db.connection_managers.sqlite import manager as sqlite_manager
+from bipy.services.db.repository.types import DataTypes, ViewTypes
+from bipy.services.db.warehouse.browsers.sqlite.catalog import normalize_type
+from bipy.services.db.warehouse.statistics.sketches import classify_cardinality
+from bipy.services.utils import Utility
 from bipy.logging import logger
 
 
 LOGGER = logger.get_logger(__name__)
 
 
+def introspect_table(conn_string, table_name):
+    """ Reads the columns and primary key of a table over an read only
+        connection, disconnected once done. The engine and its pool are
+        cached per process, so the connection is cheap. The result holds
+        plain values only, so it can be returned from an worker process as well
+
+        Args:
+            conn_string (String): URL of the warehouse
+            table_name (String): Name of the table
+
+        Returns:
+            table (Dict): Dict with keys `name` and `columns`, list of tuples
+                          of (column name, type name, is primary key)
+    """
+    connection = sqlite_manager.ConnectionManager()
+    connection.connect(conn_string, read_only=True)
+    try:
+        with connection.get_engine().connect() as conn:
+            inspector = inspect(conn)
+            columns = [(col['name'], normalize_type(col['type']), col['primary_key'] == 1)
+                       for col in inspector.get_columns(table_name)]
+    finally:
+        connection.disconnect()
+    return {"name": table_name, "columns": columns}
+
+
 class MetaGenerator(categories.SQLite):
     """
         This class will deal with the core logic of generating metadata using
@@ -142,7 +177,8 @@ class MetaGenerator(categories.SQLite):
             Args:
                 table_list (Dict): A list of table names
                 schema (WarehouseSchema): A schema instance (WarehouseSchema)
-                browser (Browser): An database browser object
+                browser (Browser): An database browser object or the `Catalog`
+                                  returned by `browser.snapshot()`
         """
         if schema is None:
             LOGGER.error("Schema parameter should not be a None value")
@@ -158,12 +194,14 @@ class MetaGenerator(categories.SQLite):
             table_obj.name = table
             LOGGER.debug("WarehouseTable instance created for table '%s' and added to list"
                          % (table))
-            columns = browser.get_columns(table)
+            catalog = browser.get_table_catalog(table)
+            columns = catalog["columns"]
             table_obj.number_of_columns = columns.__len__()
             for col in columns:
                 LOGGER.debug("Column '%s' has been created under table '%s'"
                              % (col['name'], table))
-                if col['type'].__str__() in ['INTEGER', 'NUMERIC', 'FLOAT', 'DOUBLE', 'LONG']:
+                if catalog["types"][str(col['name']).upper()] in ['INTEGER', 'NUMERIC', 'FLOAT',
+                                                                  'DOUBLE', 'LONG']:
                     table_obj.contains_numeric_column = True
                     LOGGER.debug("Table '%s' marked as 'contains_numeric_column' as the column\
                                   '%s' has datatype as NUMBER" % (table, col['name']))
@@ -172,13 +210,77 @@ class MetaGenerator(categories.SQLite):
             tables.append(table_obj)
         return tables
 
+    def harvest_tables(self, table_list, schema, conn_string, workers=None,
+                       use_processes=None, progress=None, cardinalities=None):
+        """Generates the repository objects of tables along with their columns,
+            introspecting the tables in parallel. Each worker reads from its
+            own read only connection to the warehouse while the repository
+            objects are created on the calling thread in the order of
+            `table_list`, whatever the order the workers finish in
+
+            Args:
+                table_list (List): A list of table names
+                schema (WarehouseSchema): A schema instance (WarehouseSchema)
+                conn_string (String): URL of the warehouse
+                workers (int): Number of workers, `HARVEST.workers` by default
+                use_processes (bool): Runs the workers in processes instead of
+                                      threads, `HARVEST.use_processes` by default
+                progress (callable): Called on the calling thread as each table
+                                     is introspected with the args (number of
+                                     tables done, total tables, table name)
+                cardinalities (Dict): Table name to cardinalities of its columns
+                                      as accepted by `generate_columns_meta`
+        """
+        if schema is None:
+            LOGGER.error("Schema parameter should not be a None value")
+            raise ValueError("Schema parameter should not be a None value")
+        conf = Utility().CONFIG.get("HARVEST")
+        if workers is None:
+            workers = conf.get("workers", 4) if conf is not None else 4
+        if use_processes is None:
+            use_processes = conf.get("use_processes", False) if conf is not None else False
+        executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        LOGGER.debug("Harvesting %d tables under schema '%s' using %d %s"
+                     % (len(table_list), schema.name, workers,
+                        "processes" if use_processes else "threads"))
+        results = [None] * len(table_list)
+        with executor_cls(max_workers=max(1, workers)) as executor:
+            futures = dict((executor.submit(introspect_table, conn_string, table), index)
+                           for index, table in enumerate(table_list))
+            for done, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                results[index] = future.result()
+                if progress is not None:
+                    progress(done, len(table_list), table_list[index])
+        tables = []
+        for result in results:
+            table_obj = WarehouseTable()
+            table_obj.name = result["name"]
+            table_obj.number_of_columns = len(result["columns"])
+            table_cardinalities = cardinalities.get(result["name"]) \
+                if cardinalities is not None else None
+            for col_name, col_type, is_primary_key in result["columns"]:
+                if col_type in ['INTEGER', 'NUMERIC', 'FLOAT', 'DOUBLE', 'LONG']:
+                    table_obj.contains_numeric_column = True
+                cardinality = table_cardinalities.get(str(col_name).upper()) \
+                    if table_cardinalities is not None else None
+                table_obj.columns.append(self.generate_column_meta(col_name, col_type,
+                                                                   is_primary_key, cardinality))
+            schema.tables.append(table_obj)
+            tables.append(table_obj)
+        LOGGER.debug("Harvest of %d tables under schema '%s' completed"
+                     % (len(tables), schema.name))
+        return tables
+
     def generate_views_meta(self, view_list, schema, browser):
-        """Generates an list of views as repository objects
+        """Generates an list of views as repository objects along with their
+            columns and the base tables they read
 
             Args:
                 view_list (List): A list of view names
                 schema (WarehouseSchema): A schema instance (WarehouseSchema)
-                browser (Browser): An database browser object
+                browser (Browser): An database browser object or the `Catalog`
+                                  returned by `browser.snapshot()`
         """
         if schema is None:
             LOGGER.error("Schema parameter should not be a None value")
@@ -191,12 +293,81 @@ class MetaGenerator(categories.SQLite):
         for view in view_list:
             view_obj = WarehouseView()
             view_obj.name = view
-            view_obj.sql = browser.get_view_definition(view)
+            self.generate_view_details_meta(view_obj, schema, browser)
             schema.views.append(view_obj)
             LOGGER.debug("View '%s' has been created under schema '%s'" % (view, schema.name))
             views.append(view_obj)
         return views
 
+    def generate_view_details_meta(self, view, schema, browser):
+        """Sets the SQL, columns and dependencies of an view object as read
+            from the warehouse. The view should not have any columns or
+            dependencies yet, dependencies are linked to the tables of the
+            schema by name
+
+            Args:
+                view (WarehouseView): A view instance (WarehouseView)
+                schema (WarehouseSchema): A schema instance (WarehouseSchema)
+                browser (Browser): An database browser object or the `Catalog`
+                                  returned by `browser.snapshot()`
+        """
+        catalog = browser.get_table_catalog(view.name)
+        view.sql = browser.get_view_definition(view.name)
+        view.number_of_columns = len(catalog["columns"])
+        view.contains_numeric_column = False
+        for column in catalog["columns"]:
+            col_type = catalog["types"][str(column['name']).upper()]
+            if col_type in ['INTEGER', 'NUMERIC', 'FLOAT', 'DOUBLE', 'LONG']:
+                view.contains_numeric_column = True
+            col_obj = self.generate_column_meta(column['name'], col_type, False)
+            col_obj.belongs_to_view = True
+            col_obj.view_type = ViewTypes.VIEW.value
+            view.columns.append(col_obj)
+        tables = dict((str(tbl.name).upper(), tbl) for tbl in schema.tables)
+        for table_name in browser.get_view_dependencies(view.name):
+            dependency = WarehouseViewDependency(table_name=table_name)
+            dependency.table = tables.get(str(table_name).upper())
+            view.dependencies.append(dependency)
+        LOGGER.debug("View '%s' has %d columns and reads tables %s"
+                     % (view.name, view.number_of_columns,
+                        [dependency.table_name for dependency in view.dependencies]))
+        return view
+
+    def generate_foreign_keys_meta(self, table, schema, browser):
+        """Generates the FKs of an table as repository objects and marks the
+            constrained columns as FK. The referred tables are linked to the
+            tables of the schema by name, so the FKs should be generated once
+            all tables of the schema are generated
+
+            Args:
+                table (WarehouseTable): A table instance (WarehouseTable)
+                schema (WarehouseSchema): A schema instance (WarehouseSchema)
+                browser (Browser): An database browser object or the `Catalog`
+                                  returned by `browser.snapshot()`
+        """
+        if table is None:
+            LOGGER.error("Table parameter should not be a None value")
+            raise ValueError("Table parameter should not be a None value")
+        tables = dict((str(tbl.name).upper(), tbl) for tbl in schema.tables)
+        columns = dict((str(col.name).upper(), col) for col in table.columns)
+        foreign_keys = []
+        for fk in browser.get_table_catalog(table.name)["foreign_keys"]:
+            fk_obj = WarehouseForeignKey()
+            fk_obj.name = fk['name']
+            fk_obj.constrained_columns = ",".join(fk['constrained_columns'])
+            fk_obj.referred_table_name = fk['referred_table']
+            fk_obj.referred_columns = ",".join(fk['referred_columns'])
+            fk_obj.referred_table = tables.get(str(fk['referred_table']).upper())
+            for col_name in fk['constrained_columns']:
+                col_obj = columns.get(str(col_name).upper())
+                if col_obj is not None:
+                    col_obj.is_foreign_key = True
+            table.foreign_keys.append(fk_obj)
+            LOGGER.debug("FK of table '%s' on %s refers table '%s'"
+                         % (table.name, fk_obj.constrained_columns, fk_obj.referred_table_name))
+            foreign_keys.append(fk_obj)
+        return foreign_keys
+
     def generate_mviews_meta(self, mview_list, schema, browser):
         """Generates an list of Materialized View as repo objects
             **WARNING**: Materialized Views are not supported in SQLite
@@ -234,13 +405,20 @@ class MetaGenerator(categories.SQLite):
         LOGGER.error("Functions are not suppoeted by SQLite")
         raise NotImplementedError("Functions are not supported by SQLite")
 
-    def generate_columns_meta(self, column_list, table, browser):
-        """Generates an list of columns as repo objects
+    def generate_columns_meta(self, column_list, table, browser, cardinalities=None):
+        """Generates an list of columns as repo objects. Columns are marked
+            as fact or dimension candidates by their estimated cardinality if
+            available, otherwise by their type
 
             Args:
-                 column_list (List): A list of column names
+                 column_list (List): A list of column names or column dicts
+                                     as returned by `browser.get_columns`
                  table (WarehouseTable): A table instance (WarehouseTable)
-                 browser (Browser): An database browser instance
+                 browser (Browser): An database browser instance or the
+                                    `Catalog` returned by `browser.snapshot()`
+                 cardinalities (Dict): Upper case column name to tuple of
+                                       (distinct count, row count) as returned
+                                       by `StatisticsCollector.estimate_cardinalities`
         """
         if browser is None:
             LOGGER.error("Browser parameter should not be a None value")
@@ -249,40 +427,60 @@ class MetaGenerator(categories.SQLite):
             LOGGER.error("Table parameter should not be a None value")
             raise ValueError("Table parameter should not be a None value")
         columns = []
-        LOGGER.error("Preparing to create columns meta for table '%s'"
+        LOGGER.debug("Preparing to create columns meta for table '%s'"
                      % (table.name))
+        catalog = browser.get_table_catalog(table.name)
         for col in column_list:
-            column = browser.get_column(col, table.name)
-            col_obj = WarehouseColumn()
-            col_obj.name = column['name']
-            raw_column_type = column['type']
-            LOGGER.debug("WarehouseColumn instance created for column '%s'\
+            col_name = col['name'] if isinstance(col, dict) else col
+            column = catalog["column_map"].get(str(col_name).upper())
+            if column is None:
+                LOGGER.error("Column '%s' not found in table '%s'" % (col_name, table.name))
+                raise ValueError("Column '%s' not found in table '%s'" % (col_name, table.name))
+            LOGGER.debug("WarehouseColumn instance will be created for column '%s'\
                           with datatype as '%s'" %
-                         (col_obj.name, str(raw_column_type)))
-            if column['primary_key'] == 1:
-                LOGGER.debug("Column '%s' is a primary key" % (col_obj.name))
-                col_obj.is_primary_key = True
-            col_string = str(raw_column_type)
-            paran_index = col_string.find("(", 0)
-            if paran_index >= 0:
-                col_type = col_string[0:paran_index]
-            else:
-                col_type = col_string
-            col_obj.column_type = DataTypes[col_type].value
-            if col_type in ['FLOAT', 'DOUBLE', 'LONG', 'INTEGER', 'NUMERIC']:
-                col_obj.is_fact_candidate = True
-                LOGGER.debug("Column '%s' is a fact candidate"
-                             % (col_obj.name))
-            else:
-                col_obj.is_dim_candidate = True
-                LOGGER.debug("Column '%s' is a dim candidate"
-                             % (col_obj.name))
+                         (column['name'], str(column['type'])))
+            cardinality = cardinalities.get(str(col_name).upper()) \
+                if cardinalities is not None else None
+            col_obj = self.generate_column_meta(column['name'],
+                                                catalog["types"][str(col_name).upper()],
+                                                column['primary_key'] == 1, cardinality)
             table.columns.append(col_obj)
             LOGGER.debug("Column '%s' has been added to table '%s'"
                          % (col_obj.name, table.name))
             columns.append(col_obj)
         return columns
 
+    @staticmethod
+    def generate_column_meta(name, col_type, is_primary_key, cardinality=None):
+        """Returns an repository column object marked as fact or dimension
+            candidate
+
+            Args:
+                name (String): Name of the column
+                col_type (String): Type name without length/precision
+                is_primary_key (bool): Column is part of primary key
+                cardinality (Tuple): (distinct count, row count) of column
+        """
+        col_obj = WarehouseColumn()
+        col_obj.name = name
+        if is_primary_key:
+            LOGGER.debug("Column '%s' is a primary key" % (name))
+            col_obj.is_primary_key = True
+        col_obj.column_type = DataTypes.from_type_name(col_type).value
+        if cardinality is not None:
+            col_obj.is_fact_candidate, col_obj.is_dim_candidate = \
+                classify_cardinality(col_type, *cardinality)
+            LOGGER.debug("Column '%s' has %d distinct values in %d rows (fact: %s, dim: %s)"
+                         % (name, cardinality[0], cardinality[1],
+                            col_obj.is_fact_candidate, col_obj.is_dim_candidate))
+        elif col_type in ['FLOAT', 'DOUBLE', 'LONG', 'INTEGER', 'NUMERIC']:
+            col_obj.is_fact_candidate = True
+            LOGGER.debug("Column '%s' is a fact candidate" % (name))
+        else:
+            col_obj.is_dim_candidate = True
+            LOGGER.debug("Column '%s' is a dim candidate" % (name))
+        return col_obj
+
 
 if __name__ == "__main__":
     import doctest
@@ -62,6 +62,14 @@ class MetaGeneratorTestCase(testmetadata.BrowserTestCase):
         self.views = self.mg.generate_views_meta(self.browser.get_views(),
                                                  self.schema[0], self.browser)
         assert self.views.__repr__() == '[Warehouse View [Name=revenue_details, SchemaId=-1]]'
+        view = self.views[0]
+        assert view.number_of_columns == 6 and view.contains_numeric_column
+        assert [col.name for col in view.columns] == ['customer_id', 'product_id',
+                                                      'product_name', 'cost',
+                                                      'product_qty', 'revenue']
+        assert all(col.belongs_to_view for col in view.columns)
+        assert [dep.table_name for dep in view.dependencies] == \
+            ['CUSTOMER_MASTER', 'PRODUCT_MASTER', 'SALES_DETAILS']
 
     def testMGColumnObject(self):
         if self.tables is None:
@@ -70,6 +78,48 @@ class MetaGeneratorTestCase(testmetadata.BrowserTestCase):
         self.columns = self.mg.generate_columns_meta(self.browser.get_columns('product_master'), self.tables[1], self.browser)
         assert self.columns[0].__repr__() == 'Warehouse Column [Name=id, TypeId=2, TableId=-1, ViewId=-1, MViewId=-1]'
 
+    def testMGForeignKeyObject(self):
+        if self.tables is None:
+            self.testMGTableObject()
+        sales = self.tables[2]
+        self.mg.generate_columns_meta(self.browser.get_columns(sales.name), sales, self.browser)
+        fks = self.mg.generate_foreign_keys_meta(sales, self.schema[0], self.browser)
+        assert [(fk.constrained_columns, fk.referred_table_name, fk.referred_columns)
+                for fk in fks] == [('customer_id', 'CUSTOMER_MASTER', 'id'),
+                                   ('product_id', 'PRODUCT_MASTER', 'id')]
+        assert fks[0].referred_table is self.tables[0]
+        assert [col.name for col in sales.columns if col.is_foreign_key] == \
+            ['customer_id', 'product_id']
+        assert self.mg.generate_foreign_keys_meta(self.tables[0], self.schema[0],
+                                                  self.browser) == []
+
+    def testMGColumnCardinality(self):
+        if self.tables is None:
+            self.testMGTableObject()
+        #integer codes with few distinct values are dimensions, high cardinality text isn't
+        cardinalities = {'ID': (1000, 1000), 'PRODUCT_NAME': (990, 1000), 'COST': (12, 1000)}
+        self.columns = self.mg.generate_columns_meta(['id', 'product_name', 'cost'], self.tables[1],
+                                                     self.browser, cardinalities)
+        assert self.columns[0].is_fact_candidate and not self.columns[0].is_dim_candidate
+        assert not self.columns[1].is_fact_candidate and not self.columns[1].is_dim_candidate
+        assert not self.columns[2].is_fact_candidate and self.columns[2].is_dim_candidate
+
+    def testMGHarvestTables(self):
+        if self.schema is None:
+            self.testMGSchemaObject()
+        tbl_list = ['SALES_DETAILS', 'CUSTOMER_MASTER', 'PRODUCT_MASTER']
+        done = []
+        tables = self.mg.harvest_tables(tbl_list, self.schema[0], self.conf.URL_TEST_DB,
+                                        workers=3, progress=lambda *args: done.append(args))
+        assert [tbl.name for tbl in tables] == tbl_list
+        assert sorted(args[2] for args in done) == sorted(tbl_list)
+        assert done[-1][0:2] == (3, 3)
+        assert tables[2].columns[0].__repr__() == 'Warehouse Column [Name=id, TypeId=2, TableId=-1, ViewId=-1, MViewId=-1]'
+        assert tables[2].number_of_columns == 3
+        tables = self.mg.harvest_tables(tbl_list, self.schema[0], self.conf.URL_TEST_DB,
+                                        workers=2, use_processes=True)
+        assert [len(tbl.columns) for tbl in tables] == [4, 3, 3]
+
 
 def suite():
     suite = testmetadata.suite()
@@ -80,6 +130,9 @@ def suite():
     suite.addTest(MetaGeneratorTestCase("testMGTableObject"))
     suite.addTest(MetaGeneratorTestCase("testMGViewObject"))
     suite.addTest(MetaGeneratorTestCase("testMGColumnObject"))
+    suite.addTest(MetaGeneratorTestCase("testMGForeignKeyObject"))
+    suite.addTest(MetaGeneratorTestCase("testMGColumnCardinality"))
+    suite.addTest(MetaGeneratorTestCase("testMGHarvestTables"))
     return suite
 
 if __name__ == "__main__":
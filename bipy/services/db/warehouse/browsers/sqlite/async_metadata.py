@@ -0,0 +1,228 @@
+"""
+ Asyncio front end of the SQLite metadata browser. Every lookup is run in
+ the thread pool of the async connection manager so that an slow lookup on
+ a large catalog doesn't block the event loop
+ Author: Ajeet Singh
+ Date: 07/06/2019
+"""
+import asyncio
+from bipy.services.db.warehouse.browsers.sqlite.metadata import Browser
+from bipy.logging import logger
+
+
+LOGGER = logger.get_logger(__name__)
+
+
+class AsyncBrowser:
+    """
+        Async variant of the SQLite `Browser`. Unlike the plugin, it is not
+        a singleton, every instance browses the database of the async
+        connection it has been connected to
+
+        >>> import asyncio
+
+        >>> from bipy.services.utils import Utility
+
+        >>> from bipy.services.db.connection_managers.sqlite.async_manager\
+                import AsyncConnectionManager
+
+        >>> conf = Utility().CONFIG
+
+        >>> loop = asyncio.get_event_loop()
+
+        >>> conn = AsyncConnectionManager()
+
+        >>> loop.run_until_complete(conn.connect(conf.URL_TEST_DB))
+
+        >>> browser = AsyncBrowser()
+
+        >>> loop.run_until_complete(browser.connect(conn))
+
+        >>> loop.run_until_complete(browser.get_schemas())
+        ['main']
+    """
+
+    def __init__(self):
+        """Default constructor of the async browser
+        """
+        LOGGER.debug("Init SQLite Async Browser instance")
+        self.connection = None
+        # the plugin class is a singleton shared by the blocking endpoints,
+        # so a private instance is created for this browser
+        self._browser = object.__new__(Browser)
+        Browser.__init__(self._browser)
+        self._browser.ConnectedSession = None
+
+    async def connect(self, connection):
+        """Connects the browser to an database using async connection
+            passed as param
+
+            Args:
+                connection (AsyncConnectionManager): An async connection
+                to SQLite DB
+        """
+        self.connection = connection
+        await connection.run(self._connect)
+        LOGGER.debug("SQLite Async Browser connected to database successfully")
+
+    def _connect(self):
+        """Connects the wrapped browser, creating the inspector of the
+            connection in an worker thread
+        """
+        self._browser.connect(self.connection.get_connection())
+
+    def __repr__(self):
+        """Returns string representation
+        """
+        return "SQLite async browser instance"
+
+    async def _call(self, method, *args):
+        """Runs an method of the wrapped browser in the thread pool
+        """
+        return await self.connection.run(getattr(self._browser, method), *args)
+
+    async def refresh_catalog(self):
+        """Drops the cached table catalogs if the schema of the database has
+            changed since they were built
+        """
+        return await self._call("refresh_catalog")
+
+    async def get_schemas(self):
+        """Returns list of schemas
+        """
+        return await self._call("get_schemas")
+
+    async def get_tables(self, schema=None):
+        """Returns list of tables
+        """
+        return await self._call("get_tables", schema)
+
+    async def get_views(self, schema=None):
+        """Returns list of views
+        """
+        return await self._call("get_views", schema)
+
+    async def get_view_definition(self, view, schema=None):
+        """Returns the SQL query used to create view
+        """
+        return await self._call("get_view_definition", view, schema)
+
+    async def get_columns(self, table_name):
+        """
+            Returns list of columns available as dict object of a given table
+
+            Args:
+                table_name (string): name of the table
+        """
+        return await self._call("get_columns", table_name)
+
+    async def get_column(self, column_name, table_name):
+        """
+            Returns an dict object as properties of column in a provided table
+
+            Args:
+                column_name (String): Name of the Column
+                table_name (String): Name pf table which contains column
+        """
+        return await self._call("get_column", column_name, table_name)
+
+    async def get_column_names(self, table_name):
+        """
+            Return list of column names
+
+            Args:
+                table_name (string): name of the table
+        """
+        return await self._call("get_column_names", table_name)
+
+    async def get_column_type(self, table_name, column_name):
+        """
+            Returns the type of column of the table passed as arg
+
+            Args:
+                table_name (string): name of the table
+                column_name (string): name of the column
+        """
+        return await self._call("get_column_type", table_name, column_name)
+
+    async def get_primary_key_columns(self, table_name):
+        """
+            Returns all columns available as primary key of the table
+
+            Args:
+                table_name (string): name of the table
+        """
+        return await self._call("get_primary_key_columns", table_name)
+
+    async def get_primary_key_name(self, table_name):
+        """
+            Returns the name of the primary key (i.e., name of PK constraint)
+
+            Args:
+                table_name (string): name of the table
+        """
+        return await self._call("get_primary_key_name", table_name)
+
+    async def get_table_options(self, table_name):
+        """
+            Returns options of a given table
+
+            Args:
+                table_name (string): name of the table
+        """
+        return await self._call("get_table_options", table_name)
+
+    async def get_foreign_keys(self, table_name):
+        """
+            Returns list of foreign keys as dict objects of a given table
+
+            Args:
+                table_name (string): name of the table
+        """
+        return await self._call("get_foreign_keys", table_name)
+
+    async def get_table_details(self, table_names):
+        """
+            Returns columns, primary key and foreign keys of all tables passed
+            as arg. Lookups of the tables run concurrently in the thread pool
+
+            Args:
+                table_names (list): names of the tables
+
+            Returns:
+                details (Dict): Table name mapped to dict with keys `columns`,
+                                `primary_key` and `foreign_keys`
+        """
+        lookups = []
+        for table_name in table_names:
+            lookups.append(self.get_columns(table_name))
+            lookups.append(self.get_primary_key_columns(table_name))
+            lookups.append(self.get_foreign_keys(table_name))
+        results = await asyncio.gather(*lookups)
+        details = {}
+        for index, table_name in enumerate(table_names):
+            details[table_name] = {
+                "columns": results[index * 3],
+                "primary_key": results[index * 3 + 1],
+                "foreign_keys": results[index * 3 + 2]
+            }
+        return details
+
+    async def snapshot(self):
+        """
+            Returns the `Catalog` of all tables and views of the database
+            read in a handful of set based queries
+        """
+        return await self._call("snapshot")
+
+    async def close(self):
+        """
+            Closes the session of the worker threads with the database
+        """
+        await self.connection.disconnect()
+        LOGGER.debug("SQLite async browser session has been closed")
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,344 @@
+"""
+ In memory catalog of an SQLite database as built by `Browser.snapshot` and
+ the per table catalogs cached by the browser
+ Author: Ajeet Singh
+ Date: 07/08/2019
+"""
+import re
+from collections import OrderedDict
+from sqlalchemy.types import NullType
+
+# ----------set based queries used by the snapshot------
+# (SQLite numbers FKs in reverse order of declaration), `{master}` is the
+# sqlite_master of the schema read and `{schema}` the schema argument of the
+# pragma functions
+_OBJECTS_SQL = "SELECT type, name, sql FROM {master} " \
+    "WHERE type IN ('table', 'view') ORDER BY name"
+OBJECTS_SQL = _OBJECTS_SQL.format(master="sqlite_master")
+_COLUMNS_SQL = "SELECT m.name, p.cid, p.name, p.type, p.\"notnull\", p.dflt_value, p.pk, " \
+    "{hidden} FROM {master} AS m JOIN pragma_{function}(m.name{schema}) AS p " \
+    "WHERE m.type {type_filter} ORDER BY m.name, p.cid"
+_FOREIGN_KEYS_SQL = "SELECT m.name, f.id, f.seq, f.\"table\", f.\"from\", f.\"to\" " \
+    "FROM {master} AS m JOIN pragma_foreign_key_list(m.name{schema}) AS f " \
+    "WHERE m.type = 'table' ORDER BY m.name, f.id DESC, f.seq"
+_INDEXES_SQL = "SELECT m.name, l.seq, l.name, l.\"unique\", i.seqno, i.name " \
+    "FROM {master} AS m JOIN pragma_index_list(m.name{schema}) AS l " \
+    "JOIN pragma_index_info(l.name{schema}) AS i " \
+    "WHERE m.type = 'table' ORDER BY m.name, l.seq, i.seqno"
+_ROOTPAGES_SQL = "SELECT rootpage, tbl_name FROM {master} " \
+    "WHERE type IN ('table', 'index') AND rootpage > 0"
+_PK_PATTERN = re.compile(r"CONSTRAINT (\w+) PRIMARY KEY", re.I)
+
+
+def normalize_type(col_type):
+    """ Returns the type name of an SQLAlchemy type without length/precision
+        (e.g., VARCHAR for VARCHAR(255)) or None for columns declared
+        without any type
+
+        Args:
+            col_type (TypeEngine): The type of the column
+    """
+    if col_type is None or isinstance(col_type, NullType):
+        return None
+    col_str = str(col_type)
+    paran_index = col_str.find("(", 0)
+    return col_str[0:paran_index] if paran_index >= 0 else col_str
+
+
+def make_table_catalog(name, columns, primary_key, foreign_keys,
+                       object_type="table", sql=None, indexes=None, types=None,
+                       dependencies=None):
+    """ Returns the catalog of a table or view as dict with the keys `name`,
+        `type`, `sql`, `columns` (list of column dicts as returned by the
+        inspector), `column_map` (upper case column name to column dict),
+        `types` (upper case column name to normalized type name),
+        `primary_key`, `foreign_keys`, `indexes` and `dependencies`
+
+        Args:
+            name (String): Name of the table or view
+            columns (List): Column dicts in the order of declaration
+            primary_key (Dict): PK constraint as returned by the inspector
+            foreign_keys (List): FK dicts as returned by the inspector
+            object_type (String): `table` or `view`
+            sql (String): DDL of the table or view
+            indexes (List): Index dicts as returned by the inspector
+            types (Dict): Normalized types by upper case column name, these
+                          are derived from the columns if not passed
+            dependencies (List): Names of the tables a view reads, None if
+                                 not read yet
+    """
+    column_map = {}
+    for col in columns:
+        column_map[str(col['name']).upper()] = col
+    if types is None:
+        types = dict((str(col['name']).upper(), normalize_type(col['type']))
+                     for col in columns)
+    return {
+        "name": name,
+        "type": object_type,
+        "sql": sql,
+        "columns": columns,
+        "column_map": column_map,
+        "types": types,
+        "primary_key": primary_key,
+        "foreign_keys": foreign_keys,
+        "indexes": indexes if indexes is not None else [],
+        "dependencies": dependencies
+    }
+
+
+def _schema_args(schema):
+    """ Returns the format args of the snapshot queries reading the schema
+        passed as param, the main database if None
+    """
+    if schema is None:
+        return {"prefix": "", "master": "sqlite_master", "schema": ""}
+    prefix = '"%s".' % schema.replace('"', '""')
+    return {"prefix": prefix, "master": prefix + "sqlite_master",
+            "schema": ", '%s'" % schema.replace("'", "''")}
+
+
+def read_catalog(conn, schema=None):
+    """ Reads the catalog of all tables and views of the SQLite database
+        using an open connection. Column dicts are built the same way as the
+        SQLAlchemy inspector builds them, except that columns declared with
+        the same type share the type object. FK names are not parsed from DDL
+
+        Args:
+            conn (Connection): An SQLAlchemy connection to the database
+            schema (String): Name of the schema (i.e., attached database) to
+                             read, the main database if None
+
+        Returns:
+            catalog (Catalog): The catalog of the database
+    """
+    dialect = conn.dialect
+    # declared type to (resolved type, normalized name), resolving types is
+    # the most expensive part of reading columns and most of them repeat
+    resolved = {}
+    args = _schema_args(schema)
+    schema_version = conn.execute("PRAGMA {prefix}schema_version".format(**args)).scalar()
+    objects = OrderedDict()
+    for object_type, name, sql in conn.execute(_OBJECTS_SQL.format(**args)):
+        objects[name] = {"type": object_type, "sql": sql, "columns": [], "pk": [],
+                         "types": {}, "fks": OrderedDict(), "indexes": OrderedDict()}
+    rows = list(_read_columns(conn, "= 'table'", args))
+    try:
+        rows.extend(_read_columns(conn, "= 'view'", args))
+    except Exception:
+        # an view referring to an dropped table fails the whole query,
+        # such views are read one by one and the broken ones skipped
+        for name, obj in objects.items():
+            if obj["type"] == "view":
+                try:
+                    rows.extend(_read_columns(conn, "= 'view' AND m.name = '%s'"
+                                              % name.replace("'", "''"), args))
+                except Exception:
+                    pass
+    for table, _, col_name, col_type, notnull, default, pk, hidden in rows:
+        if hidden == 1:
+            continue
+        obj = objects[table]
+        col_type = (col_type or "").upper()
+        if hidden:
+            # generated column, the dialect cleans up the declared type
+            column = dialect._get_column_info(col_name, col_type, not notnull, default,
+                                              pk, True, hidden == 3, obj["sql"])
+            type_name = normalize_type(column["type"])
+        else:
+            if col_type not in resolved:
+                coltype = dialect._resolve_type_affinity(col_type)
+                resolved[col_type] = (coltype, normalize_type(coltype))
+            coltype, type_name = resolved[col_type]
+            column = {
+                "name": col_name,
+                "type": coltype,
+                "nullable": not notnull,
+                "default": str(default) if default is not None else None,
+                "autoincrement": "auto",
+                "primary_key": pk
+            }
+        obj["columns"].append(column)
+        obj["types"][str(col_name).upper()] = type_name
+        if pk:
+            obj["pk"].append((pk, col_name))
+    for table, fk_id, _, referred_table, from_col, to_col in conn.execute(
+            _FOREIGN_KEYS_SQL.format(**args)):
+        fk = objects[table]["fks"].setdefault(fk_id, {
+            "name": None,
+            "constrained_columns": [],
+            "referred_schema": None,
+            "referred_table": referred_table,
+            "referred_columns": [],
+            "options": {}
+        })
+        fk["constrained_columns"].append(from_col)
+        if to_col:
+            fk["referred_columns"].append(to_col)
+    for table, _, index_name, unique, _, col_name in conn.execute(
+            _INDEXES_SQL.format(**args)):
+        if index_name.startswith("sqlite_autoindex"):
+            continue
+        index = objects[table]["indexes"].setdefault(index_name, {
+            "name": index_name, "column_names": [], "unique": unique})
+        # expression based indexes are skipped same as the inspector does
+        index["column_names"].append(col_name)
+    rootpages = read_rootpages(conn, schema)
+    tables = []
+    for name, obj in objects.items():
+        for fk in obj["fks"].values():
+            if not fk["referred_columns"] and fk["referred_table"] in objects:
+                # referred columns are not named in DDL, i.e., PK of referred table
+                referred = objects[fk["referred_table"]]
+                fk["referred_columns"] = [col for _, col in sorted(referred["pk"])]
+        match = _PK_PATTERN.search(obj["sql"] or "")
+        primary_key = {
+            "constrained_columns": [col for _, col in sorted(obj["pk"])],
+            "name": match.group(1) if match else None
+        }
+        indexes = [index for index in obj["indexes"].values() if None not in index["column_names"]]
+        dependencies = read_view_dependencies(conn, name, rootpages, schema) \
+            if obj["type"] == "view" else None
+        tables.append(make_table_catalog(name, obj["columns"], primary_key,
+                                         list(obj["fks"].values()), obj["type"],
+                                         obj["sql"], indexes, obj["types"], dependencies))
+    return Catalog(schema_version, tables)
+
+
+def read_rootpages(conn, schema=None):
+    """Returns dict of root page to the name of the table stored in it (or
+        indexed by the index stored in it) in the schema, main if None
+    """
+    return dict((rootpage, tbl_name) for rootpage, tbl_name in
+                conn.execute(_ROOTPAGES_SQL.format(**_schema_args(schema))))
+
+
+def read_view_dependencies(conn, view_name, rootpages=None, schema=None):
+    """ Returns sorted names of the base tables read by a view. Instead of
+        parsing the SQL of the view, the tables are found from the b-trees the
+        compiled query opens (`EXPLAIN`), so views over views resolve to their
+        base tables too. Returns an empty list for views that fail to compile
+
+        Args:
+            conn (Connection): An SQLAlchemy connection to the database
+            view_name (String): Name of the view
+            rootpages (Dict): Root pages as returned by `read_rootpages`
+            schema (String): Name of the schema of the view, main if None
+    """
+    if rootpages is None:
+        rootpages = read_rootpages(conn, schema)
+    # pages are opened along with the index of the database holding them
+    database = 0
+    if schema is not None:
+        database = dict((db_name, seq) for seq, db_name, _ in
+                        conn.execute("PRAGMA database_list")).get(schema)
+    try:
+        program = conn.execute('EXPLAIN SELECT * FROM %s"%s"' % (
+            _schema_args(schema)["prefix"], view_name.replace('"', '""')))
+        pages = set(row[3] for row in program if row[1] == "OpenRead" and row[4] == database)
+    except Exception:
+        return []
+    return sorted(set(rootpages[page] for page in pages if page in rootpages))
+
+
+def _read_columns(conn, type_filter, args):
+    """Returns the column rows of the objects matching the filter on type"""
+    if conn.dialect.server_version_info >= (3, 31):
+        sql = _COLUMNS_SQL.format(hidden="p.hidden", function="table_xinfo",
+                                  type_filter=type_filter, **args)
+    else:
+        sql = _COLUMNS_SQL.format(hidden="0", function="table_info",
+                                  type_filter=type_filter, **args)
+    return conn.execute(sql).fetchall()
+
+
+class Catalog:
+    """ Snapshot of all tables and views of an SQLite database. It offers
+        the lookups `MetaGenerator` needs from a browser, so it can be
+        passed in place of the browser to generate the repository objects
+    """
+
+    def __init__(self, schema_version, tables):
+        """Default constructor
+
+            Args:
+                schema_version (int): `PRAGMA schema_version` of the snapshot
+                tables (List): Table catalogs as built by `make_table_catalog`
+        """
+        self.schema_version = schema_version
+        self.tables = OrderedDict((str(table["name"]).upper(), table) for table in tables)
+
+    def __repr__(self):
+        """Returns string representation
+        """
+        return "SQLite Catalog [SchemaVersion=%s, Objects=%d]" \
+            % (self.schema_version, len(self.tables))
+
+    def __len__(self):
+        """Returns number of tables and views in the catalog"""
+        return len(self.tables)
+
+    def get_table_names(self):
+        """Returns list of table names sorted by name"""
+        return [table["name"] for table in self.tables.values() if table["type"] == "table"]
+
+    def get_view_names(self):
+        """Returns list of view names sorted by name"""
+        return [table["name"] for table in self.tables.values() if table["type"] == "view"]
+
+    def get_table_catalog(self, table_name):
+        """ Returns the catalog of the table or view passed as arg
+
+            Args:
+                table_name (String): Name of the table or view
+        """
+        table = self.tables.get(str(table_name).upper())
+        if table is None:
+            raise KeyError("Table '%s' not found in catalog" % table_name)
+        return table
+
+    def get_object_definitions(self):
+        """Returns list of tuples (type, name, sql) of all tables and views
+            sorted by name
+        """
+        return [(table["type"], table["name"], table["sql"]) for table in self.tables.values()]
+
+    def get_columns(self, table_name):
+        """Returns list of column dicts of a table"""
+        return self.get_table_catalog(table_name)["columns"]
+
+    def get_column(self, column_name, table_name):
+        """Returns column dict of a column in table or None"""
+        return self.get_table_catalog(table_name)["column_map"].get(str(column_name).upper())
+
+    def get_view_definition(self, view, schema=None):
+        """Returns the SQL query used to create view"""
+        return self.get_table_catalog(view)["sql"]
+
+    def get_view_dependencies(self, view):
+        """Returns sorted names of the base tables read by the view"""
+        return self.get_table_catalog(view)["dependencies"] or []
+
+    def to_dict(self):
+        """ Returns the catalog as dict of plain values (types as strings),
+            suitable to be serialized as JSON
+        """
+        tables = []
+        for table in self.tables.values():
+            columns = []
+            for col in table["columns"]:
+                col_dict = dict(col)
+                col_dict["type"] = None if isinstance(col["type"], NullType) \
+                    else str(col["type"])
+                columns.append(col_dict)
+            tables.append({
+                "name": table["name"],
+                "type": table["type"],
+                "sql": table["sql"],
+                "columns": columns,
+                "primary_key": table["primary_key"],
+                "foreign_keys": table["foreign_keys"],
+                "indexes": table["indexes"],
+                "dependencies": table["dependencies"]
+            })
+        return {"schema_version": self.schema_version, "tables": tables}
@@ -4,9 +4,13 @@
  Author: Ajeet Singh
  Date: 05/08/2019
 """
+import threading
 from sqlalchemy import Column, String
 from sqlalchemy.ext.declarative import declarative_base
 from bipy.services.db import categories
+from bipy.services.db.warehouse.browsers.sqlite.catalog import make_table_catalog, read_catalog
+from bipy.services.db.warehouse.browsers.sqlite.catalog import OBJECTS_SQL
+from bipy.services.db.warehouse.browsers.sqlite.catalog import read_view_dependencies
 from bipy.logging import logger
 
 
@@ -95,6 +99,11 @@ class Browser(categories.SQLite):
 
     ConnectedSession = None
     inspector = None
+    engine = None
+    connection_string = None
+    schema_version = None
+    catalog = None
+    catalog_lock = None
     __instance = None
 
     def __new__(cls):
@@ -102,6 +111,8 @@ class Browser(categories.SQLite):
         """
         if Browser.__instance is None:
             Browser.__instance = object.__new__(cls)
+            Browser.__instance.catalog = {}
+            Browser.__instance.catalog_lock = threading.Lock()
         return Browser.__instance
 
     def __init__(self):
@@ -120,8 +131,104 @@ class Browser(categories.SQLite):
         """
         self.ConnectedSession = connection.get_session()
         self.inspector = connection.get_inspector()
+        self.engine = connection.get_engine()
+        if self.catalog is None:
+            self.catalog = {}
+            self.catalog_lock = threading.Lock()
+        if self.connection_string != connection.get_connection_string():
+            self.connection_string = connection.get_connection_string()
+            self.schema_version = None
+        self.refresh_catalog()
         LOGGER.debug("SQLite Browser connected to database successfully")
 
+    def refresh_catalog(self):
+        """Drops the cached table catalogs if the schema of the database has
+            changed (as per `PRAGMA schema_version`) since they were built
+        """
+        schema_version = self.engine.execute("PRAGMA schema_version").scalar()
+        if schema_version != self.schema_version:
+            LOGGER.debug("Schema version changed from '%s' to '%s', catalog cache cleared"
+                         % (self.schema_version, schema_version))
+            self.catalog.clear()
+            self.inspector.info_cache.clear()
+            self.schema_version = schema_version
+
+    def get_table_catalog(self, table_name):
+        """
+            Returns the cached catalog of a table as dict with the keys
+            `columns` (list of column dicts as returned by inspector),
+            `column_map` (upper case column name to column dict), `types`
+            (upper case column name to type name without length/precision),
+            `primary_key` and `foreign_keys`. The catalog is built on first
+            access and stays cached until the schema version changes
+
+            Args:
+                table_name (string): name of the table
+        """
+        key = str(table_name).upper()
+        table_catalog = self.catalog.get(key)
+        if table_catalog is None:
+            with self.catalog_lock:
+                table_catalog = self.catalog.get(key)
+                if table_catalog is None:
+                    table_catalog = self._build_table_catalog(table_name)
+                    self.catalog[key] = table_catalog
+        return table_catalog
+
+    def _build_table_catalog(self, table_name):
+        """Reads the metadata of a table using inspector and returns the
+            catalog as described in `get_table_catalog`
+        """
+        LOGGER.debug("Building catalog of table '%s'" % (table_name))
+        # copied as the dialect sorts the cached list while reading PK
+        columns = list(self.inspector.get_columns(table_name))
+        return make_table_catalog(table_name, columns,
+                                  self.inspector.get_pk_constraint(table_name),
+                                  self.inspector.get_foreign_keys(table_name))
+
+    def snapshot(self, schema=None):
+        """
+            Reads the catalog of all tables and views in a handful of set
+            based queries over `sqlite_master` and the pragma table valued
+            functions instead of inspector calls per table. The snapshot of
+            the main schema replaces the cached table catalogs, so the
+            browser lookups are served from it afterwards
+
+            Args:
+                schema (String): Name of the schema (i.e., attached database)
+                                 to read, the main database if None
+
+            Returns:
+                catalog (Catalog): The catalog of the schema
+        """
+        LOGGER.debug("Preparing snapshot of the catalog")
+        if schema == "main":
+            schema = None
+        with self.engine.connect() as conn:
+            # all queries run in one read transaction to get an consistent view
+            trans = conn.begin()
+            try:
+                catalog = read_catalog(conn, schema)
+            finally:
+                trans.rollback()
+        if schema is not None:
+            # the browser lookups are of the main schema
+            return catalog
+        with self.catalog_lock:
+            self.catalog.clear()
+            self.inspector.info_cache.clear()
+            self.catalog.update(catalog.tables)
+            self.schema_version = catalog.schema_version
+        LOGGER.debug("Snapshot of %d tables and views is ready" % len(catalog))
+        return catalog
+
+    def get_object_definitions(self):
+        """
+            Returns list of tuples (type, name, sql) of all tables and views
+            as stored in `sqlite_master`, sorted by name
+        """
+        return [tuple(row) for row in self.engine.execute(OBJECTS_SQL)]
+
     def __repr__(self):
         """Returns string representation
         """
@@ -147,6 +254,21 @@ class Browser(categories.SQLite):
         """
         return self.inspector.get_view_definition(view, schema)
 
+    def get_view_dependencies(self, view):
+        """
+            Returns sorted names of the base tables read by the view. These
+            are found once per schema version and cached with the catalog
+            of the view
+
+            Args:
+                view (string): name of the view
+        """
+        view_catalog = self.get_table_catalog(view)
+        if view_catalog["dependencies"] is None:
+            with self.engine.connect() as conn:
+                view_catalog["dependencies"] = read_view_dependencies(conn, view)
+        return view_catalog["dependencies"]
+
     def get_columns(self, table_name):
         """
             Returns list of columns available as dict object of a given table
@@ -154,7 +276,7 @@ class Browser(categories.SQLite):
             Args:
                 table_name (string): name of the table
         """
-        return self.inspector.get_columns(table_name)
+        return self.get_table_catalog(table_name)["columns"]
 
     def get_column(self, column_name, table_name):
         """
@@ -164,15 +286,11 @@ class Browser(categories.SQLite):
                 column_name (String): Name of the Column
                 table_name (String): Name pf table which contains column
         """
-        LOGGER.debug("Preparing to find column '%s' in table '%s' and return\
-                     it back" % (column_name, table_name))
-        for col in self.inspector.get_columns(table_name):
-            if str(col['name']).upper() == str(column_name).upper():
-                LOGGER.debug("Column found and returning same as dict obj")
-                return col
-        LOGGER.debug("Column '%s' not found in table '%s'"
-                     % (column_name, table_name))
-        return None
+        col = self.get_table_catalog(table_name)["column_map"].get(str(column_name).upper())
+        if col is None:
+            LOGGER.debug("Column '%s' not found in table '%s'"
+                         % (column_name, table_name))
+        return col
 
     def get_column_names(self, table_name):
         """
@@ -181,14 +299,7 @@ class Browser(categories.SQLite):
             Args:
                 table_name (string): name of the table
         """
-        LOGGER.debug("Preparing to get column names for table: %s"
-                     % (table_name))
-        column_names = []
-        for col in self.inspector.get_columns(table_name):
-            column_names.append(col['name'])
-            LOGGER.debug("Column '%s' added to columns list" % (col['name']))
-        LOGGER.debug("Columns list compiled and will be returned now")
-        return column_names
+        return [col['name'] for col in self.get_table_catalog(table_name)["columns"]]
 
     def get_column_type(self, table_name, column_name):
         """
@@ -199,24 +310,7 @@ class Browser(categories.SQLite):
                 table_name (string): name of the table
                 column_name (string): name of the column
         """
-        LOGGER.debug("Preparing to get datatype of column '%s' in table '%s'"
-                     % (column_name, table_name))
-        for col in self.inspector.get_columns(table_name):
-            if col['name'] == column_name:
-                LOGGER.debug("Column '%s' found in the respective table"
-                             % (column_name))
-                col_str = str(col['type'])
-                if col_str.find("(", 0) >= 0:
-                    index = col_str.index("(", 0)
-                    LOGGER.debug("'%s' will be returned as datatype for\
-                                 column '%s'"
-                                 % (col_str[0:index], column_name))
-                    return col_str[0:index]
-                LOGGER.debug("'%s' will be returned as datatype\
-                             for column '%s'"
-                             % (col_str, column_name))
-                return col_str
-        return None
+        return self.get_table_catalog(table_name)["types"].get(str(column_name).upper())
 
     def get_primary_key_columns(self, table_name):
         """
@@ -226,7 +320,7 @@ class Browser(categories.SQLite):
             Args:
                 table_name (string): name of the table
         """
-        pk_const = self.inspector.get_pk_constraint(table_name)
+        pk_const = self.get_table_catalog(table_name)["primary_key"]
         return pk_const['constrained_columns']
 
     def get_primary_key_name(self, table_name):
@@ -236,7 +330,7 @@ class Browser(categories.SQLite):
             Args:
                 table_name (string): name of the table
         """
-        pk_const = self.inspector.get_pk_constraint(table_name)
+        pk_const = self.get_table_catalog(table_name)["primary_key"]
         return pk_const['name']
 
     def get_table_options(self, table_name):
@@ -255,7 +349,7 @@ class Browser(categories.SQLite):
             Args:
                 table_name (string): name of the table
         """
-        return self.inspector.get_foreign_keys(table_name)
+        return self.get_table_catalog(table_name)["foreign_keys"]
 
     def close(self):
         """
@@ -263,10 +357,10 @@ class Browser(categories.SQLite):
         """
         self.ConnectedSession.close()
         LOGGER.debug("SQLite browser session has been closed")
-        del self.ConnectedSession
+        self.ConnectedSession = None
 
     def __del__(self):
-        del self.ConnectedSession
+        self.ConnectedSession = None
 
 
 if __name__ == "__main__":
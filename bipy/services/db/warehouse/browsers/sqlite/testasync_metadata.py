@@ -0,0 +1,90 @@
+"""
+    Test cases for ``AsyncBrowser`` class
+    Author: Ajeet Singh
+    Date: 07/06/2019
+"""
+import asyncio
+import threading
+import unittest
+from bipy.services.utils import Utility
+from bipy.services.integration import async_browser
+from bipy.services.db.connection_managers.sqlite.async_manager import AsyncConnectionManager
+from bipy.services.db.warehouse.browsers.sqlite.async_metadata import AsyncBrowser
+
+
+class AsyncBrowserTestCase(unittest.TestCase):
+    """Test case for AsyncBrowser class and its methods
+    """
+    conf = None
+    loop = None
+    browser = None
+
+    def setUp(self):
+        util = Utility()
+        self.conf = util.CONFIG
+        self.loop = asyncio.new_event_loop()
+        self.connection = AsyncConnectionManager()
+        self.loop.run_until_complete(self.connection.connect(self.conf.URL_TEST_DB))
+        self.browser = AsyncBrowser()
+        self.loop.run_until_complete(self.browser.connect(self.connection))
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.browser.close())
+        self.loop.close()
+
+    def testBrowseSchemas(self):
+        assert self.loop.run_until_complete(self.browser.get_schemas()) == ['main']
+
+    def testBrowseTables(self):
+        assert self.loop.run_until_complete(self.browser.get_tables()) == \
+            ['CUSTOMER_MASTER', 'PRODUCT_MASTER', 'SALES_DETAILS', 'android_metadata',
+             'sqlite_sequence']
+
+    def testTableDetails(self):
+        tables = self.loop.run_until_complete(self.browser.get_tables())
+        details = self.loop.run_until_complete(self.browser.get_table_details(tables))
+        assert sorted(details.keys()) == sorted(tables)
+        for table in tables:
+            names = self.loop.run_until_complete(self.browser.get_column_names(table))
+            assert [col['name'] for col in details[table]['columns']] == names
+
+    def testExecute(self):
+        result = self.loop.run_until_complete(
+            self.connection.execute("SELECT COUNT(*) FROM CUSTOMER_MASTER"))
+        assert result.scalar() > 0
+
+    def testDisconnect(self):
+        engine = self.connection.get_engine()
+        checked_out = engine.pool.checkedout()
+        connection = AsyncConnectionManager()
+        self.loop.run_until_complete(connection.connect(self.conf.URL_TEST_DB))
+        self.loop.run_until_complete(connection.run(
+            lambda: connection.get_connection().get_session().execute("SELECT 1").scalar()))
+        self.loop.run_until_complete(connection.disconnect())
+        assert engine.pool.checkedout() == checked_out
+
+    def testEndpointsInThread(self):
+        results = []
+        worker = threading.Thread(target=lambda: results.extend(
+            [async_browser.schemas(), async_browser.column_names("PRODUCT_MASTER")]))
+        worker.start()
+        worker.join()
+        assert results == [['main'], ['id', 'product_name', 'cost']]
+        shared = self.loop.run_until_complete(async_browser.get_browser())
+        assert self.loop.run_until_complete(async_browser.get_browser()) is shared
+        self.loop.run_until_complete(async_browser.close_browsers())
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(AsyncBrowserTestCase("testBrowseSchemas"))
+    suite.addTest(AsyncBrowserTestCase("testBrowseTables"))
+    suite.addTest(AsyncBrowserTestCase("testTableDetails"))
+    suite.addTest(AsyncBrowserTestCase("testExecute"))
+    suite.addTest(AsyncBrowserTestCase("testDisconnect"))
+    suite.addTest(AsyncBrowserTestCase("testEndpointsInThread"))
+    return suite
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,9 @@
     Author: Ajeet Singh
     Date: 05/27/2019
 """
+import os
+import shutil
+import tempfile
 import unittest
 from bipy.services.db.categories import SQLite
 from bipy.services.utils import Utility
@@ -65,6 +68,61 @@ class BrowserTestCase(unittest.TestCase):
             self.testBrowserConnection()
         assert self.browser.get_tables() == ['CUSTOMER_MASTER', 'PRODUCT_MASTER', 'SALES_DETAILS', 'android_metadata', 'sqlite_sequence']
 
+    def testCatalogCache(self):
+        if self.browser is None:
+            self.testBrowserConnection()
+        catalog = self.browser.get_table_catalog('product_master')
+        assert self.browser.get_table_catalog('PRODUCT_MASTER') is catalog
+        assert self.browser.get_column('ID', 'product_master') is catalog['column_map']['ID']
+        assert self.browser.get_column_type('PRODUCT_MASTER', 'product_name') == 'VARCHAR'
+        assert self.browser.get_primary_key_columns('PRODUCT_MASTER') == ['id']
+
+    def testCatalogInvalidation(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            url = "sqlite:///" + os.path.join(temp_dir, "catalog.db")
+            conn = Utility().get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+            conn.connect(url)
+            conn.get_engine().execute("CREATE TABLE T1 (ID INTEGER PRIMARY KEY)")
+            browser = self.browsers[0].plugin_object
+            browser.connect(conn)
+            assert browser.get_column_names('T1') == ['ID']
+            conn.get_engine().execute("ALTER TABLE T1 ADD COLUMN NAME VARCHAR(20)")
+            assert browser.get_column_names('T1') == ['ID']
+            browser.refresh_catalog()
+            assert browser.get_column_names('T1') == ['ID', 'NAME']
+            conn.get_engine().dispose()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testSnapshot(self):
+        if self.browser is None:
+            self.testBrowserConnection()
+        inspector = self.connection.get_inspector()
+        catalog = self.browser.snapshot()
+        assert catalog.get_table_names() == self.browser.get_tables()
+        assert catalog.get_view_names() == self.browser.get_views()
+        for table in catalog.get_table_names():
+            assert [col['name'] for col in catalog.get_columns(table)] == \
+                [col['name'] for col in inspector.get_columns(table)]
+            assert catalog.get_table_catalog(table)['primary_key'] == \
+                inspector.get_pk_constraint(table)
+            assert catalog.get_table_catalog(table)['foreign_keys'] == \
+                inspector.get_foreign_keys(table)
+        assert self.browser.get_table_catalog('SALES_DETAILS') is \
+            catalog.get_table_catalog('SALES_DETAILS')
+        assert catalog.get_view_dependencies('revenue_details') == \
+            ['CUSTOMER_MASTER', 'PRODUCT_MASTER', 'SALES_DETAILS']
+
+    def testViewDependencies(self):
+        if self.browser is None:
+            self.testBrowserConnection()
+        self.browser.connect(self.connection)
+        assert self.browser.get_view_dependencies('revenue_details') == \
+            ['CUSTOMER_MASTER', 'PRODUCT_MASTER', 'SALES_DETAILS']
+        assert self.browser.get_view_dependencies('revenue_details') is \
+            self.browser.get_table_catalog('revenue_details')['dependencies']
+
 
 def suite():
     suite = unittest.TestSuite()
@@ -76,6 +134,10 @@ def suite():
     suite.addTest(BrowserTestCase("testBrowserConnection"))
     suite.addTest(BrowserTestCase("testBrowseSchemas"))
     suite.addTest(BrowserTestCase("testBrowseTables"))
+    suite.addTest(BrowserTestCase("testCatalogCache"))
+    suite.addTest(BrowserTestCase("testCatalogInvalidation"))
+    suite.addTest(BrowserTestCase("testSnapshot"))
+    suite.addTest(BrowserTestCase("testViewDependencies"))
     return suite
 
 
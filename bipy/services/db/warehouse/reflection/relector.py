@@ -1,12 +1,53 @@
 """This module helps in getting the reflection of the Warehouse database and
 will be used by the analysis engine to create and compile queries for
-analysis.
+analysis. Tables are reflected on demand, one table (along with the tables
+its FKs refer) at a time, and kept in an LRU cache bounded by an estimate
+of their memory
 
 Author: Ajeet Singh
 Date: 06/22/2018
 """
-from sqlalchemy import text, column, MetaData
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy import text, column, MetaData, Table
+from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.sql.elements import TextClause
+from bipy.services.db.repository.cache import LookupCache
 from bipy.services.utils import Utility
+from bipy.logging import logger
+
+
+LOGGER = logger.get_logger(__name__)
+# estimated memory of an reflected table, measured with tracemalloc on SQLite
+_TABLE_BYTES = 12 * 1024
+_COLUMN_BYTES = 1280
+# query compiled once per shape, `binds` are the names of the bound params
+# in the order of the placeholders (None for dialects with named params),
+# `defaults` their values bound by the statement itself and `compiled` the
+# compiled statement executed along with the bind and result type processing
+CompiledQuery = namedtuple("CompiledQuery", ["sql", "binds", "defaults", "compiled"])
+
+
+def estimate_table_size(table):
+    """ Returns the estimated memory in bytes used by an reflected table,
+        its columns, indexes and FKs
+
+        Args:
+            table (sqlalchemy.Table): An reflected table
+    """
+    return _TABLE_BYTES + _COLUMN_BYTES * (len(table.columns) + len(table.indexes) +
+                                           len(table.foreign_keys))
+
+
+def _is_template(cond):
+    """ Returns True if an condition is a string or a `text` template with no
+        values bound to its params, i.e., it can be keyed by its SQL alone. A
+        param bound to None through `bindparams` has a value as well
+    """
+    if cond is None or isinstance(cond, str):
+        return True
+    return isinstance(cond, TextClause) and all(
+        bind.required for bind in cond._bindparams.values())
 
 
 class Reflector:
@@ -20,6 +61,13 @@ class Reflector:
     __INSTANCE = None
     __util = None
     __config = None
+    __tables = None
+    __lock = None
+    memory_budget = None
+    memory_used = 0
+    statement_cache = None
+    hits = 0
+    misses = 0
 
     def __new__(cls):
         if Reflector.__INSTANCE is None:
@@ -27,32 +75,154 @@ class Reflector:
         return Reflector.__INSTANCE
 
     def __init__(self):
+        if self.__engine is not None:
+            # singleton, the reflected tables are kept
+            return
         self.__util = Utility()
         self.__config = self.__util.CONFIG
-        self.__connection_mgr = self.__util.get_plugin(self.__config.PATH_CONNECTION_MANAGERS)
+        self.__connection_mgr = self.__util.get_plugin(self.__config.PATH_CONNECTION_MANAGERS,
+                                                       new_instance=True)
         self.__connection_mgr.connect(self.__config.URL_TEST_DB)
         self.__engine = self.__connection_mgr.get_engine()
         self.__session = self.__connection_mgr.ConnectedSession
         self.__metadata = MetaData(self.__engine)
-        self.__metadata.reflect(bind=self.__engine)
+        # table name to tuple of (table, estimated size), least recently used first
+        self.__tables = OrderedDict()
+        self.__lock = threading.RLock()
+        conf = self.__config.get("REFLECTION")
+        budget_mb = conf.get("memory_budget_mb", 64) if conf is not None else 64
+        self.memory_budget = int(budget_mb * 1024 * 1024) if budget_mb else None
+        self.statement_cache = LookupCache(conf.get("statement_cache_size", 256)
+                                           if conf is not None else 256)
 
     def get_table(self, table_name):
         """Returns an instance of the table that exists in the target
-            warehouse
+            warehouse. The table is reflected on first use along with the
+            tables its FKs refer and served from the cache afterwards
 
             Args:
                 table_name (String): Name of the table available in warehouse
         """
-        if self.__metadata is not None:
-            table = self.__metadata.tables.get(table_name)
-            if table is not None:
-                return table
-            else:
-                raise ValueError("Provided table '%s' doesn't exist in the warehouse" % (table_name))
-        else:
+        if self.__metadata is None:
             raise ReferenceError("The referenced metadata is not available yet. \
                 Please check the configuration file to make sure the path to the \
                 warehouse is correct!")
+        with self.__lock:
+            entry = self.__tables.get(table_name)
+            if entry is not None:
+                # the FK targets are used along with the table
+                for name in self._referred([table_name]) - set([table_name]):
+                    self.__tables.move_to_end(name)
+                self.__tables.move_to_end(table_name)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            before = set(self.__metadata.tables)
+            try:
+                table = Table(table_name, self.__metadata, autoload=True,
+                              autoload_with=self.__engine)
+            except NoSuchTableError:
+                raise ValueError("Provided table '%s' doesn't exist in the warehouse"
+                                 % (table_name))
+            reflected = [name for name in self.__metadata.tables
+                         if name not in before and name != table_name]
+            reflected.append(table_name)
+            self._add(reflected)
+            self._evict(protected=set(reflected))
+            LOGGER.debug("Table '%s' reflected along with %d referred tables"
+                         % (table_name, len(reflected) - 1))
+            return table
+
+    def warm_up(self, tables=None):
+        """ Reflects all tables of the warehouse (or the tables passed) with
+            one `MetaData.reflect` call, e.g., at startup of an long running
+            service. Tables beyond the memory budget are evicted again, least
+            recently used first
+
+            Args:
+                tables (List): Names of the tables to reflect, all if None
+        """
+        with self.__lock:
+            before = set(self.__metadata.tables)
+            self.__metadata.reflect(bind=self.__engine, only=tables)
+            reflected = [name for name in self.__metadata.tables if name not in before]
+            self._add(reflected)
+            self._evict()
+            LOGGER.debug("Warm up reflected %d tables, %d tables cached"
+                         % (len(reflected), len(self.__tables)))
+            return len(reflected)
+
+    def invalidate(self):
+        """Drops all reflected tables, e.g., once the warehouse has changed"""
+        with self.__lock:
+            self.__metadata.clear()
+            self.__tables.clear()
+            self.memory_used = 0
+        self.statement_cache.invalidate()
+
+    def get_cache_stats(self):
+        """Returns dict with the `tables`, `memory_used`, `memory_budget`,
+            `hits` and `misses` of the reflected tables
+        """
+        return {"tables": len(self.__tables), "memory_used": self.memory_used,
+                "memory_budget": self.memory_budget, "hits": self.hits,
+                "misses": self.misses, "statements": self.statement_cache.stats()}
+
+    def _add(self, table_names):
+        """Adds the tables reflected in metadata to the cache, as most
+            recently used in the order passed
+        """
+        for name in table_names:
+            table = self.__metadata.tables[name]
+            size = estimate_table_size(table)
+            self.__tables[name] = (table, size)
+            self.memory_used += size
+
+    def _referred(self, table_names):
+        """Returns the names of the cached tables passed along with the
+            cached tables their FKs refer, directly or through other tables
+        """
+        referred = set()
+        pending = [name for name in table_names if name in self.__tables]
+        while pending:
+            name = pending.pop()
+            if name in referred:
+                continue
+            referred.add(name)
+            for fk in self.__tables[name][0].foreign_keys:
+                target = fk.column.table.name
+                if target in self.__tables and target not in referred:
+                    pending.append(target)
+        return referred
+
+    def _evict(self, protected=()):
+        """Evicts the least recently used tables until the memory used is
+            within the budget, the protected tables are kept even over budget.
+            The tables the protected ones refer are kept as well, evicting
+            them would evict the protected tables along, see `_remove`
+        """
+        if not self.memory_budget or self.memory_used <= self.memory_budget:
+            return
+        protected = self._referred(protected)
+        for name in list(self.__tables):
+            if self.memory_used <= self.memory_budget:
+                break
+            if name not in protected and name in self.__tables:
+                self._remove(name)
+
+    def _remove(self, table_name):
+        """Removes an table from cache and metadata along with the cached
+            tables whose FKs refer it, as their FKs hold its columns
+        """
+        table, size = self.__tables.pop(table_name)
+        dependents = [name for name, (other, _) in self.__tables.items()
+                      if any(fk.references(table) for fk in other.foreign_keys)]
+        self.__metadata.remove(table)
+        self.memory_used -= size
+        for name in dependents:
+            if name in self.__tables:
+                self._remove(name)
+        LOGGER.debug("Reflected table '%s' evicted from cache" % table_name)
 
     def get_columns_list(self, columns):
         """Returns an list of columns casted to `sqlalchemy.column` type
@@ -104,14 +274,63 @@ class Reflector:
             statement = statement.where(where_cond)
 
         if order_by_cond is not None:
-            statement = statement.order(order_by_cond)
+            statement = statement.order_by(order_by_cond)
 
         return statement
 
-    def execute_statement(self, statement):
-        """Executes the provided statement and returns back the result set
+    def prepare_compiled_query(self, table, columns=None, where_cond=None, order_by_cond=None):
+        """Same as `prepare_query` but returns the SQL compiled with bound
+        param placeholders as `CompiledQuery`. Queries are cached by their
+        shape, i.e., (table, columns, where template, order by template), so
+        an query repeated with new param values is compiled once and the
+        same SQL string lets SQLite reuse its prepared statement. Conditions
+        other than strings or `text` templates, and templates with values
+        bound by `bindparams`, are compiled without cache, as the values
+        bound by them are not part of their SQL
+
+            Args:
+                table (sqlalchemy.table): An table object
+                columns (List[sqlalchemy.column]): An list of columns
+                where_cond (sqlalchemy.text): A where condition template with
+                                              named params (e.g., `id = :id`)
+                order_by (sqlalchemy.text): An order by condition wrapped in text object
+        """
+        cacheable = _is_template(where_cond) and _is_template(order_by_cond)
+        key = None
+        if cacheable:
+            key = (table.name,
+                   tuple(str(col) for col in columns) if columns is not None else None,
+                   str(where_cond) if where_cond is not None else None,
+                   str(order_by_cond) if order_by_cond is not None else None)
+            found, query = self.statement_cache.get(key)
+            if found:
+                return query
+        if isinstance(where_cond, str):
+            where_cond = text(where_cond)
+        if isinstance(order_by_cond, str):
+            order_by_cond = text(order_by_cond)
+        compiled = self.prepare_query(table, columns, where_cond, order_by_cond)\
+            .compile(dialect=self.__engine.dialect)
+        binds = tuple(compiled.positiontup) if compiled.positional else None
+        query = CompiledQuery(str(compiled), binds, compiled.params, compiled)
+        if key is not None:
+            self.statement_cache.put(key, query)
+        return query
+
+    def execute_statement(self, statement, params=None):
+        """Executes the provided statement and returns back the result set.
+        An `CompiledQuery` is executed without compiling it again, the values
+        of its params are processed as per their types like any statement
 
             Args:
-                statement (sqlalchemy.select): An select statement
+                statement (sqlalchemy.select/CompiledQuery): An select statement
+                params (Dict): Values of the bound params by name
         """
-        return self.__session.execute(statement)
+        if isinstance(statement, CompiledQuery):
+            params = params or {}
+            missing = [name for name, bind in statement.compiled.binds.items()
+                       if bind.required and name not in params]
+            if missing:
+                raise ValueError("No value provided for params %s of the query" % missing)
+            return self.__session.connection().execute(statement.compiled, params)
+        return self.__session.execute(statement, params)
@@ -0,0 +1,168 @@
+"""
+    Test cases for ``Reflector``
+    Author: Ajeet Singh
+    Date: 07/21/2019
+"""
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import text, MetaData, Table, Column, Integer, DateTime, Numeric, Boolean
+from bipy.services.db.warehouse.reflection.relector import Reflector, estimate_table_size
+
+
+class ReflectorTestCase(unittest.TestCase):
+    """Test case for the lazy reflection of Reflector
+    """
+    reflector = None
+    budget = None
+
+    def setUp(self):
+        self.reflector = Reflector()
+        self.budget = self.reflector.memory_budget
+        self.reflector.invalidate()
+
+    def tearDown(self):
+        self.reflector.memory_budget = self.budget
+        self.reflector.invalidate()
+
+    def testLazyReflection(self):
+        assert self.reflector.get_cache_stats()["tables"] == 0
+        sales = self.reflector.get_table("SALES_DETAILS")
+        assert [col.name for col in sales.columns] == ['id', 'customer_id', 'product_id',
+                                                       'product_qty']
+        # FK targets are reflected along with the table
+        assert self.reflector.get_cache_stats()["tables"] == 3
+        customers = self.reflector.get_table("CUSTOMER_MASTER")
+        assert list(sales.c.customer_id.foreign_keys)[0].column.table is customers
+        stats = self.reflector.get_cache_stats()
+        assert stats["hits"] >= 1 and stats["memory_used"] > 0
+        self.assertRaises(ValueError, self.reflector.get_table, "MISSING_TABLE")
+
+    def testEviction(self):
+        self.reflector.memory_budget = 1
+        self.reflector.get_table("SALES_DETAILS")
+        # over budget, but the tables just reflected are kept
+        assert self.reflector.get_cache_stats()["tables"] == 3
+        self.reflector.get_table("android_metadata")
+        # evicting the FK targets evicts SALES_DETAILS as well
+        assert self.reflector.get_cache_stats()["tables"] == 1
+        assert self.reflector.get_table("SALES_DETAILS").c.customer_id is not None
+
+    def testEvictionKeepsReferredTables(self):
+        customers = self.reflector.get_table("CUSTOMER_MASTER")
+        self.reflector.memory_budget = self.reflector.get_cache_stats()["memory_used"] * 3
+        sales = self.reflector.get_table("SALES_DETAILS")
+        # CUSTOMER_MASTER is the least recently used, evicting it would
+        # evict SALES_DETAILS along as its FK refers it
+        assert self.reflector.get_cache_stats()["tables"] == 3
+        misses = self.reflector.get_cache_stats()["misses"]
+        assert self.reflector.get_table("SALES_DETAILS") is sales
+        assert self.reflector.get_table("CUSTOMER_MASTER") is customers
+        assert self.reflector.get_cache_stats()["misses"] == misses
+
+    def testHitRefreshesReferredTables(self):
+        self.reflector.get_table("SALES_DETAILS")
+        android = self.reflector.get_table("android_metadata")
+        sequence = self.reflector.get_table("sqlite_sequence")
+        self.reflector.invalidate()
+        self.reflector.get_table("SALES_DETAILS")
+        self.reflector.get_table("android_metadata")
+        # room for sqlite_sequence once android_metadata is evicted
+        self.reflector.memory_budget = self.reflector.get_cache_stats()["memory_used"] + \
+            estimate_table_size(sequence) - estimate_table_size(android)
+        self.reflector.get_table("SALES_DETAILS")
+        self.reflector.get_table("sqlite_sequence")
+        misses = self.reflector.get_cache_stats()["misses"]
+        for name in ("SALES_DETAILS", "CUSTOMER_MASTER", "PRODUCT_MASTER", "sqlite_sequence"):
+            self.reflector.get_table(name)
+        assert self.reflector.get_cache_stats()["misses"] == misses
+        assert self.reflector.get_cache_stats()["tables"] == 4
+
+    def testWarmUp(self):
+        self.reflector.memory_budget = None
+        assert self.reflector.warm_up() >= 4
+        misses = self.reflector.get_cache_stats()["misses"]
+        self.reflector.get_table("PRODUCT_MASTER")
+        assert self.reflector.get_cache_stats()["misses"] == misses
+
+    def testCompiledQuery(self):
+        sales = self.reflector.get_table("SALES_DETAILS")
+        columns = self.reflector.get_columns_list("id,product_qty")
+        query = self.reflector.prepare_compiled_query(sales, columns, "customer_id = :customer",
+                                                      "id")
+        assert query.binds == ('customer',)
+        assert self.reflector.prepare_compiled_query(sales, columns, "customer_id = :customer",
+                                                     "id") is query
+        assert self.reflector.get_cache_stats()["statements"]["hits"] >= 1
+        statement = self.reflector.prepare_query(sales, columns,
+                                                 self.reflector.get_where_conditon(
+                                                     "customer_id = :customer"),
+                                                 self.reflector.get_order_by_condition("id"))
+        for customer in (1, 2):
+            rows = self.reflector.execute_statement(query, {"customer": customer}).fetchall()
+            assert rows == self.reflector.execute_statement(
+                statement, {"customer": customer}).fetchall()
+        self.assertRaises(ValueError, self.reflector.execute_statement, query)
+        bound = self.reflector.prepare_compiled_query(sales, where_cond=sales.c.id == 1)
+        assert self.reflector.execute_statement(bound).fetchall().__len__() <= 1
+
+    def testCompiledQueryBoundValues(self):
+        sales = self.reflector.get_table("SALES_DETAILS")
+        queries = [self.reflector.prepare_compiled_query(
+            sales, where_cond=text("id = :v").bindparams(v=value)) for value in (1, 2)]
+        assert queries[0] is not queries[1]
+        for value, query in zip((1, 2), queries):
+            assert query.defaults == {"v": value}
+            rows = self.reflector.execute_statement(query).fetchall()
+            assert [row[0] for row in rows] == [value]
+
+    def testCompiledQueryNoneValue(self):
+        sales = self.reflector.get_table("SALES_DETAILS")
+        query = self.reflector.prepare_compiled_query(
+            sales, where_cond=text("id = :v").bindparams(v=None))
+        assert self.reflector.prepare_compiled_query(
+            sales, where_cond=text("id = :v").bindparams(v=None)) is not query
+        assert self.reflector.execute_statement(query).fetchall() == []
+
+    def testCompiledQueryTypes(self):
+        typed = Table("TYPED_VALUES", MetaData(), Column("id", Integer, primary_key=True),
+                      Column("created", DateTime), Column("amount", Numeric(10, 2)),
+                      Column("active", Boolean))
+        created = datetime(2019, 1, 2, 3, 4)
+        self.reflector.execute_statement(text(
+            "CREATE TEMP TABLE TYPED_VALUES (id INTEGER PRIMARY KEY, created DATETIME, "
+            "amount NUMERIC(10, 2), active BOOLEAN)"))
+        try:
+            self.reflector.execute_statement(typed.insert(), {
+                "id": 1, "created": created, "amount": Decimal("12.50"), "active": True})
+            query = self.reflector.prepare_compiled_query(typed,
+                                                          where_cond=typed.c.created == created)
+            rows = self.reflector.execute_statement(query).fetchall()
+            assert rows == self.reflector.execute_statement(
+                self.reflector.prepare_query(typed, where_cond=typed.c.created == created)
+            ).fetchall()
+            assert rows == [(1, created, Decimal("12.50"), True)], rows
+            assert isinstance(rows[0][1], datetime) and isinstance(rows[0][2], Decimal)
+            assert rows[0][3] is True
+        finally:
+            self.reflector.execute_statement(text("DROP TABLE temp.TYPED_VALUES"))
+
+
+def suite():
+    """Test suite for reflector"""
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(ReflectorTestCase('testLazyReflection'))
+    test_suite.addTest(ReflectorTestCase('testEviction'))
+    test_suite.addTest(ReflectorTestCase('testEvictionKeepsReferredTables'))
+    test_suite.addTest(ReflectorTestCase('testHitRefreshesReferredTables'))
+    test_suite.addTest(ReflectorTestCase('testWarmUp'))
+    test_suite.addTest(ReflectorTestCase('testCompiledQuery'))
+    test_suite.addTest(ReflectorTestCase('testCompiledQueryBoundValues'))
+    test_suite.addTest(ReflectorTestCase('testCompiledQueryNoneValue'))
+    test_suite.addTest(ReflectorTestCase('testCompiledQueryTypes'))
+    return test_suite
+
+
+if __name__ == '__main__':
+    RUNNER = unittest.TextTestRunner()
+    RUNNER.run(suite())
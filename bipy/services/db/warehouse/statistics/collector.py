@@ -0,0 +1,516 @@
+"""
+    This module collects statistics of the warehouse tables (row counts and
+    per column null fraction, min/max and distinct count) and stores them in
+    the repository, so that the UI and the query layer can use them without
+    scanning the warehouse at request time. Statistics of tables larger than
+    the sample threshold are estimated from a sample of rowid ranges, so only
+    the sampled rows are read.
+
+    Author: Ajeet Singh
+    Date: 07/10/2019
+"""
+import math
+import random
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text, select, table as table_clause, column as column_clause
+from sqlalchemy.sql.expression import ClauseElement
+from sqlalchemy.exc import OperationalError
+from bipy.services.db import categories
+from bipy.services.db.repository.meta_objects import WarehouseTableStatistics
+from bipy.services.db.repository.meta_objects import WarehouseColumnStatistics
+from bipy.services.db.repository.meta_objects import WarehouseColumnSketch
+from bipy.services.db.repository.types import DataTypes
+from bipy.services.db.warehouse.statistics.sketches import HyperLogLog, sketch_rows
+from bipy.services.db.warehouse.statistics.sketches import classify_cardinality
+from bipy.services.utils import Utility
+from bipy.logging import logger
+
+
+LOGGER = logger.get_logger(__name__)
+# rowid ranges of a sample, each range is two bind params
+_MAX_SAMPLE_RANGES = 400
+
+
+def quote(name):
+    """Returns an identifier quoted for SQLite"""
+    return '"%s"' % str(name).replace('"', '""')
+
+
+def estimate_distinct(sample_rows, distinct, singletons, total_rows):
+    """ Returns the Duj1 estimate of the number of distinct values of a
+        column from a sample of its non null values
+
+        Args:
+            sample_rows (int): Number of non null values in the sample
+            distinct (int): Number of distinct values in the sample
+            singletons (int): Number of values seen exactly once in the sample
+            total_rows (int): Number of non null values in the table
+    """
+    if sample_rows == 0:
+        return 0
+    if sample_rows >= total_rows:
+        return distinct
+    estimate = sample_rows * distinct / \
+        (sample_rows - singletons + singletons * sample_rows / total_rows)
+    return int(round(min(max(estimate, distinct), total_rows)))
+
+
+def _text(value):
+    """Returns min/max value as string as stored in repository"""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.hex()
+    return str(value)[0:255]
+
+
+class StatisticsCollector(categories.SQLite):
+    """
+        Collects statistics of the warehouse tables stored in repository.
+        The tables are scanned in parallel on a pool of worker threads, each
+        worker using its own pooled connection to the warehouse, while the
+        results are written to the repository from the calling thread in
+        a single commit
+
+    >>> from bipy.services.utils import Utility
+
+    >>> util = Utility()
+
+    >>> conf = util.CONFIG
+
+    >>> collector = util.get_plugin(conf.PATH_STATS_COLLECTOR)
+
+    >>> conn = util.get_plugin(conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+
+    >>> conn.connect(conf.URL_TEST_DB)
+
+    >>> collector.connect(conn)
+
+    >>> collector.collect_table("PRODUCT_MASTER")["row_count"] > 0
+    True
+    """
+
+    __instance = None
+    __warehouse_conn = None
+    __repo_conn = None
+
+    def __new__(cls):
+        """Singleton class implementation
+        """
+        if StatisticsCollector.__instance is None:
+            StatisticsCollector.__instance = object.__new__(cls)
+        return StatisticsCollector.__instance
+
+    def __init__(self):
+        """Default constructor
+        """
+        LOGGER.debug("SQLite Statistics collector instance created")
+        categories.SQLite.__init__(self)
+
+    def connect(self, warehouse_conn, repo_conn=None):
+        """ Connects the collector to the warehouse to be scanned and to the
+            repository where statistics are stored. The statistics tables are
+            created in repository if these don't exist yet
+
+            Args:
+                warehouse_conn (ConnectionManager): Connection to the warehouse
+                repo_conn (ConnectionManager): Connection to the repository
+        """
+        self.__warehouse_conn = warehouse_conn
+        self.__repo_conn = repo_conn
+        if repo_conn is not None:
+            engine = repo_conn.get_engine()
+            WarehouseTableStatistics.metadata.create_all(
+                bind=engine, tables=[WarehouseTableStatistics.__table__,
+                                     WarehouseColumnStatistics.__table__,
+                                     WarehouseColumnSketch.__table__])
+        LOGGER.debug("Statistics collector connected successfully")
+
+    @staticmethod
+    def _settings(workers=None, sample_threshold=None, sample_size=None):
+        """Returns the settings passed as args or configured under
+            `STATS_COLLECTOR`
+        """
+        conf = Utility().CONFIG.get("STATS_COLLECTOR")
+        if workers is None:
+            workers = conf.get("workers", 4) if conf is not None else 4
+        if sample_threshold is None:
+            sample_threshold = conf.get("sample_threshold", 100000) \
+                if conf is not None else 100000
+        if sample_size is None:
+            sample_size = conf.get("sample_size", 20000) if conf is not None else 20000
+        return workers, sample_threshold, sample_size
+
+    def collect_table(self, table_name, column_names=None, sample_threshold=None,
+                      sample_size=None):
+        """ Scans a warehouse table and returns its statistics as dict with
+            keys `table`, `row_count`, `is_sampled`, `sample_size` and
+            `columns` (column name to dict with keys `null_fraction`,
+            `min_value`, `max_value` and `distinct_count`). Statistics are
+            exact for tables spanning up to `sample_threshold` rowids. Larger
+            tables are sampled, see `_sample_ranges`, and all their
+            statistics, the row count included, are estimated from the
+            `sample_size` rows read. Tables without rowid are always scanned
+
+            Args:
+                table_name (String): Name of the table
+                column_names (List): Columns to collect, all columns by default
+                sample_threshold (int): Row count above which tables are sampled
+                sample_size (int): Number of rows in the sample
+        """
+        _, sample_threshold, sample_size = self._settings(None, sample_threshold, sample_size)
+        engine = self.__warehouse_conn.get_engine()
+        table = quote(table_name)
+        with engine.connect() as conn:
+            if column_names is None:
+                column_names = [row[1] for row in
+                                conn.execute("PRAGMA table_info(%s)" % table)]
+            # min/max of rowid are two seeks, unlike COUNT(*)
+            try:
+                min_rowid, max_rowid = conn.execute(
+                    "SELECT (SELECT MIN(rowid) FROM %s), (SELECT MAX(rowid) FROM %s)"
+                    % (table, table)).first()
+            except OperationalError:
+                min_rowid = max_rowid = None
+            span = max_rowid - min_rowid + 1 if max_rowid is not None else 0
+            is_sampled = span > max(sample_threshold, sample_size)
+            LOGGER.debug("Collecting statistics of table '%s' spanning %d rowids (sampled: %s)"
+                         % (table_name, span, is_sampled))
+            source, params = table, {}
+            if is_sampled:
+                ranges = self._sample_ranges(min_rowid, span, sample_size)
+                source = "(SELECT * FROM %s WHERE %s)" % (table, " OR ".join(
+                    "rowid BETWEEN :s%d AND :e%d" % (index, index)
+                    for index in range(len(ranges))))
+                for index, (range_start, range_end) in enumerate(ranges):
+                    params["s%d" % index], params["e%d" % index] = range_start, range_end
+            exprs = ["COUNT(*)"]
+            for col in column_names:
+                col = quote(col)
+                exprs.extend(["COUNT(%s)" % col, "MIN(%s)" % col, "MAX(%s)" % col])
+                if not is_sampled:
+                    exprs.append("COUNT(DISTINCT %s)" % col)
+            width = 3 if is_sampled else 4
+            row = conn.execute(self._statement("SELECT %s FROM %s" % (", ".join(exprs), source),
+                                               params), params).first()
+            rows_read, row = row[0], row[1:]
+            row_count = rows_read
+            if is_sampled:
+                covered = sum(range_end - range_start + 1 for range_start, range_end in ranges)
+                row_count = int(round(rows_read * span / covered))
+            columns = {}
+            for index, col in enumerate(column_names):
+                values = row[index * width:(index + 1) * width]
+                non_null_fraction = values[0] / rows_read if rows_read else 1.0
+                columns[col] = {
+                    "null_fraction": 1.0 - non_null_fraction if rows_read else 0.0,
+                    "min_value": values[1],
+                    "max_value": values[2],
+                    "distinct_count": values[3] if not is_sampled else None,
+                    "non_null_count": int(round(non_null_fraction * row_count))
+                }
+            if is_sampled and column_names:
+                sample = conn.execute(self._statement("SELECT %s FROM %s" % (
+                    ", ".join(quote(col) for col in column_names), source), params),
+                                      params).fetchall()
+                for index, col in enumerate(column_names):
+                    frequencies = {}
+                    for sample_row in sample:
+                        value = sample_row[index]
+                        if value is not None:
+                            frequencies[value] = frequencies.get(value, 0) + 1
+                    singletons = sum(1 for freq in frequencies.values() if freq == 1)
+                    columns[col]["distinct_count"] = estimate_distinct(
+                        sum(frequencies.values()), len(frequencies), singletons,
+                        columns[col]["non_null_count"])
+        return {
+            "table": table_name,
+            "row_count": row_count,
+            "is_sampled": is_sampled,
+            "sample_size": rows_read,
+            "columns": columns
+        }
+
+    @staticmethod
+    def _statement(sql, params):
+        """Returns the SQL as `text` clause if it has bind params"""
+        return text(sql) if params else sql
+
+    @staticmethod
+    def _sample_ranges(min_rowid, span, sample_size):
+        """ Returns the rowid ranges, as tuples of (first rowid, last rowid),
+            sampled from a table whose rowids span `span` values starting at
+            `min_rowid`. The span is split in about sqrt(`sample_size`) equal
+            strata and one range is placed at a random offset in each, so the
+            sample covers the whole table and is read with one rowid seek per
+            range. The ranges cover `sample_size` rowids in total
+        """
+        blocks = min(_MAX_SAMPLE_RANGES, max(1, int(math.sqrt(sample_size))))
+        stratum = span // blocks
+        ranges = []
+        for index in range(blocks):
+            length = min(stratum, sample_size // blocks +
+                         (1 if index < sample_size % blocks else 0))
+            range_start = min_rowid + index * stratum + random.randint(0, stratum - length)
+            ranges.append((range_start, range_start + length - 1))
+        return ranges
+
+    def collect(self, tables, workers=None, sample_threshold=None, sample_size=None):
+        """ Collects statistics of the repository tables passed as list and
+            stores them in repository replacing the earlier statistics. The
+            `number_of_rows` of each table is updated as well
+
+            Args:
+                tables (List): `WarehouseTable` objects stored in repository
+                workers (int): Number of tables scanned in parallel
+                sample_threshold (int): Row count above which tables are sampled
+                sample_size (int): Number of rows in the sample
+
+            Returns:
+                statistics (List): `WarehouseTableStatistics` objects in the
+                                    order of tables passed
+        """
+        if self.__repo_conn is None:
+            LOGGER.error("Collector is not connected to an repository")
+            raise ValueError("Collector is not connected to an repository")
+        workers, sample_threshold, sample_size = self._settings(workers, sample_threshold,
+                                                                sample_size)
+        LOGGER.debug("Collecting statistics of %d tables using %d workers"
+                     % (len(tables), workers))
+        requests = [(table.name, [col.name for col in table.columns] or None)
+                    for table in tables]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(
+                lambda request: self._collect_in_worker(request, sample_threshold,
+                                                        sample_size), requests))
+        session = self.__repo_conn.get_session()
+        collected_on = datetime.utcnow()
+        statistics = []
+        for table, result in zip(tables, results):
+            for old_stats in session.query(WarehouseTableStatistics)\
+                    .filter(WarehouseTableStatistics.table_id == table.id):
+                session.delete(old_stats)
+            table_stats = WarehouseTableStatistics(table_id=table.id,
+                                                   row_count=result["row_count"],
+                                                   is_sampled=result["is_sampled"],
+                                                   sample_size=result["sample_size"],
+                                                   collected_on=collected_on)
+            for col in table.columns:
+                col_stats = result["columns"].get(col.name)
+                if col_stats is None:
+                    continue
+                table_stats.columns.append(WarehouseColumnStatistics(
+                    column_id=col.id,
+                    null_fraction=col_stats["null_fraction"],
+                    min_value=_text(col_stats["min_value"]),
+                    max_value=_text(col_stats["max_value"]),
+                    distinct_count=col_stats["distinct_count"],
+                    collected_on=collected_on))
+            table.number_of_rows = result["row_count"]
+            session.add(table_stats)
+            statistics.append(table_stats)
+        session.commit()
+        LOGGER.debug("Statistics of %d tables stored in repository" % len(statistics))
+        return statistics
+
+    def _collect_in_worker(self, request, sample_threshold, sample_size):
+        """Collects statistics of a table in an worker thread"""
+        table_name, column_names = request
+        try:
+            return self.collect_table(table_name, column_names, sample_threshold, sample_size)
+        finally:
+            self.__warehouse_conn.Session.remove()
+
+    def get_table_statistics(self, table):
+        """ Returns the latest `WarehouseTableStatistics` of the table passed
+            as arg or None if statistics were never collected
+
+            Args:
+                table (WarehouseTable): An table stored in repository
+        """
+        return self.__repo_conn.get_session().query(WarehouseTableStatistics)\
+            .filter(WarehouseTableStatistics.table_id == table.id)\
+            .order_by(WarehouseTableStatistics.collected_on.desc())\
+            .first()
+
+    def get_column_statistics(self, column):
+        """ Returns the latest `WarehouseColumnStatistics` of the column
+            passed as arg or None if statistics were never collected
+
+            Args:
+                column (WarehouseColumn): An column stored in repository
+        """
+        return self.__repo_conn.get_session().query(WarehouseColumnStatistics)\
+            .filter(WarehouseColumnStatistics.column_id == column.id)\
+            .order_by(WarehouseColumnStatistics.collected_on.desc())\
+            .first()
+
+    @staticmethod
+    def _precision(precision=None):
+        """Returns the sketch precision passed as arg or configured"""
+        if precision is None:
+            conf = Utility().CONFIG.get("STATS_COLLECTOR")
+            precision = conf.get("sketch_precision", 12) if conf is not None else 12
+        return precision
+
+    def sketch_table(self, table_name, column_names=None, where=None, precision=None):
+        """ Builds distinct count sketches of the columns of a warehouse table
+            in one pass over its rows
+
+            Args:
+                table_name (String): Name of the table
+                column_names (List): Columns to sketch, all columns by default
+                where (ClauseElement): Condition selecting the rows to sketch,
+                                       e.g., the rows of an incremental load as
+                                       `text()` with bound params
+                precision (int): Precision of the sketches
+
+            Returns:
+                sketch (Dict): Dict with keys `table`, `row_count` and
+                                `columns` (column name to `HyperLogLog`)
+        """
+        precision = self._precision(precision)
+        self._check_where(where)
+        engine = self.__warehouse_conn.get_engine()
+        with engine.connect() as conn:
+            if column_names is None:
+                column_names = [row[1] for row in
+                                conn.execute("PRAGMA table_info(%s)" % quote(table_name))]
+            statement = select([column_clause(col) for col in column_names])\
+                .select_from(table_clause(table_name))
+            if where is not None:
+                statement = statement.where(where)
+            LOGGER.debug("Building sketches of %d columns of table '%s'"
+                         % (len(column_names), table_name))
+            row_count, sketches = sketch_rows(conn.execute(statement), len(column_names),
+                                              precision)
+        return {
+            "table": table_name,
+            "row_count": row_count,
+            "columns": dict(zip(column_names, sketches))
+        }
+
+    @staticmethod
+    def _check_where(where):
+        """Raises ValueError if the row condition is not an SQL clause"""
+        if where is not None and not isinstance(where, ClauseElement):
+            LOGGER.error("Row condition must be an SQL clause, e.g., text() with bound params")
+            raise ValueError("Row condition must be an SQL clause, e.g., text() with "
+                             "bound params")
+
+    def estimate_cardinalities(self, table_name, column_names=None):
+        """ Returns the estimated cardinality of the columns of a warehouse
+            table as dict of upper case column name to tuple of (distinct
+            count, row count), as accepted by `generate_columns_meta`
+
+            Args:
+                table_name (String): Name of the table
+                column_names (List): Columns to estimate, all by default
+        """
+        sketch = self.sketch_table(table_name, column_names)
+        return dict((str(col).upper(), (col_sketch.cardinality(), sketch["row_count"]))
+                    for col, col_sketch in sketch["columns"].items())
+
+    def update_sketches(self, tables, where=None, workers=None, precision=None):
+        """ Builds the sketches of the columns of repository tables and stores
+            them in repository. Without `where` the tables are scanned fully
+            and the stored sketches replaced, otherwise only the rows matching
+            the condition are scanned and merged into the stored sketches. A
+            table is scanned fully anyway if one of its columns has no stored
+            sketch of the requested precision, as the new rows alone would
+            replace the sketch of the whole table. The fact/dimension
+            candidate flags of the columns are derived again from the updated
+            cardinalities
+
+            Args:
+                tables (List): `WarehouseTable` objects stored in repository
+                where (ClauseElement): Condition selecting the newly loaded
+                                       rows as `text()` with bound params
+                workers (int): Number of tables scanned in parallel
+                precision (int): Precision of the sketches
+
+            Returns:
+                sketches (Dict): Column id to `WarehouseColumnSketch`
+        """
+        if self.__repo_conn is None:
+            LOGGER.error("Collector is not connected to an repository")
+            raise ValueError("Collector is not connected to an repository")
+        workers = self._settings(workers)[0]
+        precision = self._precision(precision)
+        self._check_where(where)
+        session = self.__repo_conn.get_session()
+        column_ids = [col.id for table in tables for col in table.columns]
+        stored = dict((sketch.column_id, sketch) for sketch in
+                      session.query(WarehouseColumnSketch)
+                      .filter(WarehouseColumnSketch.column_id.in_(column_ids))) \
+            if column_ids else {}
+        conditions = []
+        for table in tables:
+            mergeable = all(col.id in stored and stored[col.id].registers is not None
+                            and stored[col.id].precision == precision
+                            for col in table.columns)
+            if where is not None and not mergeable:
+                LOGGER.warning("Table '%s' has no stored sketches of precision %d to merge "
+                               "into, scanning it fully" % (table.name, precision))
+            conditions.append(where if mergeable else None)
+        requests = [(table.name, [col.name for col in table.columns] or None, condition)
+                    for table, condition in zip(tables, conditions)]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(
+                lambda request: self._sketch_in_worker(request, precision), requests))
+        updated_on = datetime.utcnow()
+        for table, condition, result in zip(tables, conditions, results):
+            for col in table.columns:
+                col_sketch = result["columns"].get(col.name)
+                if col_sketch is None:
+                    continue
+                sketch = stored.get(col.id)
+                if sketch is None:
+                    sketch = WarehouseColumnSketch(column_id=col.id)
+                    session.add(sketch)
+                    stored[col.id] = sketch
+                row_count = result["row_count"]
+                if condition is not None:
+                    col_sketch.merge(HyperLogLog.from_bytes(sketch.registers))
+                    row_count += sketch.row_count or 0
+                sketch.precision = precision
+                sketch.registers = col_sketch.to_bytes()
+                sketch.row_count = row_count
+                sketch.distinct_count = col_sketch.cardinality()
+                sketch.updated_on = updated_on
+                col.is_fact_candidate, col.is_dim_candidate = classify_cardinality(
+                    DataTypes(col.column_type).name, sketch.distinct_count,
+                    sketch.row_count)
+        session.commit()
+        LOGGER.debug("Sketches of %d tables stored in repository" % len(tables))
+        return stored
+
+    def _sketch_in_worker(self, request, precision):
+        """Builds sketches of a table in an worker thread"""
+        table_name, column_names, where = request
+        try:
+            return self.sketch_table(table_name, column_names, where, precision)
+        finally:
+            self.__warehouse_conn.Session.remove()
+
+    def get_cardinalities(self, table):
+        """ Returns the cardinality of the columns of a table as stored with
+            their sketches, as dict of upper case column name to tuple of
+            (distinct count, row count)
+
+            Args:
+                table (WarehouseTable): An table stored in repository
+        """
+        names = dict((col.id, str(col.name).upper()) for col in table.columns)
+        if not names:
+            return {}
+        return dict((names[sketch.column_id], (sketch.distinct_count, sketch.row_count))
+                    for sketch in self.__repo_conn.get_session()
+                    .query(WarehouseColumnSketch)
+                    .filter(WarehouseColumnSketch.column_id.in_(list(names))))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
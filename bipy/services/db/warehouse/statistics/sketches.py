@@ -0,0 +1,178 @@
+"""
+    Streaming distinct count sketches of warehouse columns. A sketch is built
+    in one pass over the rows of a table and can be merged with the sketch of
+    the rows loaded later, so the cardinality of a column is kept up to date
+    without scanning the whole table again.
+
+    Author: Ajeet Singh
+    Date: 07/11/2019
+"""
+from math import log
+from hashlib import blake2b
+from bipy.services.utils import Utility
+
+
+NUMERIC_TYPES = ['FLOAT', 'DOUBLE', 'LONG', 'INTEGER', 'NUMERIC', 'DECIMAL']
+
+
+def _hash(value):
+    """Returns 64 bit hash of an column value, values of different types
+        (e.g., 1 and '1') hash differently
+    """
+    if isinstance(value, str):
+        data = b"s" + value.encode("utf-8")
+    elif isinstance(value, bytes):
+        data = b"b" + value
+    elif isinstance(value, float) and value.is_integer():
+        # SQLite compares 1.0 equal to 1
+        data = b"n" + str(int(value)).encode()
+    else:
+        data = b"n" + str(value).encode()
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """ HyperLogLog sketch estimating the number of distinct values added to
+        it. The standard error of the estimate is about `1.04 / sqrt(2 ** p)`,
+        i.e., 1.6% for the default precision of 12 using 4 KB per sketch
+
+    >>> sketch = HyperLogLog()
+
+    >>> sketch.update(range(10000))
+
+    >>> abs(sketch.cardinality() - 10000) < 500
+    True
+    """
+
+    def __init__(self, precision=12, registers=None):
+        """Default constructor
+
+            Args:
+                precision (int): Number of index bits, between 4 and 16
+                registers (bytes): Registers of an persisted sketch
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError("Precision of sketch should be between 4 and 16")
+        self.precision = precision
+        size = 1 << precision
+        if registers is not None and len(registers) != size:
+            raise ValueError("Sketch with precision %d needs %d registers"
+                             % (precision, size))
+        self.registers = bytearray(registers) if registers is not None else bytearray(size)
+
+    def __repr__(self):
+        """Returns string representation
+        """
+        return "HyperLogLog [Precision=%d, Cardinality=%d]" % (self.precision,
+                                                              self.cardinality())
+
+    def add(self, value):
+        """ Adds an value to the sketch, None values are ignored
+
+            Args:
+                value (object): The value
+        """
+        if value is None:
+            return
+        bits = 64 - self.precision
+        hashed = _hash(value)
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        """ Adds all values of an iterable to the sketch
+
+            Args:
+                values (iterable): The values
+        """
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """ Merges an sketch of the same precision into this one, after which
+            this sketch estimates the distinct count of the union of both
+
+            Args:
+                other (HyperLogLog): The sketch to merge
+        """
+        if other.precision != self.precision:
+            raise ValueError("Sketches with different precision can't be merged")
+        self.registers = bytearray(max(mine, theirs) for mine, theirs
+                                   in zip(self.registers, other.registers))
+        return self
+
+    def cardinality(self):
+        """Returns the estimated number of distinct values added to sketch
+        """
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # linear counting is more accurate for small cardinalities
+            estimate = size * log(size / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        """Returns the registers of the sketch to be persisted"""
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, registers):
+        """ Returns the sketch of the persisted registers
+
+            Args:
+                registers (bytes): Registers as returned by `to_bytes`
+        """
+        return cls(len(registers).bit_length() - 1, registers)
+
+
+def sketch_rows(rows, column_count, precision=12):
+    """ Builds the sketches of all columns in one pass over the rows
+
+        Args:
+            rows (iterable): Rows (tuples) of the table
+            column_count (int): Number of columns in each row
+            precision (int): Precision of the sketches
+
+        Returns:
+            (row_count, sketches): Number of rows read and list of sketches
+                                    in the order of columns
+    """
+    sketches = [HyperLogLog(precision) for _ in range(column_count)]
+    row_count = 0
+    for row in rows:
+        row_count += 1
+        for sketch, value in zip(sketches, row):
+            sketch.add(value)
+    return row_count, sketches
+
+
+def classify_cardinality(col_type, distinct, row_count):
+    """ Returns (is_fact_candidate, is_dim_candidate) of an column as
+        derived from its estimated cardinality. Columns with few distinct
+        values compared to the rows of the table are dimension candidates
+        whatever their type (e.g., integer codes), numeric columns otherwise
+        are fact candidates and high cardinality text is neither. Limits are
+        configured under `DIMENSION_CANDIDATES`
+
+        Args:
+            col_type (String): Normalized type name of the column
+            distinct (int): Estimated number of distinct values
+            row_count (int): Number of rows of the table
+    """
+    if not row_count:
+        return col_type in NUMERIC_TYPES, col_type not in NUMERIC_TYPES
+    conf = Utility().CONFIG.get("DIMENSION_CANDIDATES")
+    max_distinct = conf.get("max_distinct", 10000) if conf is not None else 10000
+    max_ratio = conf.get("max_distinct_ratio", 0.2) if conf is not None else 0.2
+    is_dim = distinct <= max_distinct and distinct <= max_ratio * row_count
+    is_fact = not is_dim and col_type in NUMERIC_TYPES
+    return is_fact, is_dim
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,174 @@
+"""
+    Test cases for ``StatisticsCollector``
+    Author: Ajeet Singh
+    Date: 07/10/2019
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from sqlalchemy import event, text
+from bipy.services.db.repository.meta_objects import Base, WarehouseTable, WarehouseColumn
+from bipy.services.db.warehouse.statistics.collector import estimate_distinct
+from bipy.services.utils import Utility
+
+
+class StatisticsCollectorTestCase(unittest.TestCase):
+    """Test case for StatisticsCollector class
+    """
+    conf = None
+    collector = None
+    temp_dir = None
+    warehouse = None
+    repository = None
+
+    def setUp(self):
+        util = Utility()
+        self.conf = util.CONFIG
+        self.collector = util.get_plugin(self.conf.PATH_STATS_COLLECTOR)
+        self.temp_dir = tempfile.mkdtemp()
+        db_file = os.path.join(self.temp_dir, "warehouse.db")
+        conn = sqlite3.connect(db_file)
+        conn.execute("CREATE TABLE ITEMS (ID INTEGER PRIMARY KEY, CODE TEXT, QTY INTEGER)")
+        conn.executemany("INSERT INTO ITEMS VALUES (?, ?, ?)",
+                         [(i, "C%d" % (i % 50), None if i % 4 == 0 else i % 7)
+                          for i in range(1, 1001)])
+        conn.commit()
+        conn.close()
+        self.warehouse = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        self.warehouse.connect("sqlite:///" + db_file)
+        self.repository = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        self.repository.connect("sqlite:///" + os.path.join(self.temp_dir, "meta.db"))
+        Base.metadata.create_all(bind=self.repository.get_engine())
+        self.collector.connect(self.warehouse, self.repository)
+
+    def tearDown(self):
+        self.warehouse.disconnect()
+        self.repository.disconnect()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _repository_table(self):
+        session = self.repository.get_session()
+        table = WarehouseTable(name="ITEMS")
+        for name in ["ID", "CODE", "QTY"]:
+            table.columns.append(WarehouseColumn(name=name))
+        session.add(table)
+        session.commit()
+        return table
+
+    def testPluginName(self):
+        plugins = Utility().get_all_plugins(self.conf.PATH_STATS_COLLECTOR)
+        assert plugins[0].name == 'SQLite Statistics Collector'
+
+    def testCollectTable(self):
+        stats = self.collector.collect_table("ITEMS")
+        assert stats["row_count"] == 1000
+        assert not stats["is_sampled"]
+        assert stats["columns"]["ID"]["distinct_count"] == 1000
+        assert stats["columns"]["CODE"]["distinct_count"] == 50
+        assert stats["columns"]["QTY"]["null_fraction"] == 0.25
+        assert stats["columns"]["QTY"]["min_value"] == 0
+        assert stats["columns"]["QTY"]["max_value"] == 6
+
+    def testCollectSampled(self):
+        stats = self.collector.collect_table("ITEMS", sample_threshold=100, sample_size=200)
+        assert stats["is_sampled"]
+        assert stats["sample_size"] == 200
+        assert stats["row_count"] == 1000
+        assert stats["columns"]["ID"]["distinct_count"] == 1000
+        assert 40 <= stats["columns"]["CODE"]["distinct_count"] <= 70
+        assert 0.15 <= stats["columns"]["QTY"]["null_fraction"] <= 0.35
+        assert stats["columns"]["ID"]["min_value"] >= 1
+
+    def testCollectSampledReadsSample(self):
+        conn = self.warehouse.get_engine().raw_connection()
+        conn.execute("DELETE FROM ITEMS WHERE ID % 2 = 0")
+        conn.commit()
+        conn.close()
+        statements = []
+        engine = self.warehouse.get_engine()
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            stats = self.collector.collect_table("ITEMS", sample_threshold=100,
+                                                 sample_size=200)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert not any("COUNT(DISTINCT" in sql or "random()" in sql for sql in statements)
+        assert not any(sql.startswith('SELECT COUNT(*) FROM "ITEMS"') for sql in statements)
+        assert 80 <= stats["sample_size"] <= 120
+        assert 400 <= stats["row_count"] <= 600
+
+    def testEstimateDistinct(self):
+        assert estimate_distinct(0, 0, 0, 100) == 0
+        assert estimate_distinct(100, 40, 10, 100) == 40
+        assert estimate_distinct(100, 100, 100, 10000) == 10000
+        assert 40 <= estimate_distinct(100, 40, 10, 10000) <= 10000
+
+    def testCollectStored(self):
+        table = self._repository_table()
+        self.collector.collect([table], workers=2)
+        stats = self.collector.collect([table], workers=2)
+        assert table.number_of_rows == 1000
+        assert self.collector.get_table_statistics(table) is stats[0]
+        assert self.collector.get_table_statistics(table).columns.__len__() == 3
+        session = self.repository.get_session()
+        assert session.query(stats[0].__class__).count() == 1
+        col_stats = self.collector.get_column_statistics(table.columns[1])
+        assert col_stats.distinct_count == 50
+        assert col_stats.min_value == "C0"
+        assert col_stats.collected_on is not None
+
+    def testUpdateSketches(self):
+        table = self._repository_table()
+        table.columns[0].column_type = table.columns[2].column_type = 2
+        self.collector.update_sketches([table], workers=2)
+        cardinalities = self.collector.get_cardinalities(table)
+        assert abs(cardinalities["CODE"][0] - 50) <= 2 and cardinalities["CODE"][1] == 1000
+        assert table.columns[0].is_fact_candidate
+        assert table.columns[2].is_dim_candidate
+        conn = self.warehouse.get_engine().raw_connection()
+        conn.execute("INSERT INTO ITEMS SELECT ID + 1000, 'N' || ID, QTY FROM ITEMS")
+        conn.commit()
+        conn.close()
+        with self.assertRaises(ValueError):
+            self.collector.update_sketches([table], where="ID > 1000")
+        self.collector.update_sketches([table], where=text("ID > :last_id")
+                                       .bindparams(last_id=1000))
+        cardinalities = self.collector.get_cardinalities(table)
+        assert cardinalities["ID"][1] == 2000
+        assert abs(cardinalities["CODE"][0] - 1050) < 50
+        assert table.columns[1].is_dim_candidate is False
+
+    def testUpdateSketchesPrecisionChanged(self):
+        table = self._repository_table()
+        self.collector.update_sketches([table], precision=10)
+        conn = self.warehouse.get_engine().raw_connection()
+        conn.execute("INSERT INTO ITEMS SELECT ID + 1000, 'N' || ID, QTY FROM ITEMS")
+        conn.commit()
+        conn.close()
+        self.collector.update_sketches([table], where=text("ID > :last_id")
+                                       .bindparams(last_id=1000), precision=12)
+        cardinalities = self.collector.get_cardinalities(table)
+        assert cardinalities["ID"][1] == 2000
+        assert abs(cardinalities["ID"][0] - 2000) < 100
+
+
+def suite():
+    """Test suite for statistics collector"""
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(StatisticsCollectorTestCase('testPluginName'))
+    test_suite.addTest(StatisticsCollectorTestCase('testCollectTable'))
+    test_suite.addTest(StatisticsCollectorTestCase('testCollectSampled'))
+    test_suite.addTest(StatisticsCollectorTestCase('testCollectSampledReadsSample'))
+    test_suite.addTest(StatisticsCollectorTestCase('testEstimateDistinct'))
+    test_suite.addTest(StatisticsCollectorTestCase('testCollectStored'))
+    test_suite.addTest(StatisticsCollectorTestCase('testUpdateSketches'))
+    test_suite.addTest(StatisticsCollectorTestCase('testUpdateSketchesPrecisionChanged'))
+    return test_suite
+
+
+if __name__ == '__main__':
+    RUNNER = unittest.TextTestRunner()
+    RUNNER.run(suite())
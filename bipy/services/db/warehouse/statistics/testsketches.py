@@ -0,0 +1,67 @@
+"""
+    Test cases for distinct count sketches
+    Author: Ajeet Singh
+    Date: 07/11/2019
+"""
+import unittest
+from bipy.services.db.warehouse.statistics.sketches import HyperLogLog, sketch_rows
+from bipy.services.db.warehouse.statistics.sketches import classify_cardinality
+
+
+class HyperLogLogTestCase(unittest.TestCase):
+    """Test case for HyperLogLog sketch
+    """
+
+    def testCardinality(self):
+        sketch = HyperLogLog()
+        sketch.update(range(50000))
+        sketch.update(range(50000))
+        assert abs(sketch.cardinality() - 50000) < 2500
+        small = HyperLogLog()
+        small.update(["A", "B", "C", None, "A"])
+        assert small.cardinality() == 3
+
+    def testMerge(self):
+        first = HyperLogLog()
+        first.update(range(0, 30000))
+        second = HyperLogLog()
+        second.update(range(20000, 50000))
+        first.merge(second)
+        assert abs(first.cardinality() - 50000) < 2500
+        self.assertRaises(ValueError, first.merge, HyperLogLog(10))
+
+    def testPersist(self):
+        sketch = HyperLogLog(10)
+        sketch.update(range(1000))
+        restored = HyperLogLog.from_bytes(sketch.to_bytes())
+        assert restored.precision == 10
+        assert restored.cardinality() == sketch.cardinality()
+
+    def testSketchRows(self):
+        rows = [(i, i % 10, "T%d" % i) for i in range(2000)]
+        row_count, sketches = sketch_rows(rows, 3)
+        assert row_count == 2000
+        assert sketches[1].cardinality() == 10
+        assert abs(sketches[2].cardinality() - 2000) < 100
+
+    def testClassify(self):
+        assert classify_cardinality('INTEGER', 10, 10000) == (False, True)
+        assert classify_cardinality('INTEGER', 9000, 10000) == (True, False)
+        assert classify_cardinality('VARCHAR', 9000, 10000) == (False, False)
+        assert classify_cardinality('VARCHAR', 0, 0) == (False, True)
+
+
+def suite():
+    """Test suite for sketches"""
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(HyperLogLogTestCase('testCardinality'))
+    test_suite.addTest(HyperLogLogTestCase('testMerge'))
+    test_suite.addTest(HyperLogLogTestCase('testPersist'))
+    test_suite.addTest(HyperLogLogTestCase('testSketchRows'))
+    test_suite.addTest(HyperLogLogTestCase('testClassify'))
+    return test_suite
+
+
+if __name__ == '__main__':
+    RUNNER = unittest.TextTestRunner()
+    RUNNER.run(suite())
@@ -0,0 +1,253 @@
+"""Browser commands backed by the async browser. hug serves an `async def`
+    handler by running it to completion on the event loop of the WSGI worker
+    thread, which blocks the worker anyway and fails on threads without an
+    event loop. So the endpoints are plain functions running their lookups
+    on an event loop of their own and a process serves concurrent requests
+    only through the threads of its WSGI server. What runs concurrently are
+    the lookups of a request, e.g., all tables of `table_details`, in the
+    bounded thread pool of `AsyncConnectionManager`. Callers running an
+    event loop (e.g., an asyncio server) await `get_browser` and the
+    `AsyncBrowser` methods instead
+
+    Author: Ajeet Singh
+    Date: 07/06/2019
+"""
+import asyncio
+import threading
+import hug
+from bipy.services.utils import Utility
+from bipy.services.db.connection_managers.sqlite.async_manager import AsyncConnectionManager
+from bipy.services.db.warehouse.browsers.sqlite.async_metadata import AsyncBrowser
+
+
+# browsers shared by the requests by warehouse URL, their catalog caches
+# are kept between the requests
+_BROWSERS = {}
+_LOCK = threading.Lock()
+
+
+async def connect():
+    """Connects to an browser interface and returns the async
+        connection
+    """
+    util = Utility()
+    config = util.CONFIG
+    conn = AsyncConnectionManager(util.get_plugin(config.PATH_CONNECTION_MANAGERS,
+                                                  new_instance=True))
+    await conn.connect(config.URL_TEST_DB)
+    return conn
+
+
+async def get_browser(conn=None):
+    """ Returns an async browser connected to the warehouse. Without a
+        connection, the browser shared for the warehouse URL is returned,
+        connected on first use, with its catalog cache refreshed as per the
+        schema version of the database
+
+        Args:
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    if conn is not None:
+        br = AsyncBrowser()
+        await br.connect(conn)
+        return br
+    url = Utility().CONFIG.URL_TEST_DB
+    br = _BROWSERS.get(url)
+    if br is not None:
+        await br.refresh_catalog()
+        return br
+    br = AsyncBrowser()
+    await br.connect(await connect())
+    with _LOCK:
+        shared = _BROWSERS.setdefault(url, br)
+    if shared is not br:
+        # connected concurrently by another request
+        await br.close()
+    return shared
+
+
+async def close_browsers():
+    """Closes the browsers shared by the requests"""
+    with _LOCK:
+        browsers = list(_BROWSERS.values())
+        _BROWSERS.clear()
+    for br in browsers:
+        await br.close()
+
+
+def _run(lookup, conn=None):
+    """ Runs an lookup of the async browser on a new event loop and returns
+        its result. The event loop of the calling thread is not used, so it
+        works from any worker thread
+
+        Args:
+            lookup (callable): Function of the browser returning the
+                               coroutine of the lookup
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    async def _lookup():
+        return await lookup(await get_browser(conn))
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_lookup())
+    finally:
+        loop.close()
+
+
+@hug.cli()
+@hug.get()
+def schemas(conn=None):
+    """Returns instance of schemas in warehouse
+
+        Args:
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_schemas(), conn)
+
+
+@hug.cli()
+@hug.get()
+def tables(conn=None, schema=None):
+    """Returns instance of tables in warehouse
+
+        Args:
+            conn (AsyncConnectionManager): connection to warehouse db
+            schema (String): Schema name from where tables needs to be listed
+    """
+    return _run(lambda br: br.get_tables(schema), conn)
+
+
+@hug.cli()
+@hug.get()
+def views(conn=None, schema=None):
+    """Returns instance of views in warehouse
+
+        Args:
+            conn (AsyncConnectionManager): connection to warehouse db
+            schema (String): Schema name from where views needs to be listed
+    """
+    return _run(lambda br: br.get_views(schema), conn)
+
+
+@hug.cli()
+@hug.get()
+def view_definition(view, schema=None, conn=None):
+    """Returns SQL query used for creating view
+
+        Args:
+            view (String): View mame
+            schema (String): Schema name, by default it is None
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_view_definition(view, schema), conn)
+
+
+@hug.cli()
+@hug.get(output=hug.output_format.text)
+def columns(table, conn=None):
+    """Returns a list of column dict objects with details of each column
+
+        Args:
+            table (String): Name of the table
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_columns(table), conn)
+
+
+@hug.cli()
+@hug.get()
+def column_names(table, conn=None):
+    """Returns a list of column names under an provided table
+
+        Args:
+            table (String): Name of the table
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_column_names(table), conn)
+
+
+@hug.cli()
+@hug.get()
+def column_type(table, column, conn=None):
+    """Returns an database type of an column available under provided
+        table
+
+        Args:
+            table (String): Name of the table
+            column (String): Name of the column
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_column_type(table, column), conn)
+
+
+@hug.cli()
+@hug.get()
+def pk_columns(table, conn=None):
+    """Return column names which makes a primary key in the table
+
+        Args:
+            table (String): Name of the table
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_primary_key_columns(table), conn)
+
+
+@hug.cli()
+@hug.get()
+def pk_name(table, conn=None):
+    """Returns the name of primary key in the provided table
+
+        Args:
+            table (String): Name of the table
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_primary_key_name(table), conn)
+
+
+@hug.cli()
+@hug.get()
+def table_options(table, conn=None):
+    """Returns the options available for the provided table
+
+        Args:
+            table (String): Name of the table
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_table_options(table), conn)
+
+
+@hug.cli()
+@hug.get()
+def fk_columns(table, conn=None):
+    """Return column names which makes a foreign keys in the table
+
+        Args:
+            table (String): Name of the table
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_foreign_keys(table), conn)
+
+
+@hug.cli()
+@hug.get(output=hug.output_format.text)
+def table_details(tables: hug.types.multiple, conn=None):
+    """Returns columns, primary key and foreign keys of all the tables
+        passed as arg. Lookups of all tables run concurrently
+
+        Args:
+            tables (list): Names of the tables
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.get_table_details(tables), conn)
+
+
+@hug.cli()
+@hug.get()
+def snapshot(conn=None):
+    """Returns the catalog of all tables and views (columns, primary keys,
+        foreign keys and indexes) read in a handful of queries
+
+        Args:
+            conn (AsyncConnectionManager): connection to warehouse db
+    """
+    return _run(lambda br: br.snapshot(), conn).to_dict()
@@ -4,27 +4,55 @@
     Author: Ajeet Singh
     Date: 06/17/2019
 """
+import threading
 import hug
 from bipy.services.utils import Utility
 
 
+# browsers shared by the requests by warehouse URL, their catalog caches
+# are kept between the requests
+_BROWSERS = {}
+_LOCK = threading.Lock()
+
+
 def connect():
     """Connects to an browser interface and returns
         the connection
     """
     util = Utility()
     config = util.CONFIG
-    conns = util.get_plugin(config.PATH_CONNECTION_MANAGERS)
+    conns = util.get_plugin(config.PATH_CONNECTION_MANAGERS, new_instance=True)
     conns.connect(config.URL_TEST_DB)
     return conns
 
 
-def _browser():
-    """Returns an instance of Browser plugin"""
+def get_browser(conn=None):
+    """ Returns the browser shared by the requests for the warehouse URL of
+        the connection, or of the configured warehouse if not passed. It is
+        connected on first use and its catalog cache is refreshed as per the
+        schema version of the database on the next uses. The browser reads
+        through the engine of the connection, which stays cached when the
+        connection is closed
+
+        Args:
+            conn (ConnectionManager): connection to warehouse db
+    """
     util = Utility()
-    config = util.CONFIG
-    browser = util.get_plugin(config.PATH_BROWSER)
-    return browser
+    url = conn.get_connection_string() if conn is not None else util.CONFIG.URL_TEST_DB
+    br = _BROWSERS.get(url)
+    if br is not None:
+        br.refresh_catalog()
+        return br
+    if conn is None:
+        conn = connect()
+    br = util.get_plugin(util.CONFIG.PATH_BROWSER, new_instance=True)
+    br.connect(conn)
+    with _LOCK:
+        shared = _BROWSERS.setdefault(url, br)
+    if shared is not br:
+        # connected concurrently by another request
+        br.close()
+    return shared
 
 
 @hug.cli()
@@ -35,11 +63,7 @@ def schemas(conn=None):
         Args:
             conn (ConnectionManager): connection to warehouse db
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_schemas()
+    return get_browser(conn).get_schemas()
 
 
 @hug.cli()
@@ -51,11 +75,7 @@ def tables(conn=None, schema=None):
             conn (ConnectionManager): connection to warehouse db
             schema (String): Schema name from where tables needs to be listed
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_tables(schema)
+    return get_browser(conn).get_tables(schema)
 
 
 @hug.cli()
@@ -67,11 +87,7 @@ def views(conn=None, schema=None):
             conn (ConnectionManager): connection to warehouse db
             schema (String): Schema name from where views needs to be listed
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_views(schema)
+    return get_browser(conn).get_views(schema)
 
 
 @hug.cli()
@@ -86,11 +102,7 @@ def view_definition(view, schema=None, conn=None):
             schema (String): Schema name, by default it is None
             conn (ConnectionManager): ConnectionManager instance
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_view_definition(view, schema)
+    return get_browser(conn).get_view_definition(view, schema)
 
 
 @hug.cli()
@@ -103,11 +115,7 @@ def columns(table, conn=None):
             table (String): Name of the table
             conn (ConnectionManager): ConnectionManager instance
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_columns(table)
+    return get_browser(conn).get_columns(table)
 
 
 @hug.cli()
@@ -119,11 +127,7 @@ def column_names(table, conn=None):
             table (String): Name of the table
             conn (ConnectionManager): ConnectionManager instance
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_column_names(table)
+    return get_browser(conn).get_column_names(table)
 
 
 @hug.cli()
@@ -137,11 +141,7 @@ def column_type(table, column, conn=None):
             column (String): Name of the column
             conn (ConnectionManager): An instance of ConnectionManager
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_column_type(table, column)
+    return get_browser(conn).get_column_type(table, column)
 
 
 @hug.cli()
@@ -153,11 +153,7 @@ def pk_columns(table, conn=None):
             table (String): Name of the table
             conn (ConnectionString): An instance of ConnectionManager
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_primary_key_columns(table)
+    return get_browser(conn).get_primary_key_columns(table)
 
 
 @hug.cli()
@@ -169,11 +165,7 @@ def pk_name(table, conn=None):
             table (String): Name of the table
             conn (ConnectionString): An instance of ConnectionManager
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_primary_key_name(table)
+    return get_browser(conn).get_primary_key_name(table)
 
 
 @hug.cli()
@@ -185,11 +177,7 @@ def table_options(table, conn=None):
             table (String): Name of the table
             conn (ConnectionString): An instance of ConnectionManager
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_table_options(table)
+    return get_browser(conn).get_table_options(table)
 
 
 @hug.cli()
@@ -201,28 +189,37 @@ def fk_columns(table, conn=None):
             table (String): Name of the table
             conn (ConnectionString): An instance of ConnectionManager
     """
-    if conn is None:
-        conn = connect()
-    br = _browser()
-    br.connect(conn)
-    return br.get_foreign_keys(table)
+    return get_browser(conn).get_foreign_keys(table)
+
+
+@hug.cli()
+@hug.get()
+def snapshot(conn=None):
+    """Returns the catalog of all tables and views (columns, primary keys,
+        foreign keys and indexes) read in a handful of queries
+
+        Args:
+            conn (ConnectionManager): An instance of ConnectionManager
+    """
+    return get_browser(conn).snapshot().to_dict()
 
 
 @hug.cli()
 @hug.get()
 def close(conn=None):
-    """Closes the connection to warehouse database
+    """Closes the browser shared for the warehouse database, the next
+        request connects a new one
 
         Args:
             conn (ConnectionManager): An instance of connection
     """
     try:
-        if conn is None:
-            conn = connect()
-        br = _browser()
-        br.connect(conn)
-        br.close()
-        del br
+        url = conn.get_connection_string() if conn is not None \
+            else Utility().CONFIG.URL_TEST_DB
+        with _LOCK:
+            br = _BROWSERS.pop(url, None)
+        if br is not None:
+            br.close()
         return True
     except Exception:
         return False
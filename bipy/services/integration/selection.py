@@ -6,6 +6,7 @@
 """
 import hug
 from bipy.services.utils import Utility
+from bipy.services.integration.browser import get_browser
 
 
 def _repo_connect():
@@ -13,7 +14,7 @@ def _repo_connect():
     """
     utils = Utility()
     config = utils.CONFIG
-    conn = utils.get_plugin(config.PATH_CONNECTION_MANAGERS)
+    conn = utils.get_plugin(config.PATH_CONNECTION_MANAGERS, new_instance=True)
     conn.connect(config.URL_META_DB)
     return conn
 
@@ -23,18 +24,16 @@ def _wh_connect():
     """
     utils = Utility()
     config = utils.CONFIG
-    conn = utils.get_plugin(config.PATH_CONNECTION_MANAGERS)
+    conn = utils.get_plugin(config.PATH_CONNECTION_MANAGERS, new_instance=True)
     conn.connect(config.URL_TEST_DB)
     return conn
 
 
 def _browser(wh_conn):
-    """Returns instance of database browser"""
-    util = Utility()
-    config = util.CONFIG
-    br = util.get_plugin(config.PATH_BROWSER)
-    br.connect(wh_conn)
-    return br
+    """Returns the database browser shared for the URL of the warehouse
+        connection, see `browser.get_browser`
+    """
+    return get_browser(wh_conn)
 
 
 def _base_meta_gen():
@@ -49,7 +48,7 @@ def _repo_manager(repo_conn):
     """Returns an instance of repository manager"""
     util = Utility()
     config = util.CONFIG
-    repo_mgr = util.get_plugin(config.PATH_REPO_MGR)
+    repo_mgr = util.get_plugin(config.PATH_REPO_MGR, new_instance=True)
     repo_mgr.connect(repo_conn)
     return repo_mgr
 
@@ -204,3 +203,76 @@ def select_columns(column_list, table, repo_conn=None, wh_conn=None):
             return "Columns meta objects selection failed=> No such table found: %s" % (table)
     except Exception as err:
         return "Columns meta objects selection failed=> %s" % (err)
+
+
+@hug.cli()
+@hug.get()
+def harvest_database(db_name, db_type, db_url, user, password, repo_conn=None, wh_conn=None):
+    """Selects the database along with all of its schemas, tables, views and
+        columns from warehouse in one pass and saves them to the repository
+        in a single transaction. Each schema (i.e., attached database) is
+        read from its own catalog snapshot. The tables of the main schema are
+        introspected in parallel by the workers configured under `HARVEST`
+        if there are at least `HARVEST.min_tables` of them
+
+        Args:
+            db_name (String): A label of database to refer
+            db_type (String): Type of database i.e., SQLITE, MYSQL, etc
+            db_url (String): A connection url to the database
+            user (String): A username to connect to database
+            password (String): password for the username passed
+            repo_conn (ConnectionManager): A connection to repository database
+            wh_conn (ConnectionManager): A connection to the warehouse at `db_url`
+    """
+    repo_created = repo_conn is None
+    wh_created = wh_conn is None
+    try:
+        if repo_created:
+            repo_conn = _repo_connect()
+        if wh_created:
+            wh_conn = Utility().get_plugin(Utility().CONFIG.PATH_CONNECTION_MANAGERS,
+                                           new_instance=True)
+            wh_conn.connect(db_url, read_only=True)
+        bmg = _base_meta_gen()
+        br = _browser(wh_conn)
+        rm = _repo_manager(repo_conn)
+        harvest_conf = Utility().CONFIG.get("HARVEST")
+        min_tables = harvest_conf.get("min_tables", 10) if harvest_conf is not None else 10
+        db_obj = bmg.generate_database_meta(db_name, db_type, db_url, user, password)
+        schemas = bmg.generate_schemas_meta(br.get_schemas(), db_obj)
+        table_count = view_count = column_count = 0
+        for sch in schemas:
+            # one consistent read of the catalog of the schema instead of
+            # lookups per table
+            catalog = br.snapshot(sch.name)
+            table_arr = [table for table in catalog.get_table_names()
+                         if not str(table).startswith("sqlite_")]
+            # workers introspect the tables of the main schema only
+            if len(table_arr) >= min_tables and sch.name == "main":
+                tables = bmg.harvest_tables(table_arr, sch, db_url)
+                column_count += sum(len(tbl.columns) for tbl in tables)
+            else:
+                tables = bmg.generate_tables_meta(table_arr, sch, catalog)
+                for tbl in tables:
+                    column_count += len(bmg.generate_columns_meta(
+                        catalog.get_columns(tbl.name), tbl, catalog))
+            for tbl in tables:
+                bmg.generate_foreign_keys_meta(tbl, sch, catalog)
+            views = bmg.generate_views_meta(catalog.get_view_names(), sch, catalog)
+            table_count += len(tables)
+            view_count += len(views)
+        # children are saved along with the database with bulk inserts
+        rm.bulk_save_all([db_obj])
+        return ("Database '%s' has been harvested successfully: %d schemas, %d tables, "
+                "%d views and %d columns" % (db_obj.name, len(schemas), table_count,
+                                             view_count, column_count))
+    except Exception as err:
+        if repo_conn is not None:
+            repo_conn.get_session().rollback()
+        return "Database harvest failed => %s" % (err)
+    finally:
+        # only the connections opened here are closed
+        if wh_created and wh_conn is not None:
+            wh_conn.disconnect()
+        if repo_created and repo_conn is not None:
+            repo_conn.disconnect()
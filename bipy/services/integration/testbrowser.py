@@ -0,0 +1,67 @@
+"""
+    Test cases for the browser commands
+    Author: Ajeet Singh
+    Date: 07/14/2019
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from bipy.services.integration import browser
+from bipy.services.utils import Utility
+
+
+class BrowserCommandsTestCase(unittest.TestCase):
+    """Test case for the browser shared by the commands
+    """
+    temp_dir = None
+    conn = None
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        db_file = os.path.join(self.temp_dir, "warehouse.db")
+        with sqlite3.connect(db_file) as db:
+            db.execute("CREATE TABLE ITEMS (id INTEGER PRIMARY KEY, name TEXT)")
+        util = Utility()
+        self.conn = util.get_plugin(util.CONFIG.PATH_CONNECTION_MANAGERS, new_instance=True)
+        self.conn.connect("sqlite:///" + db_file)
+
+    def tearDown(self):
+        browser.close(self.conn)
+        self.conn.disconnect()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def testSharedBrowser(self):
+        br = browser.get_browser(self.conn)
+        assert browser.column_names("ITEMS", self.conn) == ['id', 'name']
+        with mock.patch.object(br, "_build_table_catalog",
+                               wraps=br._build_table_catalog) as build:
+            assert browser.pk_columns("ITEMS", self.conn) == ['id']
+            assert browser.get_browser(self.conn) is br
+            assert build.call_count == 0
+
+    def testSchemaChange(self):
+        assert browser.column_names("ITEMS", self.conn) == ['id', 'name']
+        self.conn.get_engine().execute("ALTER TABLE ITEMS ADD COLUMN cost REAL")
+        assert browser.column_names("ITEMS", self.conn) == ['id', 'name', 'cost']
+
+    def testClose(self):
+        br = browser.get_browser(self.conn)
+        assert browser.close(self.conn)
+        assert browser.get_browser(self.conn) is not br
+
+
+def suite():
+    """Test suite for the browser commands"""
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(BrowserCommandsTestCase('testSharedBrowser'))
+    test_suite.addTest(BrowserCommandsTestCase('testSchemaChange'))
+    test_suite.addTest(BrowserCommandsTestCase('testClose'))
+    return test_suite
+
+
+if __name__ == '__main__':
+    RUNNER = unittest.TextTestRunner()
+    RUNNER.run(suite())
@@ -0,0 +1,108 @@
+"""
+    Test cases for the selection of warehouse objects
+    Author: Ajeet Singh
+    Date: 07/12/2019
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from sqlalchemy import event
+from bipy.services.db.repository.meta_objects import Base
+from bipy.services.integration import selection
+from bipy.services.utils import Utility
+
+
+class SelectionTestCase(unittest.TestCase):
+    """Test case for selection of warehouse objects
+    """
+    conf = None
+    temp_dir = None
+    repo_conn = None
+
+    def setUp(self):
+        util = Utility()
+        self.conf = util.CONFIG
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_conn = util.get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        self.repo_conn.connect("sqlite:///" + os.path.join(self.temp_dir, "meta.db"))
+        Base.metadata.create_all(bind=self.repo_conn.get_engine())
+
+    def tearDown(self):
+        self.repo_conn.disconnect()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def testHarvestDatabase(self):
+        commits = []
+        session = self.repo_conn.get_session()
+        event.listen(session, "after_commit", lambda sess: commits.append(sess))
+        result = selection.harvest_database("Warehouse 1", "SQLITE", self.conf.URL_TEST_DB,
+                                            "user", "pass", self.repo_conn)
+        assert result == "Database 'Warehouse 1' has been harvested successfully: " \
+            "1 schemas, 4 tables, 1 views and 11 columns", result
+        assert len(commits) == 1
+        rm = Utility().get_plugin(self.conf.PATH_REPO_MGR)
+        rm.connect(self.repo_conn)
+        tbl = rm.get_table("PRODUCT_MASTER")
+        assert [col.name for col in tbl.columns] == ['id', 'product_name', 'cost']
+
+    def testHarvestDatabaseParallel(self):
+        harvest_conf = self.conf.get("HARVEST")
+        min_tables = harvest_conf.get("min_tables")
+        harvest_conf["min_tables"] = 1
+        try:
+            result = selection.harvest_database("Warehouse 1", "SQLITE", self.conf.URL_TEST_DB,
+                                                "user", "pass", self.repo_conn)
+        finally:
+            harvest_conf["min_tables"] = min_tables
+        assert result == "Database 'Warehouse 1' has been harvested successfully: " \
+            "1 schemas, 4 tables, 1 views and 11 columns", result
+        rm = Utility().get_plugin(self.conf.PATH_REPO_MGR)
+        rm.connect(self.repo_conn)
+        tbl = rm.get_table("PRODUCT_MASTER")
+        assert [col.name for col in tbl.columns] == ['id', 'product_name', 'cost']
+        assert len(rm.get_table("SALES_DETAILS").foreign_keys) > 0
+
+    def testHarvestDatabaseAttached(self):
+        main_db = os.path.join(self.temp_dir, "main.db")
+        other_db = os.path.join(self.temp_dir, "other.db")
+        for path, ddl in ((main_db, "CREATE TABLE REGION (id INTEGER PRIMARY KEY, name TEXT)"),
+                          (other_db, "CREATE TABLE STORE (id INTEGER PRIMARY KEY, "
+                                     "region_id INTEGER, city TEXT)")):
+            conn = sqlite3.connect(path)
+            conn.execute(ddl)
+            conn.close()
+        wh_conn = Utility().get_plugin(self.conf.PATH_CONNECTION_MANAGERS, new_instance=True)
+        wh_conn.connect("sqlite:///" + main_db)
+        event.listen(wh_conn.get_engine(), "connect", lambda dbapi_conn, record: dbapi_conn
+                     .execute("ATTACH DATABASE '%s' AS other" % other_db))
+        try:
+            result = selection.harvest_database("Warehouse 2", "SQLITE", "sqlite:///" + main_db,
+                                                "user", "pass", self.repo_conn, wh_conn)
+        finally:
+            wh_conn.disconnect()
+            wh_conn.get_engine().dispose()
+        assert result == "Database 'Warehouse 2' has been harvested successfully: " \
+            "2 schemas, 2 tables, 0 views and 5 columns", result
+        rm = Utility().get_plugin(self.conf.PATH_REPO_MGR)
+        rm.connect(self.repo_conn)
+        schemas = dict((sch.name, sch) for sch in rm.get_database("Warehouse 2").schemas)
+        assert [tbl.name for tbl in schemas["main"].tables] == ["REGION"]
+        assert [tbl.name for tbl in schemas["other"].tables] == ["STORE"]
+        assert [col.name for col in schemas["other"].tables[0].columns] == \
+            ["id", "region_id", "city"]
+
+
+def suite():
+    """Test suite for selection"""
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(SelectionTestCase('testHarvestDatabase'))
+    test_suite.addTest(SelectionTestCase('testHarvestDatabaseParallel'))
+    test_suite.addTest(SelectionTestCase('testHarvestDatabaseAttached'))
+    return test_suite
+
+
+if __name__ == '__main__':
+    RUNNER = unittest.TextTestRunner()
+    RUNNER.run(suite())
@@ -12,6 +12,7 @@ from bipy.services.project_management.objects import ProjectFolder,\
 from bipy.services.project_management.objects import ProjectDimension,\
     ProjectMetric, Property
 from bipy.services.db.categories import AbstractCategory
+from bipy.services.db import unit_of_work
 from bipy.services.utils import Utility
 from bipy.logging import logger
 
@@ -53,6 +54,16 @@ class ProjectManager(AbstractCategory):
         self.__SESSION = conn.get_session()
         LOGGER.debug("Connected to database successfully!")
 
+    def batch(self, commit_every=None):
+        """Returns an transaction scope (context manager) in which the
+            creates and adds are committed once at the end, see
+            `unit_of_work.batch`
+
+            Args:
+                commit_every (int): Commits after every N operations
+        """
+        return unit_of_work.batch(self.__SESSION, commit_every)
+
     def create_project(self, id, name, proj_type, path, desc=None):
         """Creates a new project for visual purpose in the GUI. This is a
             proxy to analysis project.
@@ -76,7 +87,7 @@ class ProjectManager(AbstractCategory):
             project.project_type = proj_type
             project.path = path
             self.__SESSION.add(project)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Projected created successfully!")
             return project
         else:
@@ -101,7 +112,7 @@ class ProjectManager(AbstractCategory):
             item.description = desc
             item.analysis_item_id = id
             self.__SESSION.add(item)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Item created successfully!")
             return item
         else:
@@ -128,7 +139,7 @@ class ProjectManager(AbstractCategory):
             file.file_type = os.path.splitext(name)
             file.file_icon = icon
             self.__SESSION.add(file)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("File created successfully!")
             return file
         else:
@@ -155,7 +166,7 @@ class ProjectManager(AbstractCategory):
             folder.description = desc
             folder.folder_icon = icon
             self.__SESSION.add(folder)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Folder created successfully!")
             return folder
         else:
@@ -180,7 +191,7 @@ class ProjectManager(AbstractCategory):
             ds.analysis_dataset_id = id
             ds.description = desc
             self.__SESSION.add(ds)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Dataset created successfully!")
             return ds
         else:
@@ -204,7 +215,7 @@ class ProjectManager(AbstractCategory):
             fact.name = name
             fact.description = desc
             self.__SESSION.add(fact)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Fact created successfully!")
             return fact
         else:
@@ -228,7 +239,7 @@ class ProjectManager(AbstractCategory):
             dim.name = name
             dim.description = desc
             self.__SESSION.add(dim)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Dimension created successfully!")
             return dim
         else:
@@ -252,7 +263,7 @@ class ProjectManager(AbstractCategory):
             metric.name = name
             metric.description = desc
             self.__SESSION.add(metric)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Metric created successfully!")
             return metric
         else:
@@ -279,7 +290,7 @@ class ProjectManager(AbstractCategory):
             prop.value = value
             prop.description = desc
             self.__SESSION.add(prop)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Property created successfully!")
             return prop
         else:
@@ -296,7 +307,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding item '%s' to project '%s'" % (item.name,
                                                                project.name))
             project.items.append(item)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Item added to project successfully!")
         else:
             raise ValueError("Value of parameter 'item' and 'project'\
@@ -313,7 +324,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding item '%s' to project '%s'" % (file.name,
                                                                project.name))
             project.files.append(file)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("File has been added to project successfully!")
         else:
             raise ValueError("Value of parameter 'file' and 'project'\
@@ -331,7 +342,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding item '%s' to project '%s'" % (folder.name,
                                                                project.name))
             project.folders.append(folder)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Folder has been added to project successfully!")
         else:
             raise ValueError("Value of parameter 'folder' and 'project'\
@@ -349,7 +360,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding property '%s' to project '%s'" % (property.name,
                                                                    project.name))
             project.properties.append(property)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Property has been added to project successfully!")
         else:
             raise ValueError("Value of parameter 'property' and 'project'\
@@ -367,7 +378,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding item '%s' to folder '%s'" % (file.name,
                                                               folder.name))
             folder.files.append(file)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("File has been added to folder successfully!")
         else:
             raise ValueError("Value of 'folder' and 'file' parameters can't be None")
@@ -385,7 +396,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding folder '%s' to folder '%s'" % (s_folder.name,
                                                                 t_folder.name))
             t_folder.folders.append(s_folder)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Folder has been added to another folder\
                          successfully!")
         else:
@@ -405,7 +416,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding property '%s' to folder '%s'" % (property.name,
                                                                   folder.name))
             folder.properties.append(property)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Property has been added to folder successfully!")
         else:
             raise ValueError("Value of 'folder' and 'property' parameter can't be None")
@@ -424,7 +435,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding dataset '%s' to folder '%s'" % (dataset.name,
                                                                  folder.name))
             folder.datasets.append(dataset)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("DataSet has been added to project successfully!")
         else:
             raise ValueError("Value of parameter 'folder' and 'dataset' can't be None")
@@ -441,7 +452,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding fact '%s' to folder '%s'" % (fact.name,
                                                               folder.name))
             folder.facts.append(fact)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Fact has been added to folder successfully")
         else:
             raise ValueError("The value of parameter 'folder' and 'fact' can't be None")
@@ -458,7 +469,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding dimension '%s' to folder '%s'" % (dim.name,
                                                                    folder.name))
             folder.dimensions.append(dim)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Dimension has been added to folder successfully!")
         else:
             raise ValueError("The value of 'folder' and 'dim' parameter can't be None")
@@ -476,7 +487,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding metric '%s' to folder '%s'" % (metric.name,
                                                                 folder.name))
             folder.metrices.append(metric)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Metric has been added successfully!")
         else:
             raise ValueError("The value of 'folder' and 'metric' parameters\
@@ -493,7 +504,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding property '%s' to item '%s'" % (property.name,
                                                                 item.name))
             item.properties.append(property)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Property has been added to item successfully!")
         else:
             raise ValueError("Value of 'property' and 'item' parameter can't be None")
@@ -509,7 +520,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding property '%s' to file '%s'" % (property.name,
                                                                 file.name))
             file.properties.append(property)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Property has been added to file successfully!")
         else:
             raise ValueError("Value of 'property' and 'file' parameter can't be None")
@@ -526,7 +537,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding fact '%s' to dataset '%s'" % (fact.name,
                                                                dataset.name))
             dataset.facts.append(fact)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Fact has been added to dataset successfully")
         else:
             raise ValueError("The value of parameter 'dataset' and 'fact' can't be None")
@@ -543,7 +554,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding dimension '%s' to dataset '%s'" % (dim.name,
                                                                     dataset.name))
             dataset.dimensions.append(dim)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Dimension has been added to dataset successfully!")
         else:
             raise ValueError("The value of 'dataset' and 'dim' parameter can't be None")
@@ -560,7 +571,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding metric '%s' to dataset '%s'" % (metric.name,
                                                                  dataset.name))
             dataset.metrices.append(metric)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Metric has been added successfully!")
         else:
             raise ValueError("The value of 'dataset' and 'metric' parameters\
@@ -578,7 +589,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding property '%s' to dataset '%s'" % (property.name,
                                                                    dataset.name))
             dataset.properties.append(property)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Property has been added to dataset successfully!")
         else:
             raise ValueError("Value of 'property' and 'dataset' parameter can't be None")
@@ -594,7 +605,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding property '%s' to fact '%s'" % (property.name,
                                                                 fact.name))
             fact.properties.append(property)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Property has been added to fact successfully!")
         else:
             raise ValueError("Value of 'property' and 'fact' parameter can't be None")
@@ -610,7 +621,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding property '%s' to dim '%s'" % (property.name,
                                                                dim.name))
             dim.properties.append(property)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Property has been added to Dimension successfully!")
         else:
             raise ValueError("Value of 'property' and 'dim' parameter can't be None")
@@ -626,7 +637,7 @@ class ProjectManager(AbstractCategory):
             LOGGER.debug("Adding property '%s' to metric '%s'" % (property.name,
                                                                   metric.name))
             metric.properties.append(property)
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Property has been added to metric successfully!")
         else:
             raise ValueError("Value of 'property' and 'metric' parameter can't be\
@@ -644,7 +655,7 @@ class ProjectManager(AbstractCategory):
                                                               proj_obj.name is not
                                                               None else "Unknown"))
             proj_obj.modified_on = datetime.utcnow()
-            self.__SESSION.commit()
+            unit_of_work.commit(self.__SESSION)
             LOGGER.debug("Project object update successfully!")
         else:
             raise ValueError("Parameter 'proj_obj' can't be None")
@@ -0,0 +1,94 @@
+"""
+    Test cases for the plugin manifest and registry of ``Utility``
+    Author: Ajeet Singh
+    Date: 07/02/2019
+"""
+import os
+import sys
+import shutil
+import tempfile
+import importlib
+import unittest
+from unittest import mock
+from bipy.setup.installer import generate_plugin_manifest
+from bipy.services.utils import Utility, PluginRegistry, PluginManifest, LazyPluginInfo
+
+
+class PluginManifestTestCase(unittest.TestCase):
+    """Test case for the plugins read from the manifest
+    """
+    conf = None
+    registry = None
+    manifest = None
+    temp_dir = None
+
+    def setUp(self):
+        self.conf = Utility().CONFIG
+        self.registry = PluginRegistry()
+        self.manifest = self.registry.manifest
+        self.temp_dir = tempfile.mkdtemp()
+        manifest_path = os.path.join(self.temp_dir, "plugin_manifest.json")
+        generate_plugin_manifest(manifest_path=manifest_path)
+        self.registry.manifest = PluginManifest(manifest_path)
+        self.registry.invalidate()
+
+    def tearDown(self):
+        self.registry.manifest = self.manifest
+        self.registry.invalidate()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def testFreshManifest(self):
+        scans = self.registry.scan_count
+        plugins = self.registry.get_plugins(self.conf.PATH_BROWSER)
+        assert self.registry.scan_count == scans
+        assert [plugin.name for plugin in plugins] == ['SQLite Metadata Browser']
+        assert isinstance(plugins[0], LazyPluginInfo)
+
+    def testTouchedPluginFile(self):
+        info_file = os.path.join(self.conf.PATH_BROWSER, "sqlite", "metadata.yapsy-plugin")
+        stat = os.stat(info_file)
+        os.utime(info_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        try:
+            scans = self.registry.scan_count
+            plugins = self.registry.get_plugins(self.conf.PATH_BROWSER)
+        finally:
+            os.utime(info_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert self.registry.scan_count == scans + 1
+        assert [plugin.name for plugin in plugins] == ['SQLite Metadata Browser']
+        assert not isinstance(plugins[0], LazyPluginInfo)
+
+    def testLazyImport(self):
+        with mock.patch.object(importlib, "import_module",
+                               wraps=importlib.import_module) as import_module:
+            plugins = self.registry.get_plugins(self.conf.PATH_REPO_SYNC_MGR)
+            imports = lambda: [call for call in import_module.call_args_list
+                               if call[0][0] == plugins[0].module_name]
+            assert imports() == []
+            plugin = Utility().get_plugin(self.conf.PATH_REPO_SYNC_MGR)
+            assert len(imports()) == 1
+            assert Utility().get_plugin(self.conf.PATH_REPO_SYNC_MGR) is plugin
+            assert len(imports()) == 1
+
+    def testSameClass(self):
+        lazy = self.registry.get_plugins(self.conf.PATH_BROWSER)[0]
+        scanned = self.registry.scan(self.conf.PATH_BROWSER)[0]
+        module = sys.modules[lazy.module_name]
+        assert type(lazy.plugin_object) is getattr(module, lazy.class_name)
+        assert type(scanned.plugin_object) is type(lazy.plugin_object)
+        assert not [name for name in sys.modules if name.startswith("yapsy_loaded_plugin_")
+                    and hasattr(sys.modules[name], lazy.class_name)]
+
+
+def suite():
+    """Test suite for the plugin manifest"""
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(PluginManifestTestCase('testFreshManifest'))
+    test_suite.addTest(PluginManifestTestCase('testTouchedPluginFile'))
+    test_suite.addTest(PluginManifestTestCase('testLazyImport'))
+    test_suite.addTest(PluginManifestTestCase('testSameClass'))
+    return test_suite
+
+
+if __name__ == '__main__':
+    RUNNER = unittest.TextTestRunner()
+    RUNNER.run(suite())
@@ -25,7 +25,8 @@ class ConnectSubCmds:
             if self._warehouse_conn is None:
                 util = Utility()
                 config = util.CONFIG
-                self._warehouse_conn = util.get_plugin(config.PATH_CONNECTION_MANAGERS)
+                self._warehouse_conn = util.get_plugin(config.PATH_CONNECTION_MANAGERS,
+                                                       new_instance=True)
                 self._warehouse_conn.connect(config.URL_TEST_DB)
             return self._warehouse_conn
         elif str(params[0]).lower() == "--help":
@@ -43,7 +44,8 @@ class ConnectSubCmds:
             if self._repo_conn is None:
                 util = Utility()
                 config = util.CONFIG
-                self._repo_conn = util.get_plugin(config.PATH_CONNECTION_MANAGERS)
+                self._repo_conn = util.get_plugin(config.PATH_CONNECTION_MANAGERS,
+                                                  new_instance=True)
                 self._repo_conn.connect(config.URL_META_DB)
             return self._repo_conn
         elif str(params[0]).lower() == "--help":
@@ -38,7 +38,7 @@ class BipyCli:
                    'COLUMN-TYPE', 'PK-COLUMNS', 'PK-NAME', 'TABLE-OPTS',
                    'FK-COLUMNS'
                    ],
-        'SELECT': ['DATABASE', 'SCHEMAS', 'TABLES', 'VIEWS', 'COLUMNS',
+        'SELECT': ['DATABASE', 'SCHEMAS', 'TABLES', 'VIEWS', 'COLUMNS', 'ALL',
                    'DONE', 'EXIT', 'QUIT', 'HELP'
                    ],
         'CONNECT': ['WAREHOUSE', 'REPOSITORY', 'DISCONNECT', 'EXIT',
@@ -208,6 +208,8 @@ class BipyCli:
             self._select_sub_cmds.select_views(sub_params, self._repo_conn, self._warehouse_conn)
         elif str(sub_cmd).upper() == "COLUMNS":
             self._select_sub_cmds.select_columns(sub_params, self._repo_conn, self._warehouse_conn)
+        elif str(sub_cmd).upper() == "ALL":
+            self._select_sub_cmds.select_all(sub_params, self._repo_conn, self._warehouse_conn)
         else:
             print("Invalid sub command provided! Please type HELP to get more information")
 
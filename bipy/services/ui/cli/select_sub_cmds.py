@@ -153,3 +153,38 @@ class SelectionSubCmds:
             print("")
         else:
             print("Invalid command or parameters. Use --help for more info")
+
+    def select_all(self, sub_params, repo_conn, wh_conn):
+        """Selects a database along with all of its schemas, tables, views
+            and columns and stores them in repo in one go
+
+            Args:
+                sub_params (Array): An array of strings for parameters
+                repo_conn (ConnectionManager): An connection to repo db
+                wh_conn (ConnectionManager): An connection to warehouse
+        """
+        if sub_params.__len__() == 0:
+            print("Missing required parameters. Use --help to get more information")
+        elif sub_params.__len__() == 5:
+            name = sub_params[0]
+            db_type = sub_params[1]
+            url = sub_params[2]
+            user = sub_params[3]
+            password = sub_params[4]
+            # the connected warehouse is reused only if it points to the same db
+            if wh_conn is not None and wh_conn.get_connection_string() != url:
+                wh_conn = None
+            result = selection.harvest_database(name, db_type, url, user, password,
+                                                repo_conn, wh_conn)
+            print("=>%s" % (result))
+        elif sub_params.__len__() == 1 and str(sub_params[0]).lower() == '--help':
+            print("")
+            print("HELP:")
+            print("-----")
+            print("ALL command helps in selecting a db with all its schemas, tables,")
+            print("views and columns to be used in project, saved in a single transaction")
+            print("USAGE: ALL name type conn_url username password")
+            print("NOTE: All parameters are required for this command")
+            print("")
+        else:
+            print("Invalid command or parameters. Use --help for more info")
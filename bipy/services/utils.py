@@ -2,10 +2,332 @@
     Author: Ajeet Singh
     Date: 06/11/2019
 """
+import os
+import sys
+import json
+import inspect
+import importlib
+import threading
 from yapsy.PluginManager import PluginManager
 from bipy.services.constants import PATHS
 
 
+class LazyPluginInfo:
+    """ Lightweight replacement of yapsy's `PluginInfo` built from an entry
+        of the plugin manifest. The plugin module is imported and the plugin
+        object created only when `plugin_object` is accessed first time
+    """
+
+    def __init__(self, entry):
+        """Default constructor
+
+            Args:
+                entry (Dict): An plugin entry from the manifest
+        """
+        self.name = entry["name"]
+        self.path = os.path.join(PATHS.ROOT, os.path.splitext(entry["module_file"])[0])
+        self.category = entry["category"]
+        self.module_name = entry["module"]
+        self.class_name = entry["class"]
+        self._plugin_object = None
+        self._lock = threading.Lock()
+
+    @property
+    def plugin_object(self):
+        """Returns the plugin object, importing the module on first access
+        """
+        if self._plugin_object is None:
+            with self._lock:
+                if self._plugin_object is None:
+                    module = importlib.import_module(self.module_name)
+                    self._plugin_object = getattr(module, self.class_name)()
+        return self._plugin_object
+
+    def __repr__(self):
+        """String representation
+        """
+        return "Plugin [Name=%s, Module=%s]" % (self.name, self.module_name)
+
+
+class PluginManifest:
+    """ Reads the plugin manifest compiled by `bipy.setup.installer` and
+        answers plugin lookups from it without walking the plugin
+        directories. The entries of a path are used only if the mtimes of
+        the plugin files and directories under that path are unchanged
+        since the manifest was generated
+    """
+
+    VERSION = 1
+
+    def __init__(self, manifest_path=None):
+        """Default constructor
+
+            Args:
+                manifest_path (String): Path to the manifest file
+        """
+        self.manifest_path = manifest_path if manifest_path is not None \
+            else PATHS.PLUGIN_MANIFEST
+        self._manifest = None
+        self._fresh_paths = {}
+        self._load()
+
+    def _load(self):
+        """Loads the manifest file if one is available
+        """
+        try:
+            with open(self.manifest_path, "rt") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return
+        if manifest.get("version") == PluginManifest.VERSION:
+            self._manifest = manifest
+
+    def is_available(self):
+        """Returns True if an manifest has been loaded
+        """
+        return self._manifest is not None
+
+    @staticmethod
+    def _under(rel_path, abs_dir):
+        """Checks if the manifest path `rel_path` is available under `abs_dir`
+        """
+        abs_path = os.path.join(PATHS.ROOT, rel_path)
+        return abs_path == abs_dir or abs_path.startswith(abs_dir + os.sep)
+
+    @staticmethod
+    def _mtime(rel_path):
+        """Returns mtime of a path relative to the package root"""
+        try:
+            return os.stat(os.path.join(PATHS.ROOT, rel_path)).st_mtime_ns
+        except OSError:
+            return None
+
+    def is_fresh(self, path):
+        """ Returns True if the manifest entries of the path passed as argument
+            still describe what is available on disk
+
+            Args:
+                path (String): Path where plugins are available
+        """
+        if self._manifest is None:
+            return False
+        abs_dir = os.path.abspath(path)
+        fresh = self._fresh_paths.get(abs_dir)
+        if fresh is not None:
+            return fresh
+        fresh = any(self._under(_dir, abs_dir) for _dir in self._manifest["directories"])
+        for _dir, mtime in self._manifest["directories"].items():
+            if fresh and self._under(_dir, abs_dir) and self._mtime(_dir) != mtime:
+                fresh = False
+        for entry in self._manifest["plugins"]:
+            if fresh and self._under(entry["info_file"], abs_dir):
+                for rel_path, mtime in entry["mtimes"].items():
+                    if self._mtime(rel_path) != mtime:
+                        fresh = False
+        for rel_path in self._manifest["unindexed"]:
+            if self._under(rel_path, abs_dir):
+                fresh = False
+        self._fresh_paths[abs_dir] = fresh
+        return fresh
+
+    def get_directories(self, path):
+        """ Returns absolute paths of the plugin directories recorded in the
+            manifest under the path passed as argument
+
+            Args:
+                path (String): Path where plugins are available
+        """
+        abs_dir = os.path.abspath(path)
+        return tuple(os.path.join(PATHS.ROOT, _dir) for _dir in self._manifest["directories"]
+                     if self._under(_dir, abs_dir))
+
+    def get_plugins(self, path, p_categories_filter=None):
+        """ Returns list of `LazyPluginInfo` objects available under the path
+            and matching the categories filter, same as yapsy would do
+
+            Args:
+                path (String): Path where plugins are available
+                p_categories_filter (Dict): yapsy's categories filter
+        """
+        abs_dir = os.path.abspath(path)
+        if p_categories_filter is None:
+            wanted = ["yapsy.IPlugin.IPlugin"]
+        else:
+            wanted = [cls.__module__ + "." + cls.__name__
+                      for cls in p_categories_filter.values()]
+        plugins = []
+        for entry in self._manifest["plugins"]:
+            if self._under(entry["info_file"], abs_dir) and \
+                    any(base in entry["bases"] for base in wanted):
+                plugins.append(LazyPluginInfo(entry))
+        return plugins
+
+
+class PluginRegistry:
+    """ Process wide registry of the plugins discovered by yapsy. Plugins
+        are located and loaded only once for each (path, categories) pair
+        and the loaded plugins are handed out from memory afterwards. A
+        path is scanned again only when the mtime of one of its plugin
+        directories has changed. Paths described by an up to date plugin
+        manifest are not scanned at all and their modules are imported lazily.
+        Either way, plugin modules of the package are imported under their
+        module names, so a plugin class is the same class object whether
+        the plugin came from the manifest or from a scan
+    """
+
+    __INSTANCE = None
+    __IGNORED_DIRS = ("__pycache__", ".ropeproject")
+
+    def __new__(cls):
+        """Singleton class
+        """
+        if PluginRegistry.__INSTANCE is None:
+            PluginRegistry.__INSTANCE = object.__new__(cls)
+            PluginRegistry.__INSTANCE._entries = {}
+            PluginRegistry.__INSTANCE._lock = threading.RLock()
+            PluginRegistry.__INSTANCE.scan_count = 0
+            PluginRegistry.__INSTANCE.manifest = PluginManifest()
+        return PluginRegistry.__INSTANCE
+
+    @staticmethod
+    def get_key(path, p_categories_filter=None):
+        """ Returns the key used to store plugins of a path and categories
+
+            Args:
+                path (String): Path where plugins are available
+                p_categories_filter (Dict): yapsy's categories filter
+        """
+        if p_categories_filter is None:
+            return (os.path.abspath(path), ("Default",))
+        return (os.path.abspath(path), tuple(sorted(p_categories_filter.keys())))
+
+    def get_plugins(self, path, p_categories_filter=None):
+        """ Returns list of `PluginInfo` objects available at the path and of
+            the categories provided as argument
+
+            Args:
+                path (String): Path where plugins are available
+                p_categories_filter (Dict): yapsy's categories filter
+        """
+        key = PluginRegistry.get_key(path, p_categories_filter)
+        entry = self._entries.get(key)
+        if entry is not None and self._signature(entry[0]) == entry[1]:
+            return entry[2]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._signature(entry[0]) == entry[1]:
+                return entry[2]
+            if entry is None and self.manifest.is_fresh(path):
+                plugins = self.manifest.get_plugins(path, p_categories_filter)
+                dirs = self.manifest.get_directories(path)
+            else:
+                plugins = self.scan(path, p_categories_filter)
+                # signature is taken after loading as importing the modules
+                # may create __pycache__ folders and touch the directories
+                dirs = self._plugin_dirs(path)
+            self._entries[key] = (dirs, self._signature(dirs), plugins)
+            return plugins
+
+    def scan(self, path, p_categories_filter=None):
+        """ Locates the plugins available at path using a new yapsy
+            `PluginManager`, bypassing the registry. Plugins of the package
+            are loaded through their module names (yapsy would import them
+            again as `yapsy_loaded_plugin_*` modules), the other plugins are
+            loaded by yapsy
+
+            Args:
+                path (String): Path where plugins are available
+                p_categories_filter (Dict): yapsy's categories filter
+        """
+        self.scan_count += 1
+        _pm = PluginManager(categories_filter=p_categories_filter)
+        _pm.setPluginPlaces([path])
+        _pm.locatePlugins()
+        plugins = []
+        for candidate in _pm.getPluginCandidates():
+            module_name = self._package_module(candidate[1])
+            if module_name is not None:
+                _pm.removePluginCandidate(candidate)
+                if self._load(candidate[2], module_name, _pm.categories_interfaces):
+                    plugins.append(candidate[2])
+        plugins.extend(_pm.loadPlugins())
+        del _pm
+        return plugins
+
+    @staticmethod
+    def _package_module(module_path):
+        """ Returns the module name of a plugin module (path without `.py`)
+            found by yapsy or None if it is not part of the package
+        """
+        if module_path.endswith(".py"):
+            module_path = module_path[:-3]
+        if os.path.basename(module_path) == "__init__":
+            module_path = os.path.dirname(module_path)
+        module_path = os.path.abspath(module_path)
+        if not module_path.startswith(PATHS.ROOT + os.sep):
+            return None
+        return os.path.relpath(module_path, PATHS.ROOT_PARENT).replace(os.sep, ".")
+
+    @staticmethod
+    def _load(plugin_info, module_name, interfaces):
+        """ Imports the plugin module and creates the plugin object of the
+            class defined in it (same class as recorded in the manifest)
+            matching one of the category interfaces. Returns True if the
+            plugin object has been created
+        """
+        try:
+            module = importlib.import_module(module_name)
+        except Exception:
+            plugin_info.error = sys.exc_info()
+            return False
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            categories = [category for category, interface in interfaces.items()
+                          if issubclass(cls, interface) and cls is not interface]
+            if categories:
+                plugin_info.plugin_object = cls()
+                plugin_info.categories.extend(categories)
+                return True
+        return False
+
+    def invalidate(self, path=None):
+        """ Drops the plugins cached for the path passed as argument or
+            all cached plugins if no path is provided
+
+            Args:
+                path (String): Path where plugins are available
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            abs_path = os.path.abspath(path)
+            for key in [k for k in self._entries if k[0] == abs_path]:
+                del self._entries[key]
+
+    def _plugin_dirs(self, path):
+        """Returns the directories under path that yapsy walks for plugins
+        """
+        dirs = []
+        for root, sub_dirs, _ in os.walk(path):
+            sub_dirs[:] = [d for d in sub_dirs if d not in self.__IGNORED_DIRS]
+            dirs.append(root)
+        return tuple(dirs)
+
+    @staticmethod
+    def _signature(dirs):
+        """Returns the mtimes of the directories passed as argument
+        """
+        mtimes = []
+        for _dir in dirs:
+            try:
+                mtimes.append(os.stat(_dir).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+
 class Utility:
     """ Utility class as singleton
     """
@@ -16,33 +338,39 @@ class Utility:
     def __new__(cls):
         if Utility.__INSTANCE is None:
             Utility.__INSTANCE = object.__new__(cls)
-            _pm = PluginManager()
-            _pm.setPluginPlaces([PATHS.CONFIG_MGR])
-            _pm.locatePlugins()
-            configs = _pm.loadPlugins()
+            registry = PluginRegistry()
+            configs = registry.get_plugins(PATHS.CONFIG_MGR)
             Utility.CONFIG = configs[0].plugin_object.CONFIG
+            # the config plugin itself is found through the default manifest,
+            # the other plugins through the manifest configured
+            manifest_path = Utility.CONFIG.get("PATH_PLUGIN_MANIFEST")
+            if manifest_path is not None and os.path.abspath(manifest_path) != \
+                    os.path.abspath(registry.manifest.manifest_path):
+                registry.manifest = PluginManifest(manifest_path)
         return Utility.__INSTANCE
 
-    def get_plugin(self, path, p_categories_filter=None):
+    def get_plugin(self, path, p_categories_filter=None, new_instance=False):
         """ Returns a plugins available at specified path and of category
-            provided as argument
+            provided as argument. The plugin is loaded only once per process
+            and the same object is returned on subsequent calls unless
+            `new_instance` is passed as True, in which case a new object of
+            the plugin class is created. Plugins holding a connection (e.g.,
+            connection managers, browsers and repository managers) must not
+            be shared by concurrent requests, as `connect` rebinds the shared
+            object to the connection of the caller, so request them with
+            `new_instance`. Most plugin classes are singletons, the new object
+            is created bypassing their `__new__`
         """
-        _pm = PluginManager(categories_filter=p_categories_filter)
-        _pm.setPluginPlaces([path])
-        _pm.locatePlugins()
-        plugins = _pm.loadPlugins()
+        plugins = PluginRegistry().get_plugins(path, p_categories_filter)
         plugin = plugins[0].plugin_object
-        del _pm
-        del plugins
+        if new_instance:
+            instance = object.__new__(plugin.__class__)
+            plugin.__class__.__init__(instance)
+            return instance
         return plugin
 
     def get_all_plugins(self, path, p_categories_filter=None):
         """ Returns all plugin objects as array available at the specified
             path provided as argument
         """
-        _pm = PluginManager(categories_filter=p_categories_filter)
-        _pm.setPluginPlaces([path])
-        _pm.locatePlugins()
-        plugins = _pm.loadPlugins()
-        del _pm
-        return plugins
+        return list(PluginRegistry().get_plugins(path, p_categories_filter))
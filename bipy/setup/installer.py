@@ -3,10 +3,26 @@
     Author: Ajeet Singh
     Date: 05/31/2019
 """
+import os
+import json
+import inspect
+import importlib
+import configparser
+from yapsy.IPlugin import IPlugin
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine.reflection import Inspector
+from bipy.services.constants import PATHS
+from bipy.services.utils import PluginManifest, PluginRegistry, Utility
+from bipy.logging import logger
+
+
+LOGGER = logger.get_logger(__name__)
+
 
 def install(connection, base):
     """Setups the metadata of all class defined under `base` using the
-        engine of the already established `connection` to database
+        engine of the already established `connection` to database and
+        compiles the plugin manifest at `PATH_PLUGIN_MANIFEST`
     """
     if connection is None:
         raise Exception("""The `connection` parameter can't be None and should
@@ -17,3 +33,125 @@ def install(connection, base):
                         """)
     base.metadata.bind = connection.get_engine()
     base.metadata.create_all()
+    create_missing_indexes(connection, base)
+    manifest_path = Utility().CONFIG.PATH_PLUGIN_MANIFEST
+    generate_plugin_manifest(manifest_path=manifest_path)
+    PluginRegistry().manifest = PluginManifest(manifest_path)
+
+
+def create_missing_indexes(connection, base):
+    """Creates the indexes defined under `base` which are missing on the
+        tables already installed, `create_all` creates indexes only along
+        with new tables. An unique index can't be created on a table holding
+        duplicates, such index is skipped with an warning. Returns names of
+        the indexes created
+
+        Args:
+            connection (ConnectionManager): An connection to the database
+            base (DeclarativeMeta): Base of the classes owning the indexes
+    """
+    engine = connection.get_engine()
+    inspector = Inspector.from_engine(engine)
+    tables = set(inspector.get_table_names())
+    created = []
+    for table in base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = set(index["name"] for index in inspector.get_indexes(table.name))
+        for index in table.indexes:
+            if index.name not in existing:
+                try:
+                    index.create(bind=engine)
+                    created.append(index.name)
+                except IntegrityError:
+                    LOGGER.warning("Index '%s' not created as table '%s' has duplicates"
+                                   % (index.name, table.name))
+    return created
+
+
+def _plugin_entry(info_file):
+    """Builds the manifest entry of the plugin described by the `.yapsy-plugin`
+        file passed as argument. Returns None if the plugin module can't be
+        imported as part of the `bipy` package
+    """
+    parser = configparser.ConfigParser()
+    parser.read(info_file)
+    name = parser.get("Core", "Name").strip()
+    module_file = os.path.join(os.path.dirname(info_file),
+                               parser.get("Core", "Module").strip() + ".py")
+    module_name = os.path.splitext(os.path.relpath(module_file, PATHS.ROOT_PARENT))[0]\
+        .replace(os.sep, ".")
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        return None
+    for _, cls in inspect.getmembers(module, inspect.isclass):
+        if cls.__module__ == module.__name__ and issubclass(cls, IPlugin):
+            return {
+                "name": name,
+                "info_file": os.path.relpath(info_file, PATHS.ROOT),
+                "module": module_name,
+                "module_file": os.path.relpath(module_file, PATHS.ROOT),
+                "class": cls.__name__,
+                "category": getattr(cls, "name", "Default"),
+                "bases": [base.__module__ + "." + base.__name__ for base in cls.__mro__
+                          if issubclass(base, IPlugin)],
+                "mtimes": {}
+            }
+    return None
+
+
+def generate_plugin_manifest(services_path=PATHS.SERVICES,
+                             manifest_path=PATHS.PLUGIN_MANIFEST):
+    """Compiles the manifest of all plugins available under `services_path`
+        (name, module, category and file mtimes) and writes it to
+        `manifest_path`. `Utility` reads this manifest to find plugins
+        without walking the plugin directories and imports a plugin module
+        only when the plugin is requested first time
+
+        Args:
+            services_path (String): Root folder of the plugins
+            manifest_path (String): Path of the manifest file to be written
+
+        Returns:
+            manifest (Dict): The manifest written to the file
+    """
+    plugins = []
+    unindexed = []
+    dirs = []
+    for root, sub_dirs, files in os.walk(services_path):
+        sub_dirs[:] = sorted(d for d in sub_dirs if d not in ("__pycache__", ".ropeproject"))
+        dirs.append(root)
+        for file_name in sorted(files):
+            if file_name.endswith(".yapsy-plugin"):
+                info_file = os.path.join(root, file_name)
+                entry = _plugin_entry(info_file)
+                if entry is None:
+                    unindexed.append(os.path.relpath(info_file, PATHS.ROOT))
+                else:
+                    plugins.append(entry)
+    # mtimes are read once all modules are imported as imports may create
+    # __pycache__ folders and touch the plugin directories
+    for entry in plugins:
+        for key in ("info_file", "module_file"):
+            entry["mtimes"][entry[key]] = \
+                os.stat(os.path.join(PATHS.ROOT, entry[key])).st_mtime_ns
+    manifest = {
+        "version": PluginManifest.VERSION,
+        "directories": dict((os.path.relpath(_dir, PATHS.ROOT), os.stat(_dir).st_mtime_ns)
+                            for _dir in dirs),
+        "plugins": plugins,
+        "unindexed": unindexed
+    }
+    with open(manifest_path, "wt") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    from bipy.services.db.repository.meta_objects import Base
+    UTILS = Utility()
+    CONNECTION = UTILS.get_plugin(UTILS.CONFIG.PATH_CONNECTION_MANAGERS, new_instance=True)
+    CONNECTION.connect(UTILS.CONFIG.URL_META_DB)
+    install(CONNECTION, Base)
+    CONNECTION.disconnect()